@@ -0,0 +1,41 @@
+"""Add composite index on signals (user_id, portfolio_id, timestamp DESC)
+
+Revision ID: 4b965921d7a5
+Revises: 3d3c7f5a2e68
+Create Date: 2026-10-17 09:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b965921d7a5'
+down_revision: Union[str, Sequence[str], None] = '3d3c7f5a2e68'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_signals_user_pf_ts',
+            'signals',
+            ['user_id', 'portfolio_id', sa.text('timestamp DESC')],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_signals_user_pf_ts',
+            table_name='signals',
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,25 @@
+"""add next_retry_at column to orders
+
+Revision ID: 9c4e2b7d1f3a
+Revises: 4b965921d7a5
+Create Date: 2026-10-17 12:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '9c4e2b7d1f3a'
+down_revision: Union[str, Sequence[str], None] = '4b965921d7a5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('orders', sa.Column('next_retry_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('orders', 'next_retry_at')
@@ -0,0 +1,42 @@
+"""Add partial index on orders (next_retry_at) WHERE status = 'new'
+
+Revision ID: a3f7c91e5b20
+Revises: 9c4e2b7d1f3a
+Create Date: 2026-10-17 13:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3f7c91e5b20'
+down_revision: Union[str, Sequence[str], None] = '9c4e2b7d1f3a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_orders_retry',
+            'orders',
+            ['next_retry_at'],
+            unique=False,
+            postgresql_where=sa.text("status = 'new'"),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_orders_retry',
+            table_name='orders',
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,42 @@
+"""Add partial index on orders (created_at) WHERE status = 'new'
+
+Revision ID: c81d4e6f2a97
+Revises: a3f7c91e5b20
+Create Date: 2026-10-17 15:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c81d4e6f2a97'
+down_revision: Union[str, Sequence[str], None] = 'a3f7c91e5b20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_orders_pending',
+            'orders',
+            ['created_at'],
+            unique=False,
+            postgresql_where=sa.text("status = 'new'"),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_orders_pending',
+            table_name='orders',
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,74 @@
+"""Add indexes for hot orders predicates (status/created_at, user_id/status, parent_order_id)
+
+The composite indexes lead with status and user_id, so the single-column
+ix_orders_status and ix_orders_user_id are dropped.
+
+Revision ID: e4b7a9d2c316
+Revises: c81d4e6f2a97
+Create Date: 2026-10-17 16:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4b7a9d2c316'
+down_revision: Union[str, Sequence[str], None] = 'c81d4e6f2a97'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+_INDEXES = (
+    ('ix_orders_status_created_at', ['status', 'created_at']),
+    ('ix_orders_user_status', ['user_id', 'status']),
+    ('ix_orders_parent_order_id', ['parent_order_id']),
+)
+
+# Covered by the leading column of the composite indexes above
+_REPLACED_INDEXES = (
+    ('ix_orders_status', ['status']),
+    ('ix_orders_user_id', ['user_id']),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        for name, columns in _INDEXES:
+            op.create_index(
+                name,
+                'orders',
+                columns,
+                unique=False,
+                postgresql_concurrently=True,
+            )
+        for name, _ in _REPLACED_INDEXES:
+            op.drop_index(
+                name,
+                table_name='orders',
+                if_exists=True,
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, columns in _REPLACED_INDEXES:
+            op.create_index(
+                name,
+                'orders',
+                columns,
+                unique=False,
+                if_not_exists=True,
+                postgresql_concurrently=True,
+            )
+        for name, _ in reversed(_INDEXES):
+            op.drop_index(
+                name,
+                table_name='orders',
+                postgresql_concurrently=True,
+            )
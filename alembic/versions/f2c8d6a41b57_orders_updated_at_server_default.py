@@ -0,0 +1,38 @@
+"""Set a database-side default for orders.updated_at
+
+Revision ID: f2c8d6a41b57
+Revises: e4b7a9d2c316
+Create Date: 2026-10-17 18:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2c8d6a41b57'
+down_revision: Union[str, Sequence[str], None] = 'e4b7a9d2c316'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.alter_column(
+        'orders',
+        'updated_at',
+        existing_type=sa.DateTime(),
+        server_default=sa.text("TIMEZONE('utc', CURRENT_TIMESTAMP)"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.alter_column(
+        'orders',
+        'updated_at',
+        existing_type=sa.DateTime(),
+        server_default=None,
+    )
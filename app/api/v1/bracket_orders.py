@@ -2,6 +2,8 @@
 Bracket Orders API - Endpoints para monitoreo y control de bracket orders
 """
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import bindparam
 from sqlalchemy.orm import Session
 from typing import List, Optional, Dict, Any
 from datetime import datetime
@@ -11,13 +13,17 @@ from app.database import get_db
 from app.core.auth import get_current_verified_user
 from app.models.user import User
 from app.models.order import Order
-from app.core.types import OrderStatus, OrderType
+from app.core.types import OrderStatus, OrderType, LIVE_ORDER_STATES, WORKING_ORDER_STATES
 from app.execution.order_executor import OrderExecutor
 from app.execution.bracket_order_processor import BracketOrderProcessor
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# Hijas que aún pueden cancelarse (vivas en el broker o esperando al padre)
+_CANCELLABLE_CHILD_STATES = tuple(LIVE_ORDER_STATES | {OrderStatus.PENDING_PARENT})
+_CANCELLABLE_STATUS_CLAUSE = Order.status.in_(bindparam("cancellable_states", expanding=True))
+
 
 @router.get("/active")
 async def get_active_bracket_orders(
@@ -27,6 +33,7 @@ async def get_active_bracket_orders(
     end_date: Optional[datetime] = Query(None, description="Filter orders created before this date"),
     limit: int = Query(100, ge=1, le=1000, description="Max records to return"),
     offset: int = Query(0, ge=0, description="Records to skip"),
+    layout: str = Query("rows", pattern="^(rows|columns)$", description="rows: one object per bracket; columns: one list per field"),
     current_user: User = Depends(get_current_verified_user),
     db: Session = Depends(get_db)
 ):
@@ -40,6 +47,22 @@ async def get_active_bracket_orders(
         executor = OrderExecutor()
         executor.db = db
 
+        if layout == "columns":
+            columns = executor.get_active_bracket_columns(
+                user_id=filter_user_id,
+                statuses=status,
+                start_date=start_date,
+                end_date=end_date,
+                limit=limit,
+                offset=offset,
+            )
+            return ORJSONResponse({
+                "status": "success",
+                "bracket_orders": columns,
+                "total_count": len(columns["parent_ids"]),
+                "user_id": filter_user_id,
+            })
+
         bracket_orders = executor.get_active_bracket_orders(
             user_id=filter_user_id,
             statuses=status,
@@ -159,13 +182,8 @@ async def cancel_entire_bracket_order(
         # Obtener todas las órdenes del bracket
         child_orders = db.query(Order).filter(
             Order.parent_order_id == parent_order_id,
-            Order.status.in_([
-                OrderStatus.SENT, 
-                OrderStatus.ACCEPTED, 
-                OrderStatus.PARTIALLY_FILLED,
-                OrderStatus.PENDING_PARENT
-            ])
-        ).all()
+            _CANCELLABLE_STATUS_CLAUSE
+        ).params(cancellable_states=_CANCELLABLE_CHILD_STATES).all()
         
         executor = OrderExecutor()
         executor.db = db
@@ -174,7 +192,7 @@ async def cancel_entire_bracket_order(
         failed_cancellations = []
         
         # Cancelar orden parent si está activa
-        if parent_order.status in [OrderStatus.SENT, OrderStatus.ACCEPTED, OrderStatus.PARTIALLY_FILLED]:
+        if parent_order.status in LIVE_ORDER_STATES:
             if parent_order.broker_order_id:
                 cancel_result = await executor.cancel_order(parent_order.broker_order_id)
                 if cancel_result["status"] == "success":
@@ -186,7 +204,7 @@ async def cancel_entire_bracket_order(
         # Cancelar órdenes hijas
         for child in child_orders:
             try:
-                if child.broker_order_id and child.status in [OrderStatus.SENT, OrderStatus.ACCEPTED]:
+                if child.broker_order_id and child.status in WORKING_ORDER_STATES:
                     cancel_result = await executor.cancel_order(child.broker_order_id)
                     if cancel_result["status"] == "success":
                         child.status = OrderStatus.CANCELED
@@ -29,7 +29,7 @@ async def process_pending_orders(
         
         # Ejecutar en background para no bloquear la respuesta
         def process_orders():
-            result = processor.process_pending_orders()
+            result = processor.process_pending_orders(verbose=True)
             logger.info(f"Manual order processing completed: {result}")
         
         background_tasks.add_task(process_orders)
@@ -55,7 +55,7 @@ async def process_single_order(
         processor = OrderProcessor(db)
         
         # Verificar que la orden pertenece al usuario (o es admin)
-        order = db.query(Order).filter(Order.id == order_id).first()
+        order = db.get(Order, order_id)
         if not order:
             raise HTTPException(status_code=404, detail="Order not found")
         
@@ -122,7 +122,7 @@ async def cancel_order(
         processor = OrderProcessor(db)
         
         # Verificar autorización
-        order = db.query(Order).filter(Order.id == order_id).first()
+        order = db.get(Order, order_id)
         if not order:
             raise HTTPException(status_code=404, detail="Order not found")
         
@@ -214,7 +214,7 @@ async def get_order_detail(
 ):
     """Obtener detalles de una orden específica"""
     try:
-        order = db.query(Order).filter(Order.id == order_id).first()
+        order = db.get(Order, order_id)
         if not order:
             raise HTTPException(status_code=404, detail="Order not found")
         
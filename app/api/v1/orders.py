@@ -5,7 +5,6 @@ from alpaca.common.exceptions import APIError
 from sqlalchemy.orm import Session
 import logging
 from app.integrations import broker_client
-from app.integrations.alpaca.client import AlpacaClient
 from app.services.position_manager import position_manager
 from app.database import get_db
 from app.models.signal import Signal
@@ -94,7 +93,7 @@ async def get_account_info(
         account = broker_client.get_account()
 
         # Get today's performance
-        alpaca_client = AlpacaClient()
+        alpaca_client = broker_client
         try:
             from alpaca.trading.requests import GetPortfolioHistoryRequest
 
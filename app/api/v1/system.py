@@ -12,6 +12,8 @@ from app.integrations import broker_client
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+_PING_SQL = text("SELECT 1")
+
 
 @router.get("/health")
 async def system_health_check():
@@ -40,7 +42,7 @@ async def system_status(
         db = None
         try:
             db = next(get_db())
-            db.execute(text("SELECT 1"))
+            db.execute(_PING_SQL)
             database_status = "connected"
         except SQLAlchemyError as db_exc:
             logger.warning("Database connectivity issue: %s", db_exc)
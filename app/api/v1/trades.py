@@ -1,5 +1,6 @@
 # backend/app/api/v1/trades.py
 
+import asyncio
 import logging
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
@@ -16,7 +17,7 @@ from app.services import portfolio_service
 from app.services.trade_validation import TradeValidator
 from app.core.types import TradeStatus
 from app.utils.time import now_eastern
-from app.services.order_executor import OrderExecutor
+from app.services.order_executor import order_executor
 
 logger = logging.getLogger(__name__)
 
@@ -165,9 +166,9 @@ async def close_trade(
     db.commit()
     db.refresh(signal)
 
-    executor = OrderExecutor()
     try:
-        executor.execute_signal(signal, current_user)
+        # Broker round-trip runs in a worker thread to keep the event loop free
+        await asyncio.to_thread(order_executor.execute_signal, signal, current_user)
     except Exception as e:
         logger.exception("Failed to execute close signal for trade %s", trade_id)
         signal.error_message = str(e)
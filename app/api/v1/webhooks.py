@@ -1,6 +1,8 @@
 # backend/app/api/v1/webhooks.py
 
 from fastapi import APIRouter, Depends, HTTPException, Query, Header, Request
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import null, select
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
 from typing import Optional
@@ -12,6 +14,7 @@ from app.core.auth import get_current_verified_user
 from app.config import settings
 from app.services import portfolio_service
 from app.utils.time import to_eastern
+import hmac
 import logging
 
 from app.signals.processor import WebhookProcessor
@@ -19,7 +22,67 @@ from app.signals.normalizer import SignalNormalizer
 from app.utils.rate_limiter import RateLimiter, get_rate_limiter
 
 logger = logging.getLogger(__name__)
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse)
+
+_SIGNAL_LIST_COLUMNS = (
+    Signal.id,
+    Signal.symbol,
+    Signal.action,
+    Signal.strategy_id,
+    Signal.quantity,
+    Signal.status,
+    Signal.error_message,
+    Signal.timestamp,
+    Signal.reason,
+    Signal.confidence,
+    Signal.tv_timestamp,
+)
+
+# API key del webhook público, pre-codificada para la comparación en tiempo constante
+_WEBHOOK_API_KEY: Optional[bytes] = (
+    settings.webhook_api_key.encode() if settings.webhook_api_key else None
+)
+
+# Parte constante de la respuesta de /webhook-health
+_HEALTH_STATIC = {
+    "status": "healthy",
+    "webhook_api_key_configured": settings.webhook_api_key is not None,
+    "target_user": None,
+    "endpoints": {
+        "authenticated": "/api/v1/webhook",
+        "public": "/api/v1/webhook-public",
+        "test": "/api/v1/test-webhook"
+    }
+}
+
+# Usuario destino del webhook público
+_TARGET_USERNAME = "reybel"
+_TARGET_USER_SQL = select(User.id, User.is_active, User.is_verified).where(
+    User.username == _TARGET_USERNAME
+)
+_target_user_id: Optional[int] = None
+
+
+def _lookup_target_user(db: Session):
+    """Fila ligera (id, is_active, is_verified) del usuario destino, sin hidratar ORM"""
+    return db.execute(_TARGET_USER_SQL).first()
+
+
+def _get_target_user(db: Session) -> Optional[User]:
+    """Cargar el usuario destino por PK, resolviendo su id solo la primera vez"""
+    global _target_user_id
+    if _target_user_id is not None:
+        user = db.get(User, _target_user_id)
+        if user is not None:
+            return user
+    row = _lookup_target_user(db)
+    _target_user_id = row.id if row else None
+    return db.get(User, row.id) if row else None
+
+
+def _webhook_response(status: str, message: str, signal_id: Optional[int] = None) -> ORJSONResponse:
+    """Respuesta con la forma de WebhookResponse, serializada directamente con orjson"""
+    return ORJSONResponse({"status": status, "message": message, "signal_id": signal_id})
 
 
 async def limit_rate(
@@ -51,13 +114,13 @@ async def receive_tradingview_webhook(
         
         # Mapear respuesta según el resultado
         if result["status"] == "accepted":
-            return WebhookResponse(
+            return _webhook_response(
                 status="success",
                 message=f"Signal accepted: {webhook_data.strategy_id} {webhook_data.action} {webhook_data.symbol} (user: {current_user.username})",
                 signal_id=result["signal_id"]
             )
         elif result["status"] == "duplicate":
-            return WebhookResponse(
+            return _webhook_response(
                 status="duplicate",
                 message="Signal already processed (duplicate detected)",
                 signal_id=None
@@ -68,7 +131,7 @@ async def receive_tradingview_webhook(
             if result.get('errors'):
                 error_msg += f" - Errors: {', '.join(result['errors'])}"
             
-            return WebhookResponse(
+            return _webhook_response(
                 status="error",
                 message=error_msg,
                 signal_id=result.get("signal_id")
@@ -92,51 +155,35 @@ async def get_signals(
 ):
     """Ver señales del usuario actual"""
 
+    # Proyectar solo las columnas que devuelve el endpoint (sin hidratar ORM)
+    stmt = select(
+        *_SIGNAL_LIST_COLUMNS,
+        (Signal.user_id if current_user.is_admin else null()).label("user_id"),  # Solo admin ve user_id
+    )
+
     # Filtrar señales por usuario
     skip = (page - 1) * limit
-    if current_user.is_admin:
-        # Admin puede ver todas las señales
-        signals = (
-            db.query(Signal)
-            .order_by(Signal.timestamp.desc())
-            .offset(skip)
-            .limit(limit)
-            .all()
-        )
-    else:
+    if not current_user.is_admin:
         # Usuario normal solo ve sus señales
         active_portfolio = portfolio_service.get_active(db, current_user)
         if not active_portfolio:
-            return []
-        signals = (
-            db.query(Signal)
-            .filter(
-                Signal.user_id == current_user.id,
-                Signal.portfolio_id == active_portfolio.id,
-            )
-            .order_by(Signal.timestamp.desc())
-            .offset(skip)
-            .limit(limit)
-            .all()
+            return ORJSONResponse([])
+        stmt = stmt.where(
+            Signal.user_id == current_user.id,
+            Signal.portfolio_id == active_portfolio.id,
         )
+    # Admin puede ver todas las señales
 
-    return [
-        {
-            "id": signal.id,
-            "symbol": signal.symbol,
-            "action": signal.action,
-            "strategy_id": signal.strategy_id,
-            "quantity": signal.quantity,
-            "status": signal.status,
-            "error_message": signal.error_message,
-            "timestamp": to_eastern(signal.timestamp),
-            "reason": signal.reason,
-            "confidence": signal.confidence,
-            "tv_timestamp": signal.tv_timestamp,
-            "user_id": signal.user_id if current_user.is_admin else None  # Solo admin ve user_id
-        }
-        for signal in signals
-    ]
+    rows = db.execute(
+        stmt.order_by(Signal.timestamp.desc()).offset(skip).limit(limit)
+    ).mappings().all()
+
+    signals = []
+    for row in rows:
+        signal = dict(row)
+        signal["timestamp"] = to_eastern(signal["timestamp"])
+        signals.append(signal)
+    return ORJSONResponse(signals)
 
 
 # FIXED: Endpoint público para webhooks externos usando usuario 'reybel'
@@ -162,17 +209,16 @@ async def receive_public_webhook(
         )
 
     # Verificar que la API key sea válida
-    expected_api_key = getattr(settings, 'webhook_api_key', None)
-    if not expected_api_key:
+    if not _WEBHOOK_API_KEY:
         logger.error("Webhook API key not configured in settings")
         raise HTTPException(status_code=500, detail="Webhook API key not configured")
 
-    if provided_api_key != expected_api_key:
+    if not hmac.compare_digest(provided_api_key.encode(), _WEBHOOK_API_KEY):
         logger.warning(f"Invalid API key provided: {provided_api_key}")
         raise HTTPException(status_code=401, detail="Invalid API key")
 
     # Buscar usuario 'reybel'
-    target_user = db.query(User).filter(User.username == "reybel").first()
+    target_user = _get_target_user(db)
 
     if not target_user:
         logger.error("User 'reybel' not found")
@@ -190,13 +236,13 @@ async def receive_public_webhook(
         
         # Mapear respuesta según el resultado
         if result["status"] == "accepted":
-            return WebhookResponse(
+            return _webhook_response(
                 status="success",
                 message=f"Signal accepted: {webhook_data.strategy_id} {webhook_data.action} {webhook_data.symbol} (user: reybel)",
                 signal_id=result["signal_id"]
             )
         elif result["status"] == "duplicate":
-            return WebhookResponse(
+            return _webhook_response(
                 status="duplicate",
                 message="Signal already processed (duplicate detected)",
                 signal_id=None
@@ -207,7 +253,7 @@ async def receive_public_webhook(
             if result.get('errors'):
                 error_msg += f" - Errors: {', '.join(result['errors'])}"
             
-            return WebhookResponse(
+            return _webhook_response(
                 status="error",
                 message=error_msg,
                 signal_id=result.get("signal_id")
@@ -286,7 +332,7 @@ async def webhook_health(db: Session = Depends(get_db)):
     """Health check for webhook endpoints"""
 
     # Verificar si el usuario reybel existe
-    reybel_user = db.query(User).filter(User.username == "reybel").first()
+    reybel_user = _lookup_target_user(db)
     reybel_status = "not_found"
     if reybel_user:
         if reybel_user.is_active:
@@ -294,20 +340,12 @@ async def webhook_health(db: Session = Depends(get_db)):
         else:
             reybel_status = "inactive"
 
-    return {
-        "status": "healthy",
-        "webhook_api_key_configured": hasattr(settings, 'webhook_api_key') and settings.webhook_api_key is not None,
-        "target_user": {
-            "username": "reybel",
-            "status": reybel_status,
-            "found": reybel_user is not None,
-            "active": reybel_user.is_active if reybel_user else False,
-            "verified": reybel_user.is_verified if reybel_user else False
-        },
-        "endpoints": {
-        "authenticated": "/api/v1/webhook",
-        "public": "/api/v1/webhook-public",
-        "test": "/api/v1/test-webhook"
+    response = dict(_HEALTH_STATIC)
+    response["target_user"] = {
+        "username": _TARGET_USERNAME,
+        "status": reybel_status,
+        "found": reybel_user is not None,
+        "active": reybel_user.is_active if reybel_user else False,
+        "verified": reybel_user.is_verified if reybel_user else False
     }
-    }
-
+    return ORJSONResponse(response)
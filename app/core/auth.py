@@ -1,14 +1,72 @@
 # backend/app/dependencies/auth.py
 
+import hashlib
+import time
+from typing import Optional
+
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.services.auth_service import auth_service
 from app.models.user import User
+from app.schemas.auth import TokenData
+from app.utils.ttl_cache import TTLCache
 
 # Configurar esquema de seguridad
-security = HTTPBearer()
+security = HTTPBearer(auto_error=False)
+
+
+def _credentials_exception() -> HTTPException:
+    """401 nuevo por raise: una instancia compartida cruzaría tracebacks entre requests"""
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+# Cachés en proceso: token verificado -> TokenData y email -> id de usuario.
+# Las claves de token son un hash blake2b (no se guardan tokens en memoria).
+# El User no se cachea: se carga por PK en la sesión de cada request (una
+# consulta por request, sin objetos ORM desacoplados compartidos)
+_TOKEN_CACHE = TTLCache(maxsize=10_000, ttl=60)
+_USER_ID_CACHE = TTLCache(maxsize=10_000, ttl=30)
+
+
+def _verify_token_cached(token: str) -> Optional[TokenData]:
+    """Verificar el JWT, reutilizando el resultado mientras siga en _TOKEN_CACHE.
+
+    Una entrada cacheada no sobrevive al ``exp`` del token.
+    """
+    key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+    token_data = _TOKEN_CACHE.get(key)
+    if token_data is not None and token_data.exp is not None and token_data.exp < time.time():
+        _TOKEN_CACHE.pop(key)
+        return None
+    if token_data is None:
+        token_data = auth_service.verify_token(token)
+        if token_data is not None:
+            _TOKEN_CACHE.set(key, token_data)
+    return token_data
+
+
+def _get_user_cached(db: Session, email: str) -> Optional[User]:
+    """Resolver el usuario por email.
+
+    Solo se cachea el id: se ahorra la búsqueda por email, pero el User se
+    sigue cargando por PK en cada request.
+    """
+    user_id = _USER_ID_CACHE.get(email)
+    if user_id is not None:
+        user = db.get(User, user_id)
+        if user is not None and user.email == email:
+            return user
+        _USER_ID_CACHE.pop(email)
+    user = auth_service.get_user_by_email(db, email=email)
+    if user is not None:
+        _USER_ID_CACHE.set(email, user.id)
+    return user
 
 
 async def get_current_user(
@@ -17,21 +75,18 @@ async def get_current_user(
 ) -> User:
     """Obtener usuario actual desde JWT token"""
 
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+    if credentials is None:
+        raise _credentials_exception()
 
     # Verificar token
-    token_data = auth_service.verify_token(credentials.credentials)
+    token_data = _verify_token_cached(credentials.credentials)
     if token_data is None:
-        raise credentials_exception
+        raise _credentials_exception()
 
     # Obtener usuario
-    user = auth_service.get_user_by_email(db, email=token_data.email)
+    user = _get_user_cached(db, token_data.email)
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
 
     # Verificar que esté activo
     if not user.is_active:
@@ -80,11 +135,11 @@ async def get_current_user_optional(
         if not credentials:
             return None
 
-        token_data = auth_service.verify_token(credentials.credentials)
+        token_data = _verify_token_cached(credentials.credentials)
         if token_data is None:
             return None
 
-        user = auth_service.get_user_by_email(db, email=token_data.email)
+        user = _get_user_cached(db, token_data.email)
         return user if user and user.is_active else None
 
     except Exception:
@@ -1,6 +1,6 @@
 from enum import Enum
-from typing import Optional, Dict, Any
-from pydantic import BaseModel
+from typing import Annotated, Optional, Dict, Any
+from pydantic import BaseModel, BeforeValidator
 from datetime import datetime
 
 class SignalAction(str, Enum):
@@ -31,6 +31,18 @@ class OrderStatus(str, Enum):
     REJECTED = "rejected"
     PENDING_CANCEL = "pending_cancel"
     PENDING_PARENT = "pending_parent"  # Esperando que se ejecute orden padre
+    ERROR = "error"  # Reintentos agotados / error de procesamiento
+
+
+# Grupos de estados usados en filtros y comprobaciones de pertenencia;
+# frozenset a nivel de módulo evita crear una lista nueva en cada llamada
+LIVE_ORDER_STATES = frozenset(
+    {OrderStatus.SENT, OrderStatus.ACCEPTED, OrderStatus.PARTIALLY_FILLED}
+)
+WORKING_ORDER_STATES = frozenset({OrderStatus.SENT, OrderStatus.ACCEPTED})
+TERMINAL_ORDER_STATES = frozenset(
+    {OrderStatus.FILLED, OrderStatus.CANCELED, OrderStatus.REJECTED}
+)
 
 
 class TradeStatus(str, Enum):
@@ -44,6 +56,16 @@ class OrderType(str, Enum):
     STOP = "stop"
     STOP_LIMIT = "stop_limit"
 
+def _parse_fired_at(value: Any) -> Any:
+    """datetime pasa tal cual; strings ISO 8601 con datetime.fromisoformat (C)"""
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return value  # que pydantic genere el error de validación
+    return value
+
+
 # Schemas para el flujo de datos
 class NormalizedSignal(BaseModel):
     """Señal normalizada después de procesar webhook"""
@@ -58,7 +80,7 @@ class NormalizedSignal(BaseModel):
     source: str = "tradingview"
     raw_payload: Dict[str, Any]
     idempotency_key: str
-    fired_at: datetime
+    fired_at: Annotated[datetime, BeforeValidator(_parse_fired_at)]
 
 class OrderIntent(BaseModel):
     """Intención de orden después de risk management"""
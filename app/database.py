@@ -1,14 +1,31 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Optional
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool, QueuePool
 from app.config import settings
 
+
+def _engine_options() -> dict:
+    """Pool configuration for the main engine."""
+    if settings.database_url.startswith("sqlite"):
+        # SQLite uses its own single-connection pools
+        return {}
+    if settings.db_use_pgbouncer:
+        return {"poolclass": NullPool}
+    return {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": True,
+    }
+
+
 # Create engine
-engine = create_engine(
-    settings.database_url,
-    pool_pre_ping=True,
-    pool_recycle=300,
-)
+engine = create_engine(settings.database_url, **_engine_options())
 
 # Create session
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -16,6 +33,34 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 # Base class for models
 Base = declarative_base()
 
+
+def warm_up_pool(count: Optional[int] = None) -> int:
+    """Open up to ``count`` pooled connections in parallel and return them to the pool.
+
+    ``count`` defaults to ``settings.db_pool_warmup``. Only applies to the
+    QueuePool engine (not SQLite or PgBouncer). Blocking: call it from a
+    worker thread at startup. Returns the number of connections opened.
+    """
+    if not isinstance(engine.pool, QueuePool):
+        return 0
+    if count is None:
+        count = settings.db_pool_warmup
+    count = min(count, settings.db_pool_size)
+    if count <= 0:
+        return 0
+    # Opened in parallel and held together: connecting and closing one by one
+    # would reuse a single connection
+    with ThreadPoolExecutor(max_workers=count, thread_name_prefix="db-warmup") as pool:
+        futures = [pool.submit(engine.connect) for _ in range(count)]
+    connections = [f.result() for f in futures if f.exception() is None]
+    for connection in connections:
+        connection.close()
+    for future in futures:
+        if future.exception() is not None:
+            raise future.exception()
+    return len(connections)
+
+
 # Dependency for FastAPI
 def get_db():
     db = SessionLocal()
@@ -24,3 +69,12 @@ def get_db():
     finally:
         db.close()
 
+
+@contextmanager
+def session_scope():
+    """Session for background work (scheduler ticks), closed on exit."""
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
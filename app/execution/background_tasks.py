@@ -23,19 +23,17 @@ class BackgroundTaskManager:
         logger.info("Starting execution background tasks...")
 
         try:
-            # Crear task para el scheduler
-            scheduler_task = asyncio.create_task(
-                execution_scheduler.start(),
-                name="execution_scheduler",
-            )
-            self.tasks.append(scheduler_task)
-
-            # Esperar a que todas las tareas terminen
-            await asyncio.gather(*self.tasks, return_exceptions=True)
-
-        except Exception as e:  # pragma: no cover - safeguard
-            logger.error(f"Error in background tasks: {e}")
-            await self.stop_all_tasks()
+            # TaskGroup: si una tarea falla cancela las demás; los errores llegan agrupados
+            async with asyncio.TaskGroup() as tg:
+                # Crear task para el scheduler
+                self.tasks.append(
+                    tg.create_task(execution_scheduler.start(), name="execution_scheduler")
+                )
+        except* Exception as eg:
+            for exc in eg.exceptions:
+                logger.error(f"Error in background tasks: {exc}")
+            self.is_running = False
+            self.tasks.clear()
 
     async def stop_all_tasks(self):
         """Detener todas las tareas en background"""
@@ -1,17 +1,41 @@
 """
 Bracket Order Processor - Maneja el ciclo de vida de bracket orders
 """
+import asyncio
 import logging
+from dataclasses import dataclass, field
 from typing import Dict, List, Any, Optional
 from decimal import Decimal
-from sqlalchemy.orm import Session
+from sqlalchemy import update
+from sqlalchemy.orm import Session, joinedload
 
 from app.models.order import Order
-from app.core.types import OrderStatus
+from app.core.types import OrderStatus, LIVE_ORDER_STATES, WORKING_ORDER_STATES
 from app.execution.order_executor import OrderExecutor
 
 logger = logging.getLogger(__name__)
 
+_LIVE_STATES = tuple(LIVE_ORDER_STATES)
+
+
+@dataclass(frozen=True, slots=True)
+class BracketActivationResult:
+    """Resultado de activar las órdenes hijas de un bracket"""
+    status: str
+    message: str = ""
+    activated_orders: List[int] = field(default_factory=list)
+    failed_orders: List[int] = field(default_factory=list)
+
+
+@dataclass(frozen=True, slots=True)
+class OCOResult:
+    """Resultado de aplicar la lógica OCO tras el fill de una orden hija"""
+    status: str
+    message: str = ""
+    filled_order_id: Optional[int] = None
+    cancelled_orders: List[int] = field(default_factory=list)
+    failed_cancellations: List[int] = field(default_factory=list)
+
 
 class BracketOrderProcessor:
     """Procesador especializado para bracket orders"""
@@ -20,47 +44,55 @@ class BracketOrderProcessor:
         self.db = db
         self.executor = OrderExecutor(self.db)
     
-    async def activate_bracket_orders(self, parent_order_id: int) -> Dict[str, Any]:
+    def _load_bracket(self, parent_order_id: int) -> Optional[Order]:
+        """Cargar la orden padre con sus órdenes hijas en una sola consulta"""
+        return (
+            self.db.query(Order)
+            .options(joinedload(Order.child_orders))
+            .filter(
+                Order.id == parent_order_id,
+                Order.is_bracket_parent == True
+            )
+            .first()
+        )
+    
+    async def activate_bracket_orders(self, parent_order_id: int) -> BracketActivationResult:
         """
         Activar órdenes hijas cuando la orden padre se ejecuta completamente
         """
         try:
-            # 1. Obtener orden padre
-            parent_order = self.db.query(Order).filter(
-                Order.id == parent_order_id,
-                Order.is_bracket_parent == True
-            ).first()
+            # 1. Obtener orden padre junto con sus hijas (un solo JOIN)
+            parent_order = self._load_bracket(parent_order_id)
             
             if not parent_order:
-                return {"status": "error", "message": "Parent order not found"}
+                return BracketActivationResult(status="error", message="Parent order not found")
             
             # 2. Verificar que la orden padre esté completamente ejecutada
             if parent_order.status != OrderStatus.FILLED:
-                return {
-                    "status": "waiting", 
-                    "message": "Parent order not fully filled yet"
-                }
+                return BracketActivationResult(
+                    status="waiting",
+                    message="Parent order not fully filled yet"
+                )
             
             # 3. Obtener órdenes hijas pendientes
-            child_orders = self.db.query(Order).filter(
-                Order.parent_order_id == parent_order_id,
-                Order.status == OrderStatus.PENDING_PARENT
-            ).all()
+            child_orders = [
+                child for child in parent_order.child_orders
+                if child.status == OrderStatus.PENDING_PARENT
+            ]
             
             if not child_orders:
-                return {
-                    "status": "error", 
-                    "message": "No pending child orders found"
-                }
+                return BracketActivationResult(
+                    status="error",
+                    message="No pending child orders found"
+                )
             
-            # 4. Activar cada orden hija
+            # 4. Activar cada orden hija (envíos al broker en paralelo)
             activated_orders = []
             failed_orders = []
             
-            for child_order in child_orders:
-                try:
-                    # Enviar orden al broker
-                    execution_result = await self.executor.execute_single_order(
+            execution_results = await asyncio.gather(
+                *(
+                    self.executor.execute_single_order(
                         symbol=child_order.symbol,
                         side=child_order.side,
                         quantity=child_order.quantity,
@@ -69,155 +101,213 @@ class BracketOrderProcessor:
                         stop_price=child_order.stop_price,
                         client_order_id=child_order.client_order_id
                     )
+                    for child_order in child_orders
+                ),
+                return_exceptions=True,
+            )
+            
+            # Filas para un único UPDATE por primary key (executemany)
+            child_updates = []
+            
+            for child_order, execution_result in zip(child_orders, execution_results):
+                try:
+                    if isinstance(execution_result, Exception):
+                        raise execution_result
                     
                     if execution_result["status"] == "success":
                         # Actualizar estado y broker order ID
-                        child_order.status = OrderStatus.SENT
-                        child_order.broker_order_id = execution_result.get("broker_order_id")
-                        child_order.notes = f"Activated from parent {parent_order_id}"
+                        child_updates.append({
+                            "id": child_order.id,
+                            "status": OrderStatus.SENT,
+                            "broker_order_id": execution_result.get("broker_order_id"),
+                            "notes": f"Activated from parent {parent_order_id}",
+                        })
                         activated_orders.append(child_order.id)
                         
                         logger.info(f"Activated child order {child_order.id} for parent {parent_order_id}")
                     else:
-                        child_order.status = OrderStatus.REJECTED
-                        child_order.notes = f"Failed to activate: {execution_result.get('message', 'Unknown error')}"
+                        child_updates.append({
+                            "id": child_order.id,
+                            "status": OrderStatus.REJECTED,
+                            "broker_order_id": child_order.broker_order_id,
+                            "notes": f"Failed to activate: {execution_result.get('message', 'Unknown error')}",
+                        })
                         failed_orders.append(child_order.id)
                         
                         logger.error(f"Failed to activate child order {child_order.id}: {execution_result}")
                         
                 except Exception as e:
-                    child_order.status = OrderStatus.REJECTED
-                    child_order.notes = f"Activation error: {str(e)}"
+                    child_updates.append({
+                        "id": child_order.id,
+                        "status": OrderStatus.REJECTED,
+                        "broker_order_id": child_order.broker_order_id,
+                        "notes": f"Activation error: {str(e)}",
+                    })
                     failed_orders.append(child_order.id)
                     logger.error(f"Error activating child order {child_order.id}: {str(e)}")
             
-            # 5. Commit cambios
-            self.db.commit()
+            # 5. Persistir todas las hijas en un solo UPDATE y commit (solo si hubo cambios)
+            if child_updates:
+                self.db.execute(update(Order), child_updates)
+                self.db.commit()
             
-            return {
-                "status": "success" if activated_orders else "partial_failure",
-                "activated_orders": activated_orders,
-                "failed_orders": failed_orders,
-                "message": f"Activated {len(activated_orders)} of {len(child_orders)} child orders"
-            }
+            return BracketActivationResult(
+                status="success" if activated_orders else "partial_failure",
+                activated_orders=activated_orders,
+                failed_orders=failed_orders,
+                message=f"Activated {len(activated_orders)} of {len(child_orders)} child orders"
+            )
             
         except Exception as e:
             self.db.rollback()
             logger.error(f"Error activating bracket orders for parent {parent_order_id}: {str(e)}")
-            return {"status": "error", "message": str(e)}
+            return BracketActivationResult(status="error", message=str(e))
     
-    async def handle_child_order_fill(self, filled_order_id: int) -> Dict[str, Any]:
+    async def handle_child_order_fill(self, filled_order_id: int) -> OCOResult:
         """
         Manejar cuando una orden hija (SL o TP) se ejecuta - Lógica OCO
         """
         try:
-            # 1. Obtener la orden que se ejecutó
-            filled_order = self.db.query(Order).filter(Order.id == filled_order_id).first()
+            # 1. Obtener la orden que se ejecutó, su padre y hermanas (un solo JOIN)
+            filled_order = (
+                self.db.query(Order)
+                .options(joinedload(Order.parent_order).joinedload(Order.child_orders))
+                .filter(Order.id == filled_order_id)
+                .first()
+            )
             
             if not filled_order or not filled_order.parent_order_id:
-                return {"status": "error", "message": "Order is not a child order"}
+                return OCOResult(status="error", message="Order is not a child order")
             
             # 2. Obtener órdenes hermanas (sibling orders)
-            sibling_orders = self.db.query(Order).filter(
-                Order.parent_order_id == filled_order.parent_order_id,
-                Order.id != filled_order_id,
-                Order.status.in_([OrderStatus.SENT, OrderStatus.ACCEPTED, OrderStatus.PARTIALLY_FILLED])
-            ).all()
+            siblings = filled_order.parent_order.child_orders if filled_order.parent_order else []
+            sibling_orders = [
+                sibling for sibling in siblings
+                if sibling.id != filled_order_id and sibling.status in LIVE_ORDER_STATES
+            ]
             
             # 3. Cancelar órdenes hermanas (OCO Logic)
             cancelled_orders = []
             failed_cancellations = []
             
-            for sibling in sibling_orders:
+            # Cancelar en el broker con una sola llamada batch
+            cancellable = [sibling for sibling in sibling_orders if sibling.broker_order_id]
+            cancel_results = []
+            if cancellable:
+                cancel_results = await self.executor.cancel_orders(
+                    [sibling.broker_order_id for sibling in cancellable]
+                )
+            
+            for sibling, cancel_result in zip(cancellable, cancel_results):
                 try:
-                    if sibling.broker_order_id:
-                        # Cancelar en el broker
-                        cancel_result = await self.executor.cancel_order(sibling.broker_order_id)
-                        
-                        if cancel_result["status"] == "success":
-                            sibling.status = OrderStatus.CANCELED
-                            sibling.notes = f"OCO cancelled - sibling {filled_order_id} filled"
-                            cancelled_orders.append(sibling.id)
-                            logger.info(f"OCO: Cancelled order {sibling.id} because {filled_order_id} filled")
-                        else:
-                            failed_cancellations.append(sibling.id)
-                            logger.error(f"Failed to cancel sibling order {sibling.id}: {cancel_result}")
+                    if isinstance(cancel_result, Exception):
+                        raise cancel_result
+                    
+                    if cancel_result["status"] == "success":
+                        cancelled_orders.append(sibling.id)
+                        logger.info(f"OCO: Cancelled order {sibling.id} because {filled_order_id} filled")
+                    else:
+                        failed_cancellations.append(sibling.id)
+                        logger.error(f"Failed to cancel sibling order {sibling.id}: {cancel_result}")
                     
                 except Exception as e:
                     failed_cancellations.append(sibling.id)
                     logger.error(f"Error cancelling sibling order {sibling.id}: {str(e)}")
             
-            # 4. Marcar bracket como completado
-            parent_order = self.db.query(Order).filter(
-                Order.id == filled_order.parent_order_id
-            ).first()
+            dirty = bool(cancelled_orders)
+            if cancelled_orders:
+                # Un único UPDATE; solo hermanas aún vivas (una que se haya llenado
+                # en paralelo no pasa a CANCELED). "evaluate" sincroniza la sesión
+                # en Python, sin SELECT adicional
+                self.db.execute(
+                    update(Order)
+                    .where(
+                        Order.parent_order_id == filled_order.parent_order_id,
+                        Order.id.in_(cancelled_orders),
+                        Order.status.in_(_LIVE_STATES),
+                    )
+                    .values(
+                        status=OrderStatus.CANCELED,
+                        notes=f"OCO cancelled - sibling {filled_order_id} filled",
+                    )
+                    .execution_options(synchronize_session="evaluate")
+                )
+            
+            # 4. Marcar bracket como completado (padre ya cargado con el JOIN inicial)
+            parent_order = filled_order.parent_order
             
             if parent_order:
-                parent_order.notes = f"Bracket completed - {filled_order.order_type} executed"
+                completed_note = f"Bracket completed - {filled_order.order_type} executed"
+                if parent_order.notes != completed_note:
+                    parent_order.notes = completed_note
+                    dirty = True
             
-            # 5. Commit cambios
-            self.db.commit()
+            # 5. Commit cambios (evitar el round-trip si no hubo cambios)
+            if dirty:
+                self.db.commit()
             
-            return {
-                "status": "success",
-                "filled_order_id": filled_order_id,
-                "cancelled_orders": cancelled_orders,
-                "failed_cancellations": failed_cancellations,
-                "message": f"OCO processed: cancelled {len(cancelled_orders)} sibling orders"
-            }
+            return OCOResult(
+                status="success",
+                filled_order_id=filled_order_id,
+                cancelled_orders=cancelled_orders,
+                failed_cancellations=failed_cancellations,
+                message=f"OCO processed: cancelled {len(cancelled_orders)} sibling orders"
+            )
             
         except Exception as e:
             self.db.rollback()
             logger.error(f"Error handling child order fill {filled_order_id}: {str(e)}")
-            return {"status": "error", "message": str(e)}
+            return OCOResult(status="error", message=str(e))
     
     def get_bracket_status(self, parent_order_id: int) -> Dict[str, Any]:
         """
         Obtener estado completo de una bracket order
         """
         try:
-            parent_order = self.db.query(Order).filter(
-                Order.id == parent_order_id,
-                Order.is_bracket_parent == True
-            ).first()
+            parent_order = self._load_bracket(parent_order_id)
             
             if not parent_order:
                 return {"status": "error", "message": "Bracket order not found"}
             
-            child_orders = self.db.query(Order).filter(
-                Order.parent_order_id == parent_order_id
-            ).all()
-            
-            return {
-                "status": "success",
-                "parent_order": {
-                    "id": parent_order.id,
-                    "status": parent_order.status,
-                    "symbol": parent_order.symbol,
-                    "quantity": parent_order.quantity,
-                    "filled_quantity": getattr(
-                        parent_order,
-                        "filled_quantity",
-                        getattr(parent_order, "filled_qty", 0),
-                    )
-                    or 0
-                },
-                "child_orders": [
-                    {
-                        "id": child.id,
-                        "type": child.order_type,
-                        "status": child.status,
-                        "price": child.limit_price or child.stop_price,
-                        "broker_order_id": child.broker_order_id
-                    }
-                    for child in child_orders
-                ],
-                "bracket_active": any(
-                    child.status in [OrderStatus.SENT, OrderStatus.ACCEPTED] 
-                    for child in child_orders
-                )
-            }
+            return self.get_bracket_status_from_loaded(parent_order)
             
         except Exception as e:
             logger.error(f"Error getting bracket status {parent_order_id}: {str(e)}")
             return {"status": "error", "message": str(e)}
+    
+    def get_bracket_status_from_loaded(self, parent_order: Order) -> Dict[str, Any]:
+        """
+        Estado de una bracket order cuyo padre ya trae child_orders cargadas
+        (no emite consultas)
+        """
+        child_orders = parent_order.child_orders
+        
+        return {
+            "status": "success",
+            "parent_order": {
+                "id": parent_order.id,
+                "status": parent_order.status,
+                "symbol": parent_order.symbol,
+                "quantity": parent_order.quantity,
+                "filled_quantity": getattr(
+                    parent_order,
+                    "filled_quantity",
+                    getattr(parent_order, "filled_qty", 0),
+                )
+                or 0
+            },
+            "child_orders": [
+                {
+                    "id": child.id,
+                    "type": child.order_type,
+                    "status": child.status,
+                    "price": child.limit_price or child.stop_price,
+                    "broker_order_id": child.broker_order_id
+                }
+                for child in child_orders
+            ],
+            "bracket_active": any(
+                child.status in WORKING_ORDER_STATES
+                for child in child_orders
+            )
+        }
@@ -1,108 +1,151 @@
 from sqlalchemy.orm import Session
 from app.models.order import Order
 from app.core.types import OrderStatus, OrderType
-from app.integrations.alpaca.client import AlpacaClient
-from typing import Optional, Dict, Any
+from app.integrations.alpaca.client import alpaca_client
+from app.utils.circuit_breaker import CircuitBreaker, CircuitBreakerError
+from typing import Optional, Dict, Any, List
+from datetime import datetime, timedelta
 from decimal import Decimal
 import logging
+import random
 
 logger = logging.getLogger(__name__)
 
 
+def _is_broker_outage(exc: Exception) -> bool:
+    """Fallos del broker (red, timeouts, 5xx/429), no rechazos propios de la orden"""
+    status_code = getattr(exc, "status_code", None)
+    if status_code is None:
+        status_code = getattr(getattr(exc, "response", None), "status_code", None)
+    if status_code is not None:
+        return status_code == 429 or status_code >= 500
+    # TimeoutError, ConnectionError y los errores de transporte de requests
+    return isinstance(exc, OSError)
+
+
+# Breaker compartido para los envíos al broker: tras 5 fallos seguidos las
+# órdenes se reprograman sin llamar a Alpaca hasta que pase reset_timeout.
+# Los 4xx (buying power, símbolo inválido...) no cuentan: Alpaca sí respondió
+_SUBMIT_BREAKER = CircuitBreaker(
+    fail_max=5, reset_timeout=30, name="alpaca-submit", is_failure=_is_broker_outage
+)
+
+
 class BrokerExecutor:
     """Ejecuta órdenes en el broker con retry y manejo de errores"""
 
     def __init__(self, db: Session):
         self.db = db
-        self.broker = AlpacaClient()
+        # Cliente global compartido (se refresca al activar un portfolio)
+        self.broker = alpaca_client
         self.max_retries = 3
-        self.retry_delays = [1, 2, 5]  # segundos entre intentos
+        # Backoff exponencial con jitter (segundos)
+        self.base_delay = 0.5
+        self.cap_delay = 30.0
+
+    def _compute_backoff(self, attempt: int) -> float:
+        """Delay aleatorio entre base_delay y base_delay * 2**attempt (tope cap_delay)"""
+        return random.uniform(
+            self.base_delay, min(self.cap_delay, self.base_delay * (2 ** attempt))
+        )
 
     def execute_order(self, order: Order) -> Dict[str, Any]:
-        """Ejecutar una orden en el broker con retry automático"""
+        """Ejecutar una orden en el broker con retry automático.
+
+        Solo modifica la orden en la sesión: el commit (y el bloqueo de la
+        fila) corresponden al llamador.
+        """
 
         try:
-            with self.db.begin():
-                # Actualizar estado a "enviando"
-                order.status = OrderStatus.SENT
-                self.db.flush()
-
-                logger.info(
-                    f"Executing order {order.client_order_id}: {order.side} {order.quantity} {order.symbol}"
-                )
-
-                # Determinar si es crypto o stock
-                if self._is_crypto_symbol(order.symbol):
-                    broker_order = self._execute_crypto_order(order)
-                else:
-                    broker_order = self._execute_stock_order(order)
-
-                if not broker_order:
-                    raise Exception("Broker returned None for order")
-
-                # Actualizar orden con respuesta del broker
-                order.broker_order_id = str(broker_order.id)
-                order.status = OrderStatus.ACCEPTED
-                order.last_error = None
-                self.db.flush()
-
-                logger.info(
-                    f"Order {order.client_order_id} accepted by broker: {broker_order.id}"
-                )
+            # Actualizar estado a "enviando"
+            order.status = OrderStatus.SENT
+
+            logger.info(
+                f"Executing order {order.client_order_id}: {order.side} {order.quantity} {order.symbol}"
+            )
+
+            # Determinar si es crypto o stock
+            if self._is_crypto_symbol(order.symbol):
+                broker_order = _SUBMIT_BREAKER.call(self._execute_crypto_order, order)
+            else:
+                broker_order = _SUBMIT_BREAKER.call(self._execute_stock_order, order)
+
+            if not broker_order:
+                raise Exception("Broker returned None for order")
+
+        except CircuitBreakerError as e:
+            return self._defer_order(order, str(e))
+
+        except Exception as e:
+            return self._schedule_retry(order, str(e))
+
+        # Actualizar orden con respuesta del broker
+        order.broker_order_id = str(broker_order.id)
+        order.status = OrderStatus.ACCEPTED
+        order.last_error = None
+        order.next_retry_at = None
 
+        logger.info(
+            f"Order {order.client_order_id} accepted by broker: {broker_order.id}"
+        )
+
+        return {
+            "success": True,
+            "broker_order_id": broker_order.id,
+            "status": "accepted",
+        }
+
+    def _schedule_retry(self, order: Order, error_msg: str) -> Dict[str, Any]:
+        """Programar un reintento con backoff, o marcar ERROR si se agotaron"""
+        logger.error(f"Order {order.client_order_id} failed: {error_msg}")
+
+        order.retry_count = (order.retry_count or 0) + 1
+
+        if order.retry_count >= self.max_retries:
+            # Max retries alcanzado
+            order.status = OrderStatus.ERROR
+            order.next_retry_at = None
+            order.last_error = f"Max retries exceeded: {error_msg}"
             return {
-                "success": True,
-                "broker_order_id": broker_order.id,
-                "status": "accepted",
+                "success": False,
+                "retry_scheduled": False,
+                "error": f"Max retries exceeded: {error_msg}",
             }
 
-        except Exception as e:
-            error_msg = str(e)
-            logger.error(f"Order {order.client_order_id} failed: {error_msg}")
-
-            try:
-                self.db.rollback()
-            except Exception as rollback_error:
-                logger.error(
-                    f"Rollback failed for order {order.client_order_id}: {rollback_error}"
-                )
-                return {
-                    "success": False,
-                    "retry_scheduled": False,
-                    "error": f"Rollback failed: {rollback_error}",
-                }
-
-            with self.db.begin():
-                order.retry_count += 1
-
-                if order.retry_count < self.max_retries:
-                    # Programar retry
-                    order.status = OrderStatus.NEW  # Volver a NEW para retry
-                    order.last_error = f"Retry {order.retry_count}: {error_msg}"
-                else:
-                    # Max retries alcanzado
-                    order.status = OrderStatus.ERROR
-                    order.last_error = f"Max retries exceeded: {error_msg}"
-
-            if order.retry_count < self.max_retries:
-                delay = self.retry_delays[
-                    min(order.retry_count - 1, len(self.retry_delays) - 1)
-                ]
-                logger.info(
-                    f"Will retry order {order.client_order_id} in {delay} seconds"
-                )
-                return {
-                    "success": False,
-                    "retry_scheduled": True,
-                    "retry_in_seconds": delay,
-                    "error": error_msg,
-                }
-            else:
-                return {
-                    "success": False,
-                    "retry_scheduled": False,
-                    "error": f"Max retries exceeded: {error_msg}",
-                }
+        # Programar retry: el scheduler la recoge a partir de next_retry_at
+        delay = self._compute_backoff(order.retry_count)
+        next_retry_at = datetime.utcnow() + timedelta(seconds=delay)
+        order.status = OrderStatus.NEW  # Volver a NEW para retry
+        order.next_retry_at = next_retry_at
+        order.last_error = f"Retry {order.retry_count}: {error_msg}"
+
+        logger.info(
+            f"Will retry order {order.client_order_id} in {delay:.1f} seconds"
+        )
+        return {
+            "success": False,
+            "retry_scheduled": True,
+            "next_retry_at": next_retry_at,
+            "error": error_msg,
+        }
+
+    def _defer_order(self, order: Order, error_msg: str) -> Dict[str, Any]:
+        """Reprogramar una orden rechazada por el breaker (no consume reintentos)"""
+        delay = _SUBMIT_BREAKER.remaining() or _SUBMIT_BREAKER.reset_timeout
+        logger.warning(
+            f"Order {order.client_order_id} deferred {delay:.1f}s: {error_msg}"
+        )
+        next_retry_at = datetime.utcnow() + timedelta(seconds=delay)
+        order.status = OrderStatus.NEW
+        order.next_retry_at = next_retry_at
+        order.last_error = f"Broker unavailable: {error_msg}"
+
+        return {
+            "success": False,
+            "retry_scheduled": True,
+            "next_retry_at": next_retry_at,
+            "error": error_msg,
+        }
 
     def _execute_stock_order(self, order: Order) -> Any:
         """Ejecutar orden de acciones"""
@@ -127,34 +170,58 @@ class BrokerExecutor:
         """Determinar si el símbolo es crypto"""
         return self.broker.is_crypto_symbol(symbol)
 
-    def get_order_status(self, order: Order) -> Optional[Dict[str, Any]]:
+    def get_order_status(self, broker_order_id: Optional[str]) -> Optional[Dict[str, Any]]:
         """Consultar estado actual de una orden en el broker"""
-        if not order.broker_order_id:
+        if not broker_order_id:
             return None
 
         try:
             # Obtener orden del broker
-            broker_order = self.broker.get_order(order.broker_order_id)
+            broker_order = self.broker.get_order(broker_order_id)
 
             if broker_order:
-                return {
-                    "broker_order_id": order.broker_order_id,
-                    "status": str(getattr(broker_order, "status", "unknown")),
-                    "filled_qty": Decimal(
-                        str(getattr(broker_order, "filled_qty", 0) or 0)
-                    ),
-                    "filled_avg_price": Decimal(
-                        str(getattr(broker_order, "filled_avg_price", 0) or 0)
-                    ),
-                }
+                return self._status_from_broker_order(broker_order_id, broker_order)
 
         except Exception as e:
             logger.error(
-                f"Error getting order status for {order.broker_order_id}: {e}"
+                f"Error getting order status for {broker_order_id}: {e}"
             )
 
         return None
 
+    def get_orders_status_bulk(
+        self, broker_order_ids: List[str], after: Optional[datetime] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """Estado de varias órdenes en una sola consulta de listado al broker"""
+        if not broker_order_ids:
+            return {}
+
+        try:
+            broker_orders = self.broker.get_orders_by_id(broker_order_ids, after=after)
+        except Exception as e:
+            logger.error(f"Error getting bulk order status: {e}")
+            return {}
+
+        return {
+            broker_order_id: self._status_from_broker_order(broker_order_id, broker_order)
+            for broker_order_id, broker_order in broker_orders.items()
+        }
+
+    @staticmethod
+    def _status_from_broker_order(broker_order_id: str, broker_order: Any) -> Dict[str, Any]:
+        status = getattr(broker_order, "status", "unknown")
+        return {
+            "broker_order_id": broker_order_id,
+            # Enum de alpaca-py: str() da "OrderStatus.FILLED", se usa el valor
+            "status": str(getattr(status, "value", status)),
+            "filled_qty": Decimal(
+                str(getattr(broker_order, "filled_qty", 0) or 0)
+            ),
+            "filled_avg_price": Decimal(
+                str(getattr(broker_order, "filled_avg_price", 0) or 0)
+            ),
+        }
+
     def cancel_order(self, order: Order) -> bool:
         """Cancelar una orden en el broker"""
         if not order.broker_order_id:
@@ -1,13 +1,16 @@
+import asyncio
 import logging
+from dataclasses import asdict
 from datetime import datetime
 from typing import Any, Dict, List, Optional, TYPE_CHECKING
 from uuid import uuid4
 
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.orm import Session, aliased, selectinload
 
 from app.database import SessionLocal
 from app.models.order import Order
-from app.core.types import OrderStatus, OrderType
+from app.core.types import OrderStatus, OrderType, WORKING_ORDER_STATES
 
 # NOTE: BracketOrderProcessor is imported for type checking to avoid
 # circular import issues at runtime.
@@ -16,6 +19,29 @@ if TYPE_CHECKING:  # pragma: no cover - used only for type hints
 
 logger = logging.getLogger(__name__)
 
+# Estados por defecto de los padres en los listados de bracket orders activas
+_ACTIVE_BRACKET_STATES = (OrderStatus.FILLED, OrderStatus.SENT, OrderStatus.ACCEPTED)
+
+
+def _bracket_parent_criteria(
+    user_id: Optional[int],
+    statuses: Optional[List[OrderStatus]],
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+) -> List[Any]:
+    """Filtros comunes de los listados de bracket orders activas"""
+    criteria = [
+        Order.is_bracket_parent == True,  # noqa: E712
+        Order.status.in_(statuses or _ACTIVE_BRACKET_STATES),
+    ]
+    if user_id:
+        criteria.append(Order.user_id == user_id)
+    if start_date:
+        criteria.append(Order.created_at >= start_date)
+    if end_date:
+        criteria.append(Order.created_at <= end_date)
+    return criteria
+
 
 class OrderExecutor:
     """Basic order execution and fill handling service."""
@@ -54,6 +80,18 @@ class OrderExecutor:
         logger.info("Simulated cancel of broker order %s", broker_order_id)
         return {"status": "success", "broker_order_id": broker_order_id}
 
+    async def cancel_orders(self, broker_order_ids: List[str]) -> List[Any]:
+        """Cancel several broker orders concurrently.
+
+        Alpaca only offers cancel-all, not cancellation of an explicit list of
+        orders, so the individual cancellations are issued concurrently.
+        Results come back in input order; failures are returned as exceptions.
+        """
+        return await asyncio.gather(
+            *(self.cancel_order(broker_order_id) for broker_order_id in broker_order_ids),
+            return_exceptions=True,
+        )
+
     async def get_market_hours(self, symbol: str) -> Dict[str, Any]:
         """Check with the broker if the market for ``symbol`` is open.
 
@@ -63,29 +101,34 @@ class OrderExecutor:
         "status": "unknown"}``.
         """
         try:
-            from app.integrations.alpaca.client import AlpacaClient, _in_regular_trading_hours
+            # Las llamadas REST de Alpaca son bloqueantes: fuera del event loop
+            return await asyncio.to_thread(self._check_market_hours, symbol)
+
+        except Exception as e:  # pragma: no cover - best effort
+            logger.warning("Market hours check failed for %s: %s", symbol, str(e))
+            return {"is_open": False, "status": "unknown"}
 
-            client = AlpacaClient()
+    def _check_market_hours(self, symbol: str) -> Dict[str, Any]:
+        """Synchronous part of :meth:`get_market_hours` (runs in a worker thread)."""
+        from app.integrations.alpaca.client import alpaca_client, _in_regular_trading_hours
 
-            # Crypto markets trade 24/7
-            if client.is_crypto_symbol(symbol):
-                return {"is_open": True, "status": "open"}
+        client = alpaca_client
 
-            trading = client.api
-            if trading:
-                clock = trading.get_clock()
-                is_open = bool(getattr(clock, "is_open", False))
-                status = "open" if is_open else "closed"
-                return {"is_open": is_open, "status": status}
+        # Crypto markets trade 24/7
+        if client.is_crypto_symbol(symbol):
+            return {"is_open": True, "status": "open"}
 
-            # Fallback to local time check if broker client isn't available
-            is_open = _in_regular_trading_hours()
+        trading = client.api
+        if trading:
+            clock = trading.get_clock()
+            is_open = bool(getattr(clock, "is_open", False))
             status = "open" if is_open else "closed"
             return {"is_open": is_open, "status": status}
 
-        except Exception as e:  # pragma: no cover - best effort
-            logger.warning("Market hours check failed for %s: %s", symbol, str(e))
-            return {"is_open": False, "status": "unknown"}
+        # Fallback to local time check if broker client isn't available
+        is_open = _in_regular_trading_hours()
+        status = "open" if is_open else "closed"
+        return {"is_open": is_open, "status": status}
 
     async def _get_order_status_from_broker(self, broker_order_id: str) -> Optional[str]:
         """Obtener el estado actual de una orden desde el broker.
@@ -98,13 +141,9 @@ class OrderExecutor:
             from app.execution.broker_executor import BrokerExecutor
 
             broker_exec = BrokerExecutor(self.db)
-            order = self.db.query(Order).filter(
-                Order.broker_order_id == broker_order_id
-            ).first()
-            if not order:
-                order = Order(broker_order_id=broker_order_id)
-
-            status_info = broker_exec.get_order_status(order)
+            status_info = await asyncio.to_thread(
+                broker_exec.get_order_status, broker_order_id
+            )
             if status_info:
                 return str(status_info.get("status"))
         except Exception as e:  # pragma: no cover - best effort logging
@@ -122,7 +161,6 @@ class OrderExecutor:
             order.filled_quantity = filled_qty
             order.avg_fill_price = fill_data.get("avg_price", 0.0)
             order.status = OrderStatus.FILLED
-            order.updated_at = datetime.utcnow()
 
             # Log del fill
             logger.info(
@@ -160,7 +198,7 @@ class OrderExecutor:
                     filled_order.id
                 )
 
-                if activation_result["status"] == "success":
+                if activation_result.status == "success":
                     logger.info(
                         "Successfully activated bracket orders for parent %s",
                         filled_order.id,
@@ -181,8 +219,8 @@ class OrderExecutor:
                     filled_order.id
                 )
 
-                if oco_result["status"] == "success":
-                    cancelled_count = len(oco_result["cancelled_orders"])
+                if oco_result.status == "success":
+                    cancelled_count = len(oco_result.cancelled_orders)
                     logger.info(
                         "OCO processed: cancelled %s sibling orders", cancelled_count
                     )
@@ -212,25 +250,12 @@ class OrderExecutor:
         try:
             from app.execution.bracket_order_processor import BracketOrderProcessor
 
-            query = self.db.query(Order).filter(Order.is_bracket_parent == True)  # noqa: E712
-
-            if statuses:
-                query = query.filter(Order.status.in_(statuses))
-            else:
-                query = query.filter(
-                    Order.status.in_(
-                        [OrderStatus.FILLED, OrderStatus.SENT, OrderStatus.ACCEPTED]
-                    )
-                )
-
-            if user_id:
-                query = query.filter(Order.user_id == user_id)
-
-            if start_date:
-                query = query.filter(Order.created_at >= start_date)
-
-            if end_date:
-                query = query.filter(Order.created_at <= end_date)
+            # Hijas precargadas en una sola consulta extra (selectin), sin N+1
+            query = (
+                self.db.query(Order)
+                .options(selectinload(Order.child_orders))
+                .filter(*_bracket_parent_criteria(user_id, statuses, start_date, end_date))
+            )
 
             if offset:
                 query = query.offset(offset)
@@ -241,18 +266,96 @@ class OrderExecutor:
             parent_orders = query.all()
             bracket_processor = BracketOrderProcessor(self.db)
 
-            bracket_statuses: List[Dict[str, Any]] = []
-            for parent in parent_orders:
-                status = bracket_processor.get_bracket_status(parent.id)
-                if status["status"] == "success":
-                    bracket_statuses.append(status)
-
-            return bracket_statuses
+            return [
+                bracket_processor.get_bracket_status_from_loaded(parent)
+                for parent in parent_orders
+            ]
 
         except Exception as e:  # pragma: no cover - defensive logging
             logger.error("Error getting active bracket orders: %s", str(e))
             return []
 
+    def get_active_bracket_columns(
+        self,
+        user_id: Optional[int] = None,
+        statuses: Optional[List[OrderStatus]] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+    ) -> Dict[str, List[Any]]:
+        """Bracket orders activas en formato columnar (una lista por campo).
+
+        Mismos filtros que :meth:`get_active_bracket_orders`; padres e hijas
+        salen de una única consulta (LEFT JOIN sobre los padres paginados) sin
+        construir objetos ORM. Los campos de hijas son listas de listas,
+        alineadas por posición con ``parent_ids``.
+        """
+        parents = (
+            select(Order.id, Order.symbol, Order.status, Order.quantity, Order.filled_quantity)
+            .where(*_bracket_parent_criteria(user_id, statuses, start_date, end_date))
+            .order_by(Order.id)
+            .offset(offset or None)
+            .limit(limit or None)
+            .subquery()
+        )
+        child = aliased(Order)
+        rows = self.db.execute(
+            select(
+                parents,
+                child.id,
+                child.order_type,
+                child.status,
+                child.limit_price,
+                child.stop_price,
+                child.broker_order_id,
+            )
+            .outerjoin(child, child.parent_order_id == parents.c.id)
+            .order_by(parents.c.id, child.id)
+        ).all()
+
+        columns: Dict[str, List[Any]] = {
+            "parent_ids": [],
+            "symbols": [],
+            "statuses": [],
+            "quantities": [],
+            "filled_quantities": [],
+            "child_ids": [],
+            "child_types": [],
+            "child_statuses": [],
+            "child_prices": [],
+            "child_broker_order_ids": [],
+            "bracket_active": [],
+        }
+        for (
+            parent_id, symbol, status, quantity, filled_quantity,
+            child_id, child_type, child_status, limit_price, stop_price, broker_order_id,
+        ) in rows:
+            if not columns["parent_ids"] or columns["parent_ids"][-1] != parent_id:
+                columns["parent_ids"].append(parent_id)
+                columns["symbols"].append(symbol)
+                columns["statuses"].append(status)
+                columns["quantities"].append(float(quantity or 0))
+                columns["filled_quantities"].append(float(filled_quantity or 0))
+                columns["child_ids"].append([])
+                columns["child_types"].append([])
+                columns["child_statuses"].append([])
+                columns["child_prices"].append([])
+                columns["child_broker_order_ids"].append([])
+                columns["bracket_active"].append(False)
+            if child_id is None:
+                continue
+            price = limit_price or stop_price
+            columns["child_ids"][-1].append(child_id)
+            columns["child_types"][-1].append(child_type)
+            columns["child_statuses"][-1].append(child_status)
+            columns["child_prices"][-1].append(float(price) if price is not None else None)
+            columns["child_broker_order_ids"][-1].append(broker_order_id)
+            if child_status in WORKING_ORDER_STATES:
+                columns["bracket_active"][-1] = True
+
+        return columns
+
     async def force_bracket_reconciliation(
         self, parent_order_id: int
     ) -> Dict[str, Any]:
@@ -268,9 +371,9 @@ class OrderExecutor:
             if current_status["status"] != "success":
                 return current_status
 
-            parent_order = (
-                self.db.query(Order).filter(Order.id == parent_order_id).first()
-            )
+            # get_bracket_status ya cargó padre e hijas: Session.get lo toma
+            # del identity map sin emitir otra consulta
+            parent_order = self.db.get(Order, parent_order_id)
 
             # Si el parent está filled pero las child orders siguen pending_parent
             if parent_order and (
@@ -281,7 +384,7 @@ class OrderExecutor:
                 )
             ):
                 logger.info("Force reconciling bracket %s", parent_order_id)
-                return await bracket_processor.activate_bracket_orders(parent_order_id)
+                return asdict(await bracket_processor.activate_bracket_orders(parent_order_id))
 
             return {
                 "status": "no_action_needed",
@@ -321,7 +424,7 @@ class OrderExecutor:
             # Cleanup test data
             self.db.rollback()
 
-            return {"test_result": result, "message": "Bracket flow test completed"}
+            return {"test_result": asdict(result), "message": "Bracket flow test completed"}
 
         except Exception as e:  # pragma: no cover - defensive logging
             self.db.rollback()
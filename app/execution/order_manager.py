@@ -1,20 +1,104 @@
+from sqlalchemy import event, lambda_stmt, select
 from sqlalchemy.orm import Session
 from app.models.order import Order
 from app.models.signal import Signal
-from app.core.types import OrderStatus, OrderType, SignalAction
-from app.core.auth import get_current_verified_user
+from app.core.types import OrderStatus, OrderType, SignalAction, TERMINAL_ORDER_STATES
 from typing import Optional, Dict, Any, List
-import uuid
-from datetime import datetime
+import os
+import time
 import logging
 from decimal import Decimal
-from app.services.order_executor import OrderExecutor
+from app.services.order_executor import OrderExecutor, order_executor as _shared_order_executor
 from app.services.exit_rules_service import ExitRulesService
+from app.integrations import broker_client
 from app.models.strategy_exit_rules import StrategyExitRules
+from app.utils.ttl_cache import TTLCache
+from app.utils.time import utc_now
+from app.utils.wakeup import Wakeup
 
 logger = logging.getLogger(__name__)
 
 
+# SignalAction -> order side (los miembros str-Enum también casan con el string plano)
+_SIDE_MAP = {
+    SignalAction.BUY: "buy",
+    SignalAction.LONG_ENTRY: "buy",
+    SignalAction.SELL: "sell",
+    SignalAction.LONG_EXIT: "sell",
+    SignalAction.SHORT_ENTRY: "sell",
+}
+
+
+# broker_order_id / client_order_id -> PK de órdenes vistas recientemente; la
+# fila se carga con Session.get (identity map) y se verifica el id externo
+_ORDER_PK_BY_BROKER_ID = TTLCache(maxsize=10_000, ttl=300)
+_ORDER_PK_BY_CLIENT_ID = TTLCache(maxsize=10_000, ttl=300)
+
+# Precio de mercado por símbolo mapeado: una ráfaga de señales del mismo
+# símbolo consulta el broker una sola vez
+_PRICE_CACHE = TTLCache(maxsize=1024, ttl=1.0)
+
+# Último trade por símbolo para las bracket orders: varias señales del mismo
+# símbolo en un lote comparten una sola consulta
+_TRADE_PRICE_CACHE = TTLCache(maxsize=1024, ttl=2.0)
+
+# Estados considerados "activos" en get_active_orders
+_ACTIVE_STATUSES = (
+    OrderStatus.NEW,
+    OrderStatus.SENT,
+    OrderStatus.ACCEPTED,
+    OrderStatus.PARTIALLY_FILLED,
+)
+
+
+# Despierta al scheduler en cuanto se confirma una orden NEW, sin esperar al
+# siguiente sondeo
+new_order_wakeup = Wakeup()
+
+
+@event.listens_for(Session, "after_commit")
+def _notify_new_orders(session: Session) -> None:
+    if session.info.pop("new_orders", False):
+        new_order_wakeup.notify()
+
+
+def _lookup_order(db: Session, cache: TTLCache, column, value: str) -> Optional[Order]:
+    """Buscar una orden por un id externo único, pasando por la caché de PKs"""
+    pk = cache.get(value)
+    if pk is not None:
+        order = db.get(Order, pk)
+        if order is not None and getattr(order, column.key) == value:
+            return order
+        cache.pop(value)
+    # lambda_stmt: el SQL se compila una vez por columna y se reutiliza;
+    # ``value`` viaja como parámetro
+    stmt = lambda_stmt(lambda: select(Order).where(column == value).limit(1))
+    order = db.execute(stmt).scalars().first()
+    if order is not None and order.status not in TERMINAL_ORDER_STATES:
+        cache.set(value, order.id)
+    return order
+
+
+def _lookup_orders(db: Session, cache: TTLCache, column, values) -> Dict[str, Order]:
+    """Versión en lote de _lookup_order: {id externo: Order} con un solo IN.
+
+    No lee la caché de PKs: en una sesión nueva cada PK cacheado costaría un
+    SELECT propio. Solo la rellena para las búsquedas individuales.
+    """
+    unique = list(dict.fromkeys(values))
+    if not unique:
+        return {}
+    found: Dict[str, Order] = {}
+    for order in db.execute(select(Order).where(column.in_(unique))).scalars():
+        value = getattr(order, column.key)
+        found[value] = order
+        if order.status not in TERMINAL_ORDER_STATES:
+            cache.set(value, order.id)
+        else:
+            cache.pop(value)
+    return found
+
+
 class PriceUnavailableError(Exception):
     """Raised when the current market price cannot be retrieved."""
 
@@ -24,8 +108,16 @@ class PriceUnavailableError(Exception):
 class OrderManager:
     """Gestiona la creación y estado de órdenes"""
 
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, order_executor: Optional[OrderExecutor] = None):
         self.db = db
+        self._order_executor = order_executor
+
+    @property
+    def order_executor(self) -> OrderExecutor:
+        """OrderExecutor inyectado, o la instancia global del proceso"""
+        if self._order_executor is None:
+            self._order_executor = _shared_order_executor
+        return self._order_executor
 
     def create_order_from_signal(
         self,
@@ -35,10 +127,15 @@ class OrderManager:
         create_exits: bool = False,
         commit: bool = True
     ) -> Optional[Order]:
-        """Crear una orden desde una señal validada"""
+        """Crear una orden desde una señal validada.
 
-        # Generar client_order_id único
-        client_order_id = f"order_{uuid.uuid4().hex[:8]}"
+        Lee de la señal id, symbol, action, quantity y strategy_id: conviene
+        tenerlos cargados para no disparar lazy loads.
+        """
+
+        # Generar client_order_id único: prefijo temporal en ms (ordenado, buena
+        # localidad en el índice) + 32 bits aleatorios
+        client_order_id = f"order_{int(time.time() * 1000):x}_{os.urandom(4).hex()}"
 
         # Mapear SignalAction a order side
         side = self._map_signal_action_to_side(signal.action)
@@ -54,22 +151,24 @@ class OrderManager:
             signal_id=signal.id,
             user_id=user_id,
             portfolio_id=portfolio_id,
-            created_at=datetime.utcnow()
         )
 
-        # Guardar en DB
+        # Guardar en DB (flush asigna el id; sin refresh tras el commit:
+        # los atributos expirados solo se recargan si alguien los lee)
         self.db.add(order)
+        self.db.flush()
+        self.db.info["new_orders"] = True
+        order_id = order.id
+        signal_id = signal.id
+        strategy_id = signal.strategy_id
         if commit:
             self.db.commit()
-            self.db.refresh(order)
-        else:
-            self.db.flush()
 
-        logger.info(f"Created order {order.client_order_id} from signal {signal.id}")
+        logger.info(f"Created order {client_order_id} from signal {signal_id}")
 
-        if create_exits and order and order.id:
+        if create_exits and order_id:
             # Crear automáticamente órdenes de salida
-            self._schedule_exit_creation(order.id, signal.strategy_id)
+            self._schedule_exit_creation(order_id, strategy_id)
 
         return order
 
@@ -84,76 +183,76 @@ class OrderManager:
 
         old_status = order.status
         order.status = new_status
-        order.updated_at = datetime.utcnow()
 
-        # Actualizar campos específicos según el estado
+        # Actualizar campos específicos según el estado (hora de la base de
+        # datos; updated_at lo pone el onupdate de la columna)
         if new_status == OrderStatus.SENT:
-            order.sent_at = datetime.utcnow()
+            order.sent_at = utc_now()
         elif new_status == OrderStatus.FILLED:
-            order.filled_at = datetime.utcnow()
+            order.filled_at = utc_now()
 
         # Asignar broker order ID si viene
         if broker_order_id:
             order.broker_order_id = broker_order_id
 
+        # Las órdenes terminadas dejan de consultarse en el camino de fills
+        if new_status in TERMINAL_ORDER_STATES:
+            _ORDER_PK_BY_CLIENT_ID.pop(order.client_order_id)
+            if order.broker_order_id:
+                _ORDER_PK_BY_BROKER_ID.pop(order.broker_order_id)
+
         # Guardar error si hay
         if error_message:
             order.last_error = error_message
             order.retry_count += 1
 
+        client_order_id = order.client_order_id
         self.db.commit()
-        self.db.refresh(order)
 
-        logger.info(f"Order {order.client_order_id} status: {old_status} -> {new_status}")
+        logger.info(f"Order {client_order_id} status: {old_status} -> {new_status}")
         return order
 
     def get_active_orders(self, user_id: int) -> list[Order]:
         """Obtener órdenes activas del usuario"""
-        active_statuses = [
-            OrderStatus.NEW,
-            OrderStatus.SENT,
-            OrderStatus.ACCEPTED,
-            OrderStatus.PARTIALLY_FILLED
-        ]
-
-        return (
-            self.db.query(Order)
-            .filter(
-                Order.user_id == user_id,
-                Order.status.in_(active_statuses)
-            )
+        stmt = lambda_stmt(
+            lambda: select(Order)
+            .where(Order.user_id == user_id, Order.status.in_(_ACTIVE_STATUSES))
             .order_by(Order.created_at.desc())
-            .all()
         )
+        return list(self.db.execute(stmt).scalars().all())
 
     def get_order_by_client_id(self, client_order_id: str) -> Optional[Order]:
         """Buscar orden por client_order_id"""
-        return (
-            self.db.query(Order)
-            .filter(Order.client_order_id == client_order_id)
-            .first()
+        return _lookup_order(
+            self.db, _ORDER_PK_BY_CLIENT_ID, Order.client_order_id, client_order_id
         )
 
     def get_order_by_broker_id(self, broker_order_id: str) -> Optional[Order]:
         """Buscar orden por broker_order_id"""
-        return (
-            self.db.query(Order)
-            .filter(Order.broker_order_id == broker_order_id)
-            .first()
+        return _lookup_order(
+            self.db, _ORDER_PK_BY_BROKER_ID, Order.broker_order_id, broker_order_id
         )
 
-    def _map_signal_action_to_side(self, action: str) -> str:
-        """Mapear SignalAction a order side (buy/sell)"""
-        buy_actions = [SignalAction.BUY, SignalAction.LONG_ENTRY]
-        sell_actions = [SignalAction.SELL, SignalAction.LONG_EXIT, SignalAction.SHORT_ENTRY]
+    def get_orders_by_client_ids(self, client_order_ids: List[str]) -> Dict[str, Order]:
+        """Buscar varias órdenes por client_order_id en una sola consulta"""
+        return _lookup_orders(
+            self.db, _ORDER_PK_BY_CLIENT_ID, Order.client_order_id, client_order_ids
+        )
 
-        if action in buy_actions:
-            return "buy"
-        elif action in sell_actions:
-            return "sell"
-        else:
-            # Default fallback
-            return "buy" if action.lower() in ["buy", "long"] else "sell"
+    def get_orders_by_broker_ids(self, broker_order_ids: List[str]) -> Dict[str, Order]:
+        """Buscar varias órdenes por broker_order_id en una sola consulta"""
+        return _lookup_orders(
+            self.db, _ORDER_PK_BY_BROKER_ID, Order.broker_order_id, broker_order_ids
+        )
+
+    @staticmethod
+    def _map_signal_action_to_side(action: str) -> str:
+        """Mapear SignalAction a order side (buy/sell)"""
+        side = _SIDE_MAP.get(action)
+        if side:
+            return side
+        # Default fallback
+        return "buy" if action.lower() in ("buy", "long") else "sell"
 
     def calculate_position_size(
         self,
@@ -173,9 +272,12 @@ class OrderManager:
             raise ValueError("max_position_pct must be between 0 and 1")
 
         # Obtener precio actual usando OrderExecutor
-        oe = OrderExecutor()
+        oe = self.order_executor
         mapped_symbol = oe.map_symbol(signal.symbol)
-        current_price = oe._get_market_price(mapped_symbol)
+        current_price = _PRICE_CACHE.get(mapped_symbol)
+        if current_price is None:
+            current_price = oe._get_market_price(mapped_symbol)
+            _PRICE_CACHE.set(mapped_symbol, current_price)
         if current_price <= 0:
             raise ValueError(f"Invalid price for {signal.symbol}")
 
@@ -204,9 +306,17 @@ class OrderManager:
             return qty
 
     def create_bracket_order_from_signal(
-        self, signal: Signal, user_id: int, portfolio_id: int, commit: bool = True
+        self,
+        signal: Signal,
+        user_id: int,
+        portfolio_id: int,
+        commit: bool = True,
+        exit_rules: Optional[StrategyExitRules] = None,
     ) -> Dict[str, Any]:
-        """Crear bracket order completa (Entry + SL + TP) desde una señal"""
+        """Crear bracket order completa (Entry + SL + TP) desde una señal.
+
+        ``exit_rules``: reglas de la estrategia ya cargadas por el llamador.
+        """
         try:
             # 1. Obtener precio actual del símbolo
             current_price = self._get_current_price(signal.symbol)
@@ -218,6 +328,7 @@ class OrderManager:
                 user_id,
                 Decimal(str(current_price)),
                 signal.action,
+                rules=exit_rules,
             )
 
             # Validar que existan los precios de salida necesarios
@@ -240,55 +351,20 @@ class OrderManager:
                 raise ValueError("Invalid quantity for exit orders")
 
             # 4. Crear órdenes de salida (Stop Loss y Take Profit)
-            exit_orders = []
-
-            # Crear Stop Loss Order
-            stop_loss_order = Order(
-                client_order_id=f"SL_{main_order.client_order_id}",
-                symbol=signal.symbol,
-                side="sell" if signal.action in ["buy", "long_entry"] else "buy",
-                quantity=main_order.quantity,
-                order_type=OrderType.STOP.value,
-                stop_price=exit_calculation["stop_loss_price"],
-                status=OrderStatus.PENDING_PARENT,
-                user_id=user_id,
-                portfolio_id=portfolio_id,
-                signal_id=signal.id,
-                parent_order_id=main_order.id,
-            )
-            self.db.add(stop_loss_order)
-            self.db.flush()
-            exit_orders.append(stop_loss_order.id)
-
-            # Crear Take Profit Order
-            take_profit_order = Order(
-                client_order_id=f"TP_{main_order.client_order_id}",
-                symbol=signal.symbol,
-                side="sell" if signal.action in ["buy", "long_entry"] else "buy",
-                quantity=main_order.quantity,
-                order_type=OrderType.LIMIT.value,
-                limit_price=exit_calculation["take_profit_price"],
-                status=OrderStatus.PENDING_PARENT,
-                user_id=user_id,
-                portfolio_id=portfolio_id,
-                signal_id=signal.id,
-                parent_order_id=main_order.id,
+            stop_loss_order, take_profit_order = self._create_exit_orders(
+                main_order, exit_calculation, signal.strategy_id, commit=False
             )
-            self.db.add(take_profit_order)
-            self.db.flush()
-            exit_orders.append(take_profit_order.id)
+            exit_orders = [stop_loss_order.id, take_profit_order.id]
 
             # Marcar orden principal como bracket parent
             main_order.is_bracket_parent = True
 
-            # Guardar cambios
+            # Guardar cambios: los ids ya vienen del flush, sin refresh tras el
+            # commit (releer las tres filas costaba tres SELECT)
+            self.db.flush()
+            main_order_id = main_order.id
             if commit:
                 self.db.commit()
-                self.db.refresh(main_order)
-                self.db.refresh(stop_loss_order)
-                self.db.refresh(take_profit_order)
-            else:
-                self.db.flush()
 
             logger.info(
                 f"Created bracket order for {signal.symbol}: "
@@ -298,7 +374,7 @@ class OrderManager:
 
             return {
                 "status": "success",
-                "main_order_id": main_order.id,
+                "main_order_id": main_order_id,
                 "exit_orders": exit_orders,
                 "exit_prices": {
                     "stop_loss": exit_calculation["stop_loss_price"],
@@ -341,6 +417,7 @@ class OrderManager:
             quantity=main_order.quantity,
             order_type=OrderType.STOP.value,
             stop_price=exit_calculation["stop_loss_price"],
+            limit_price=None,
             status=OrderStatus.PENDING_PARENT,
             signal_id=main_order.signal_id,
             user_id=main_order.user_id,
@@ -355,6 +432,7 @@ class OrderManager:
             side=exit_side,
             quantity=main_order.quantity,
             order_type=OrderType.LIMIT.value,
+            stop_price=None,
             limit_price=exit_calculation["take_profit_price"],
             status=OrderStatus.PENDING_PARENT,
             signal_id=main_order.signal_id,
@@ -362,26 +440,31 @@ class OrderManager:
             portfolio_id=main_order.portfolio_id
         )
 
-        # Guardar en base de datos
-        self.db.add(stop_loss_order)
-        self.db.add(take_profit_order)
+        # Guardar en base de datos: con las mismas columnas en ambos hijos
+        # el flush los agrupa en un solo INSERT ... RETURNING, sin refresh
+        self.db.add_all([stop_loss_order, take_profit_order])
+        self.db.flush()
+        sl_id, tp_id = stop_loss_order.id, take_profit_order.id
         if commit:
             self.db.commit()
-            self.db.refresh(stop_loss_order)
-            self.db.refresh(take_profit_order)
-        else:
-            self.db.flush()
 
         exit_orders.extend([stop_loss_order, take_profit_order])
 
-        logger.info(f"Created exit orders: SL={stop_loss_order.id}, TP={take_profit_order.id}")
+        logger.info(f"Created exit orders: SL={sl_id}, TP={tp_id}")
 
         return exit_orders
 
     def _get_current_price(self, symbol: str) -> float:
-        """Obtener precio actual del símbolo desde el broker"""
+        """Obtener precio actual del símbolo desde el broker (caché de 2s)"""
+        price = _TRADE_PRICE_CACHE.get(symbol)
+        if price is not None:
+            return price
+        price = self._fetch_current_price(symbol)
+        _TRADE_PRICE_CACHE.set(symbol, price)
+        return price
+
+    def _fetch_current_price(self, symbol: str) -> float:
         try:
-            from app.integrations import broker_client
             trade = broker_client.get_latest_trade(symbol)
             price = float(getattr(trade, "price", 0.0))
             if price <= 0:
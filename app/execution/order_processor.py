@@ -1,14 +1,89 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import bindparam, func, or_, select, update
+from sqlalchemy.orm import Session, load_only
 from app.models.order import Order
 from app.core.types import OrderStatus
 from app.execution.order_manager import OrderManager
 from app.execution.broker_executor import BrokerExecutor
-from typing import List, Dict, Any
+from app.utils.time import utc_now
+from typing import List, Dict, Any, Optional
+from collections import Counter
 import logging
+import time
 from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
 
+# Máximo de órdenes NEW que reclama cada pasada de process_pending_orders
+PENDING_BATCH_SIZE = 50
+
+# Una orden reclamada (SENT sin broker_order_id) que no avanza en este plazo
+# se da por abandonada (proceso caído entre el claim y el envío) y vuelve a NEW
+CLAIM_LEASE = timedelta(minutes=5)
+
+# Sentencias del scheduler construidas una sola vez; el instante de corte y
+# el límite viajan como parámetros en cada ejecución
+_PENDING_ORDERS_STMT = (
+    select(Order)
+    .where(
+        Order.status == OrderStatus.NEW,
+        or_(Order.next_retry_at.is_(None), Order.next_retry_at <= bindparam("now")),
+    )
+    .order_by(Order.created_at.asc())
+    .limit(PENDING_BATCH_SIZE)
+    # Un solo SELECT bloquea el lote; las filas de otros workers se saltan
+    .with_for_update(skip_locked=True)
+)
+
+_DUE_RETRIES_STMT = (
+    select(Order)
+    .where(
+        Order.status == OrderStatus.NEW,
+        Order.next_retry_at <= bindparam("now"),
+    )
+    .order_by(Order.next_retry_at.asc())
+    .limit(bindparam("limit"))
+    .with_for_update(skip_locked=True)
+)
+
+# Claims vencidos: updated_at lo fija el reloj de la base de datos al reclamar.
+# Las hijas de bracket se activan por otra vía y no se tocan
+_RELEASE_STALE_CLAIMS_STMT = (
+    update(Order)
+    .where(
+        Order.status == OrderStatus.SENT,
+        Order.broker_order_id.is_(None),
+        Order.parent_order_id.is_(None),
+        Order.updated_at < bindparam("cutoff"),
+    )
+    .values(
+        status=OrderStatus.NEW,
+        next_retry_at=None,
+        last_error="Claim expired before broker submission",
+    )
+    .execution_options(synchronize_session=False)
+)
+
+_ACTIVE_ORDERS_STMT = (
+    select(Order)
+    .options(
+        load_only(
+            Order.id,
+            Order.client_order_id,
+            Order.broker_order_id,
+            Order.status,
+            Order.filled_quantity,
+            Order.avg_fill_price,
+            Order.created_at,
+        )
+    )
+    .where(
+        Order.status.in_(
+            [OrderStatus.SENT, OrderStatus.ACCEPTED, OrderStatus.PARTIALLY_FILLED]
+        ),
+        Order.broker_order_id.isnot(None),
+    )
+)
+
 
 class OrderProcessor:
     """Servicio que procesa órdenes pendientes y maneja su ciclo de vida"""
@@ -18,67 +93,97 @@ class OrderProcessor:
         self.order_manager = OrderManager(db)
         self.broker_executor = BrokerExecutor(db)
 
-    def process_pending_orders(self) -> Dict[str, Any]:
-        """Procesar todas las órdenes pendientes"""
+    def process_pending_orders(self, verbose: bool = False) -> Dict[str, Any]:
+        """Procesar todas las órdenes pendientes.
+
+        ``verbose`` añade al resultado el detalle por orden (``orders_processed``).
+        """
 
         # Obtener órdenes NEW (listas para enviar)
-        pending_orders = self._get_pending_orders()
+        return self._process_orders(self._get_pending_orders(), verbose)
 
-        results = {
-            "processed": 0,
-            "successful": 0,
-            "failed": 0,
-            "retries_scheduled": 0,
-            "orders_processed": []
-        }
+    def process_due_retries(self, limit: int = 100, verbose: bool = False) -> Dict[str, Any]:
+        """Reenviar las órdenes cuyo next_retry_at ya venció"""
+        return self._process_orders(self._get_due_retries(limit), verbose)
 
-        logger.info(f"Processing {len(pending_orders)} pending orders")
+    def release_stale_claims(self) -> int:
+        """Devolver a NEW las órdenes reclamadas que nunca llegaron al broker"""
+        cutoff = datetime.utcnow() - CLAIM_LEASE
+        released = self.db.execute(_RELEASE_STALE_CLAIMS_STMT, {"cutoff": cutoff}).rowcount
+        self.db.commit()
+        if released:
+            logger.warning(f"Released {released} stale order claims back to NEW")
+        return released
 
-        for order in pending_orders:
-            try:
-                with self.db.begin():
-                    locked_order = (
-                        self.db.query(Order)
-                        .filter(Order.id == order.id)
-                        .with_for_update()
-                        .one()
-                    )
-                    result = self.broker_executor.execute_order(locked_order)
-
-                order_result = {
-                    "order_id": locked_order.id,
-                    "client_order_id": locked_order.client_order_id,
-                    "symbol": locked_order.symbol,
-                    "side": locked_order.side,
-                    "success": result["success"]
-                }
+    def _process_orders(self, pending_orders: List[Order], verbose: bool = False) -> Dict[str, Any]:
+        """Enviar al broker un lote de órdenes NEW ya bloqueadas (SKIP LOCKED)"""
 
-                if result["success"]:
-                    results["successful"] += 1
-                    order_result["broker_order_id"] = result.get("broker_order_id")
-                    logger.info(f"Order {locked_order.client_order_id} executed successfully")
+        counts = Counter()
+        # Detalle por orden solo si se pide: el scheduler solo usa los conteos
+        orders_processed: Optional[List[Dict[str, Any]]] = [] if verbose else None
 
-                elif result.get("retry_scheduled"):
-                    results["retries_scheduled"] += 1
-                    order_result["retry_scheduled"] = True
-                    order_result["retry_in_seconds"] = result.get("retry_in_seconds")
-                    logger.info(f"Order {locked_order.client_order_id} scheduled for retry")
+        logger.info(f"Processing {len(pending_orders)} pending orders")
 
+        # Los commits no expiran el lote: las filas reclamadas ya no las toca
+        # nadie más, y así no se emite un SELECT por orden
+        expire_on_commit = self.db.expire_on_commit
+        self.db.expire_on_commit = False
+        try:
+            # Reclamar el lote: pasan a SENT en el mismo commit que libera los
+            # locks, así otro worker ya no las ve como NEW. Si el proceso cae
+            # antes de enviarlas, release_stale_claims las recupera al vencer
+            # CLAIM_LEASE
+            for order in pending_orders:
+                order.status = OrderStatus.SENT
+            self.db.commit()
+            # Pasada la mitad del lease no se envía nada más: las restantes
+            # las libera release_stale_claims sin riesgo de doble envío
+            submit_deadline = time.monotonic() + CLAIM_LEASE.total_seconds() / 2
+
+            # Un commit por orden: el resultado del broker queda persistido en
+            # cuanto se conoce
+            for order in pending_orders:
+                if time.monotonic() > submit_deadline:
+                    logger.warning("Claim lease running out, leaving the rest of the batch")
+                    break
+                try:
+                    result = self.broker_executor.execute_order(order)
+                    self.db.commit()
+                except Exception as e:
+                    logger.error(f"Unexpected error processing order {order.id}: {e}")
+                    self.db.rollback()
+                    # Marcar orden como error
+                    order.status = OrderStatus.ERROR
+                    order.last_error = f"Processing error: {str(e)}"
+                    self.db.commit()
+                    counts["failed"] += 1
+                    continue
+
+                counts["processed"] += 1
+                if result["success"]:
+                    counts["successful"] += 1
+                    logger.info(f"Order {order.client_order_id} executed successfully")
+                elif result.get("retry_scheduled"):
+                    counts["retries_scheduled"] += 1
+                    logger.info(f"Order {order.client_order_id} scheduled for retry")
                 else:
-                    results["failed"] += 1
-                    order_result["error"] = result.get("error")
-                    logger.error(f"Order {locked_order.client_order_id} failed permanently")
+                    counts["failed"] += 1
+                    logger.error(f"Order {order.client_order_id} failed permanently")
 
-                results["orders_processed"].append(order_result)
-                results["processed"] += 1
+                if orders_processed is not None:
+                    orders_processed.append(self._order_result(order, result))
+        finally:
+            self.db.expire_on_commit = expire_on_commit
 
-            except Exception as e:
-                logger.error(f"Unexpected error processing order {order.id}: {e}")
-                # Marcar orden como error
-                order.status = OrderStatus.ERROR
-                order.last_error = f"Processing error: {str(e)}"
-                self.db.commit()
-                results["failed"] += 1
+        results = {
+            "claimed": len(pending_orders),
+            "processed": counts["processed"],
+            "successful": counts["successful"],
+            "failed": counts["failed"],
+            "retries_scheduled": counts["retries_scheduled"],
+        }
+        if orders_processed is not None:
+            results["orders_processed"] = orders_processed
 
         logger.info(
             f"Order processing complete: {results['successful']} successful, "
@@ -86,36 +191,62 @@ class OrderProcessor:
         )
         return results
 
+    @staticmethod
+    def _order_result(order: Order, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Detalle de una orden procesada (modo verbose)"""
+        order_result = {
+            "order_id": order.id,
+            "client_order_id": order.client_order_id,
+            "symbol": order.symbol,
+            "side": order.side,
+            "success": result["success"],
+        }
+        if result["success"]:
+            order_result["broker_order_id"] = result.get("broker_order_id")
+        elif result.get("retry_scheduled"):
+            order_result["retry_scheduled"] = True
+            next_retry_at = result.get("next_retry_at")
+            order_result["next_retry_at"] = (
+                next_retry_at.isoformat() if next_retry_at else None
+            )
+        else:
+            order_result["error"] = result.get("error")
+        return order_result
+
     def process_single_order(self, order_id: int) -> Dict[str, Any]:
         """Procesar una orden específica"""
 
         try:
-            with self.db.begin():
-                order = (
-                    self.db.query(Order)
-                    .filter(Order.id == order_id)
-                    .with_for_update()
-                    .first()
-                )
-                if not order:
-                    return {"success": False, "error": "Order not found"}
-
-                if order.status != OrderStatus.NEW:
-                    return {
-                        "success": False,
-                        "error": f"Order status is {order.status}, expected NEW",
-                    }
-
-                result = self.broker_executor.execute_order(order)
+            order = (
+                self.db.query(Order)
+                .filter(Order.id == order_id)
+                .with_for_update()
+                .first()
+            )
+            if not order:
+                self.db.rollback()
+                return {"success": False, "error": "Order not found"}
+
+            if order.status != OrderStatus.NEW:
+                self.db.rollback()
+                return {
+                    "success": False,
+                    "error": f"Order status is {order.status}, expected NEW",
+                }
+
+            result = self.broker_executor.execute_order(order)
+            order_id, client_order_id = order.id, order.client_order_id
+            self.db.commit()
 
             return {
                 "success": result["success"],
-                "order_id": order.id,
-                "client_order_id": order.client_order_id,
+                "order_id": order_id,
+                "client_order_id": client_order_id,
                 "broker_order_id": result.get("broker_order_id"),
                 "error": result.get("error"),
             }
         except Exception as e:
+            self.db.rollback()
             logger.error(f"Error processing order {order_id}: {e}")
             return {"success": False, "error": str(e)}
 
@@ -132,13 +263,19 @@ class OrderProcessor:
             "errors": 0
         }
 
+        # Una sola consulta de listado al broker para todas las órdenes activas
+        bulk_status = self.broker_executor.get_orders_status_bulk(
+            [order.broker_order_id for order in active_orders],
+            after=self._bulk_status_window_start(active_orders),
+        )
+
         for order in active_orders:
             try:
-                # Consultar estado en el broker
-                broker_status = self.broker_executor.get_order_status(order)
+                broker_status = bulk_status.get(order.broker_order_id)
 
-                if broker_status:
-                    self._update_order_from_broker_status(order, broker_status)
+                if broker_status and self._update_order_from_broker_status(
+                    order, broker_status
+                ):
                     results["updated"] += 1
 
                     if order.status == OrderStatus.FILLED:
@@ -154,12 +291,29 @@ class OrderProcessor:
                 logger.error(f"Error updating order {order.id}: {e}")
                 results["errors"] += 1
 
+        # Un único commit para todos los cambios del ciclo
+        if results["updated"]:
+            try:
+                self.db.commit()
+            except Exception as e:
+                self.db.rollback()
+                logger.error(f"Error committing fill updates: {e}")
+                results["errors"] += results["updated"]
+                results["updated"] = 0
+                results["filled"] = 0
+
         return results
 
+    @staticmethod
+    def _bulk_status_window_start(orders: List[Order]) -> Optional[datetime]:
+        """Inicio de la ventana de listado: la orden local más antigua, con margen por desfase de reloj"""
+        oldest = min((order.created_at for order in orders if order.created_at), default=None)
+        return oldest - timedelta(minutes=1) if oldest else None
+
     def cancel_order(self, order_id: int) -> Dict[str, Any]:
         """Cancelar una orden específica"""
 
-        order = self.db.query(Order).filter(Order.id == order_id).first()
+        order = self.db.get(Order, order_id)
         if not order:
             return {"success": False, "error": "Order not found"}
 
@@ -178,34 +332,27 @@ class OrderProcessor:
 
     def _get_pending_orders(self) -> List[Order]:
         """Obtener órdenes pendientes de procesamiento"""
-        return (
-            self.db.query(Order)
-            .filter(Order.status == OrderStatus.NEW)
-            .order_by(Order.created_at.asc())
-            .limit(50)  # Procesar máximo 50 por batch
-            .all()
+        return list(self.db.scalars(_PENDING_ORDERS_STMT, {"now": datetime.utcnow()}))
+
+    def _get_due_retries(self, limit: int) -> List[Order]:
+        """Órdenes en espera de reintento cuyo next_retry_at ya pasó (índice ix_orders_retry)"""
+        return list(
+            self.db.scalars(
+                _DUE_RETRIES_STMT, {"now": datetime.utcnow(), "limit": limit}
+            )
         )
 
     def _get_active_orders(self) -> List[Order]:
         """Obtener órdenes activas en el broker"""
-        active_statuses = [
-            OrderStatus.SENT,
-            OrderStatus.ACCEPTED,
-            OrderStatus.PARTIALLY_FILLED,
-        ]
-        return (
-            self.db.query(Order)
-            .filter(
-                Order.status.in_(active_statuses),
-                Order.broker_order_id.isnot(None)
-            )
-            .all()
-        )
+        return list(self.db.scalars(_ACTIVE_ORDERS_STMT))
 
     def _update_order_from_broker_status(
         self, order: Order, broker_status: Dict[str, Any]
-    ) -> None:
-        """Actualizar orden local con información del broker"""
+    ) -> bool:
+        """Actualizar orden local con información del broker (sin commit).
+
+        Devuelve True si la orden cambió.
+        """
 
         broker_order_status = broker_status.get("status", "").lower()
         filled_qty = broker_status.get("filled_qty", 0)
@@ -223,7 +370,8 @@ class OrderProcessor:
 
         new_status = status_mapping.get(broker_order_status, order.status)
 
-        # Actualizar campos si hay cambios
+        # Actualizar campos si hay cambios (filled_at/updated_at con la hora
+        # de la base de datos)
         updated = False
 
         if order.status != new_status:
@@ -231,7 +379,7 @@ class OrderProcessor:
             updated = True
 
             if new_status == OrderStatus.FILLED:
-                order.filled_at = datetime.utcnow()
+                order.filled_at = utc_now()
 
         if filled_qty > 0 and order.filled_quantity != filled_qty:
             order.filled_quantity = filled_qty
@@ -242,43 +390,34 @@ class OrderProcessor:
             updated = True
 
         if updated:
-            order.updated_at = datetime.utcnow()
-            self.db.commit()
             logger.info(
                 f"Updated order {order.client_order_id}: "
                 f"status={new_status}, filled={filled_qty}"
             )
 
+        return updated
+
     def get_order_statistics(self) -> Dict[str, Any]:
         """Obtener estadísticas de órdenes"""
 
-        from sqlalchemy import func, and_
-
-        # Estadísticas por estado
+        # Una sola pasada: conteo por estado y, con FILTER, las de las últimas 24h
+        now = datetime.utcnow()
+        yesterday = now - timedelta(days=1)
         status_stats = (
-            self.db.query(Order.status, func.count(Order.id))
+            self.db.query(
+                Order.status,
+                func.count(Order.id),
+                func.count(Order.id).filter(Order.created_at >= yesterday),
+            )
             .group_by(Order.status)
             .all()
         )
 
-        # Órdenes de las últimas 24 horas
-        yesterday = datetime.utcnow() - timedelta(days=1)
-        recent_orders = (
-            self.db.query(func.count(Order.id))
-            .filter(Order.created_at >= yesterday)
-            .scalar()
-        )
-
-        # Órdenes con errores
-        error_orders = (
-            self.db.query(func.count(Order.id))
-            .filter(Order.status == OrderStatus.ERROR)
-            .scalar()
-        )
+        status_breakdown = {status: count for status, count, _ in status_stats}
 
         return {
-            "status_breakdown": {status: count for status, count in status_stats},
-            "recent_orders_24h": recent_orders,
-            "error_orders": error_orders,
-            "timestamp": datetime.utcnow().isoformat(),
+            "status_breakdown": status_breakdown,
+            "recent_orders_24h": sum(recent for _, _, recent in status_stats),
+            "error_orders": status_breakdown.get(OrderStatus.ERROR.value, 0),
+            "timestamp": now.isoformat(),
         }
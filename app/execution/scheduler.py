@@ -1,25 +1,186 @@
 import asyncio
 import logging
+import time
 from datetime import datetime, timedelta
-from typing import Dict, Any
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from sqlalchemy import bindparam, create_engine, exists, func, select, text
 from sqlalchemy.orm import Session
-from app.database import get_db
-from app.execution.order_processor import OrderProcessor
+from sqlalchemy.pool import NullPool
+from app.config import settings
+from app.database import engine, session_scope
+from app.execution.order_processor import OrderProcessor, PENDING_BATCH_SIZE
+from app.execution.order_manager import new_order_wakeup
 from app.models.order import Order
 from app.core.types import OrderStatus
 
 logger = logging.getLogger(__name__)
 
+# Clave fija del advisory lock (hash() de Python cambia entre procesos)
+_SCHEDULER_LOCK_KEY = 0x45584543  # "EXEC"
+# Canal por el que las réplicas sin el lock avisan de órdenes nuevas al líder
+_WAKEUP_CHANNEL = "execution_scheduler_wakeup"
+
+# Conteo de órdenes NEW, construido una sola vez
+_PENDING_COUNT_STMT = (
+    select(func.count()).select_from(Order).where(Order.status == OrderStatus.NEW)
+)
+
+# ¿Hay órdenes ERROR anteriores al corte? EXISTS se detiene en la primera fila
+_OLD_ERRORS_EXIST_STMT = select(
+    exists().where(
+        Order.status == OrderStatus.ERROR,
+        Order.created_at < bindparam("cutoff"),
+    )
+)
+
+
+class SchedulerLeadership:
+    """Advisory lock de sesión de Postgres que elige la réplica que ejecuta los ticks.
+
+    El lock vive en una conexión dedicada (autocommit) que se mantiene entre
+    ticks: no ocupa una transacción abierta ni una segunda conexión del pool
+    por tick. El líder hace LISTEN en esa misma conexión; el resto de réplicas
+    le pasan con NOTIFY los avisos de órdenes nuevas. En otros motores hay una
+    sola réplica y siempre es líder.
+
+    Tras PgBouncer (pooling por transacción) cada sentencia puede caer en otra
+    conexión del servidor: la conexión se abre contra ``db_direct_url``, y sin
+    ella ninguna réplica toma el lock.
+    """
+
+    def __init__(self):
+        self._conn = None
+        self._direct_engine = None
+        self._refused = False
+        self._watched_fd: Optional[int] = None
+        self.is_leader = engine.dialect.name != "postgresql"
+
+    def _connect(self):
+        """Conexión autocommit para el lock, o None si no hay DSN directo utilizable"""
+        if not settings.db_use_pgbouncer:
+            return engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+        if not settings.db_direct_url:
+            if not self._refused:
+                logger.error(
+                    "db_use_pgbouncer is set without db_direct_url: the scheduler lock "
+                    "needs a direct Postgres connection, no replica will run the ticks"
+                )
+                self._refused = True
+            return None
+        if self._direct_engine is None:
+            self._direct_engine = create_engine(settings.db_direct_url, poolclass=NullPool)
+        return self._direct_engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+
+    def acquire(self) -> bool:
+        """Intentar ser líder (desde el hilo del tick); True si se tiene el lock"""
+        if engine.dialect.name != "postgresql":
+            return True
+        try:
+            if self._conn is None:
+                self._conn = self._connect()
+                if self._conn is None:
+                    return False
+            if self.is_leader:
+                # Consume los NOTIFY pendientes y detecta una conexión caída
+                # (con ella se habría perdido el lock)
+                dbapi_conn = self._conn.connection.driver_connection
+                dbapi_conn.poll()
+                dbapi_conn.notifies.clear()
+                return True
+            if self._conn.execute(
+                text("SELECT pg_try_advisory_lock(:key)"), {"key": _SCHEDULER_LOCK_KEY}
+            ).scalar():
+                self._conn.execute(text(f"LISTEN {_WAKEUP_CHANNEL}"))
+                self.is_leader = True
+                logger.info("Scheduler lock acquired, this replica runs the ticks")
+        except Exception as e:
+            logger.error(f"Scheduler lock connection failed: {e}")
+            self._close()
+        return self.is_leader
+
+    def watch(self, callback: Callable[[], None]) -> None:
+        """Llamar a ``callback`` cuando llegue un NOTIFY (solo líder, desde el event loop).
+
+        El reader se retira al dispararse o al empezar un tick: los mensajes
+        los consume acquire() en el hilo del tick.
+        """
+        if not self.is_leader or self._conn is None or self._watched_fd is not None:
+            return
+        loop = asyncio.get_running_loop()
+        fd = self._conn.connection.driver_connection.fileno()
+
+        def on_readable():
+            self.unwatch()
+            callback()
+
+        try:
+            loop.add_reader(fd, on_readable)
+        except NotImplementedError:  # pragma: no cover - loops sin add_reader (Windows)
+            return
+        self._watched_fd = fd
+
+    def unwatch(self) -> None:
+        """Retirar el reader de la conexión del lock (desde el event loop)"""
+        if self._watched_fd is not None:
+            asyncio.get_running_loop().remove_reader(self._watched_fd)
+            self._watched_fd = None
+
+    def forward_wakeup(self) -> None:
+        """Avisar al líder de una orden nueva (desde una réplica sin el lock)"""
+        if self._conn is None:
+            return
+        try:
+            self._conn.execute(text("SELECT pg_notify(:channel, '')"), {"channel": _WAKEUP_CHANNEL})
+        except Exception as e:
+            logger.error(f"Error forwarding scheduler wakeup: {e}")
+            self._close()
+
+    def release(self) -> None:
+        """Soltar el lock cerrando su conexión"""
+        try:
+            self.unwatch()
+        except RuntimeError:  # fuera del event loop no hay reader registrado
+            pass
+        if engine.dialect.name == "postgresql":
+            self._close()
+
+    def _close(self) -> None:
+        if self._conn is not None:
+            # Cerrar la conexión (sin devolverla al pool) libera lock y LISTEN
+            try:
+                self._conn.invalidate()
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+        self.is_leader = False
+
 
 class ExecutionScheduler:
     """Scheduler para procesar órdenes automáticamente"""
 
     def __init__(self):
         self.is_running = False
-        self.process_interval = 30  # Segundos entre procesamiento
+        self.process_interval = 30  # Máximo de segundos entre procesamiento
+        self.min_process_interval = 1.0  # Espera tras un lote parcial
         self.fill_update_interval = 60  # Segundos entre actualización de fills
+        self.stale_claims_interval = 60  # Segundos entre barridos de claims vencidos
+        self.retry_interval = 0.5  # Segundos entre sondeos de reintentos vencidos
+        self.cleanup_interval = 30 * 60  # Segundos entre tareas de limpieza
+        self.trailing_stops_interval = 60  # Segundos entre checks de trailing stops
+        self.idle_stats_interval = 6 * 60 * 60  # Estadísticas sin actividad
         self.last_process_time = None
         self.last_fill_update_time = None
+        self._last_no_orders_log = None
+        self._last_stats_time = None
+        # Hubo órdenes procesadas/actualizadas desde las últimas estadísticas
+        self._activity_since_stats = False
+        # Próxima ejecución (time.monotonic) de cada subtarea
+        self._next_run: Dict[str, float] = {}
+        # Espera actual del procesamiento: se duplica en reposo hasta process_interval
+        self._process_delay = self.min_process_interval
+        # Con varias réplicas solo la que tiene el lock ejecuta los ticks
+        self._leadership = SchedulerLeadership()
 
     async def start(self):
         """Iniciar el scheduler"""
@@ -28,168 +189,218 @@ class ExecutionScheduler:
             return
 
         self.is_running = True
+        self._next_run.clear()
+        new_order_wakeup.bind()
         logger.info("Starting execution scheduler...")
 
-        logger.info("Trailing stops task scheduled (60s interval)")
+        logger.info("Trailing stops task scheduled (%ss interval)", self.trailing_stops_interval)
 
-        # Iniciar tareas en paralelo
-        await asyncio.gather(
-            self._order_processing_loop(),
-            self._fill_update_loop(),
-            self._cleanup_loop(),
-            self._trailing_stops_loop(),
-        )
+        await self._tick_loop()
 
     def stop(self):
         """Detener el scheduler"""
         self.is_running = False
+        self._leadership.release()
         logger.info("Execution scheduler stopped")
 
-    async def _order_processing_loop(self):
-        """Loop principal de procesamiento de órdenes"""
+    def _subtasks(self) -> List[Tuple[str, float, Callable[[Session], Optional[float]]]]:
+        """(nombre, intervalo, función) de cada subtarea periódica.
+
+        Una subtarea puede devolver los segundos hasta su próxima ejecución
+        en lugar del intervalo fijo.
+        """
+        return [
+            ("process_orders", self._process_delay, self._process_pending_orders),
+            ("retries", self.retry_interval, self._process_due_retries),
+            ("fill_updates", self.fill_update_interval, self._update_fills),
+            ("stale_claims", self.stale_claims_interval, self._release_stale_claims),
+            ("cleanup", self.cleanup_interval, self._cleanup),
+            ("trailing_stops", self.trailing_stops_interval, self._check_trailing_stops),
+        ]
+
+    async def _tick_loop(self):
+        """Loop único: cada tick ejecuta las subtareas vencidas y duerme hasta la siguiente"""
         while self.is_running:
-            try:
-                db: Session = next(get_db())
-                processor = OrderProcessor(db)
-
-                # Contar órdenes pendientes antes de procesar
-                pending_count = (
-                    db.query(Order).filter(Order.status == OrderStatus.NEW).count()
-                )
-
-                if pending_count > 0:
-                    logger.info(f"Processing {pending_count} pending orders...")
-
-                    result = processor.process_pending_orders()
-                    self.last_process_time = datetime.utcnow()
-
-                    if result["successful"] > 0 or result["failed"] > 0:
-                        logger.info(
-                            "Order processing completed: %s successful, %s failed, %s retries",
-                            result["successful"],
-                            result["failed"],
-                            result["retries_scheduled"],
-                        )
+            now = time.monotonic()
+            due = [
+                (name, interval, task)
+                for name, interval, task in self._subtasks()
+                if self._next_run.get(name, 0.0) <= now
+            ]
+
+            if due:
+                # La conexión del lock la usa el hilo del tick
+                self._leadership.unwatch()
+                # La sesión y las llamadas al broker son síncronas: fuera del event loop
+                delays = await asyncio.to_thread(self._run_tick, due)
+                for name, interval, _ in due:
+                    self._next_run[name] = now + delays.get(name, interval)
+
+            # Los NOTIFY de otras réplicas llegan por la conexión del lock
+            self._leadership.watch(new_order_wakeup.notify)
+
+            # Dormir hasta la próxima subtarea, o menos si se confirma una orden nueva
+            timeout = max(0.0, min(self._next_run.values()) - time.monotonic())
+            if await new_order_wakeup.wait(timeout):
+                if self._leadership.is_leader:
+                    self._process_delay = self.min_process_interval
+                    self._next_run["process_orders"] = 0.0
                 else:
-                    # Solo log detallado cada 5 minutos cuando no hay órdenes
-                    if not hasattr(self, "_last_no_orders_log") or (
-                        datetime.utcnow() - self._last_no_orders_log
-                        > timedelta(minutes=5)
-                    ):
-                        logger.debug("No pending orders to process")
-                        self._last_no_orders_log = datetime.utcnow()
-
-                db.close()
-
-            except Exception as e:  # pragma: no cover - just in case
-                logger.error(f"Error in order processing loop: {e}")
-                if "db" in locals():
-                    db.close()
-
-            # Esperar antes del siguiente ciclo
-            await asyncio.sleep(self.process_interval)
-
-    async def _fill_update_loop(self):
-        """Loop para actualizar fills de órdenes activas"""
-        while self.is_running:
-            try:
-                db: Session = next(get_db())
-                processor = OrderProcessor(db)
-
-                # Actualizar fills de órdenes activas
-                result = processor.update_order_fills()
-                self.last_fill_update_time = datetime.utcnow()
-
-                if result["updated"] > 0:
-                    logger.info(
-                        "Fill update completed: %s checked, %s updated, %s filled",
-                        result["checked"],
-                        result["updated"],
-                        result["filled"],
-                    )
-
-                db.close()
-
-            except Exception as e:  # pragma: no cover - just in case
-                logger.error(f"Error in fill update loop: {e}")
-                if "db" in locals():
-                    db.close()
+                    # Otra réplica procesa las órdenes: se le pasa el aviso
+                    await asyncio.to_thread(self._leadership.forward_wakeup)
 
-            # Esperar antes del siguiente ciclo (menos frecuente)
-            await asyncio.sleep(self.fill_update_interval)
+    def _run_tick(
+        self, due: List[Tuple[str, float, Callable[[Session], Optional[float]]]]
+    ) -> Dict[str, float]:
+        """Ejecutar las subtareas vencidas compartiendo una sola sesión.
 
-    async def _cleanup_loop(self):
-        """Loop para tareas de limpieza periódicas"""
-        while self.is_running:
-            try:
-                db: Session = next(get_db())
-
-                # Limpiar órdenes con errores muy antiguas (opcional)
-                cutoff_date = datetime.utcnow() - timedelta(days=30)
-                old_error_orders = (
-                    db.query(Order)
-                    .filter(
-                        Order.status == OrderStatus.ERROR,
-                        Order.created_at < cutoff_date,
-                    )
-                    .count()
+        Devuelve las esperas propuestas por las subtareas que las indicaron.
+        """
+        delays: Dict[str, float] = {}
+        try:
+            if not self._leadership.acquire():
+                logger.debug("Scheduler lock held by another replica, skipping tick")
+                return delays
+            with session_scope() as db:
+                for name, _, task in due:
+                    try:
+                        delay = task(db)
+                        if delay is not None:
+                            delays[name] = delay
+                    except Exception as e:  # pragma: no cover - just in case
+                        logger.error(f"Error in scheduler task {name}: {e}")
+                        db.rollback()
+        except Exception as e:  # pragma: no cover - just in case
+            logger.error(f"Error in scheduler tick: {e}")
+        return delays
+
+    def _process_pending_orders(self, db: Session) -> float:
+        """Procesar órdenes NEW pendientes; devuelve la espera hasta la próxima pasada.
+
+        Un lote completo se repite de inmediato; en reposo la espera se duplica
+        hasta process_interval.
+        """
+        processor = OrderProcessor(db)
+
+        # Contar órdenes pendientes antes de procesar
+        pending_count = db.scalar(_PENDING_COUNT_STMT)
+        claimed = 0
+
+        if pending_count > 0:
+            logger.info(f"Processing {pending_count} pending orders...")
+
+            result = processor.process_pending_orders()
+            self.last_process_time = datetime.utcnow()
+            claimed = result["claimed"]
+
+            if result["successful"] > 0 or result["failed"] > 0:
+                logger.info(
+                    "Order processing completed: %s successful, %s failed, %s retries",
+                    result["successful"],
+                    result["failed"],
+                    result["retries_scheduled"],
                 )
+        else:
+            # Solo log detallado cada 5 minutos cuando no hay órdenes
+            if self._last_no_orders_log is None or (
+                datetime.utcnow() - self._last_no_orders_log > timedelta(minutes=5)
+            ):
+                logger.debug("No pending orders to process")
+                self._last_no_orders_log = datetime.utcnow()
+
+        if not claimed:
+            # Nada listo para enviar (las NEW con next_retry_at futuro son del
+            # loop de reintentos): backoff exponencial
+            self._process_delay = min(self.process_interval, self._process_delay * 2)
+            return self._process_delay
+
+        self._activity_since_stats = True
+        self._process_delay = self.min_process_interval
+        # Lote completo: probablemente quedan más órdenes NEW esperando
+        return 0.0 if claimed >= PENDING_BATCH_SIZE else self._process_delay
+
+    def _process_due_retries(self, db: Session) -> None:
+        """Reenviar las órdenes cuyo next_retry_at ya venció"""
+        result = OrderProcessor(db).process_due_retries()
+        if result["processed"]:
+            self._activity_since_stats = True
+            logger.info(
+                "Retry processing completed: %s successful, %s failed, %s retries",
+                result["successful"],
+                result["failed"],
+                result["retries_scheduled"],
+            )
+
+    def _release_stale_claims(self, db: Session) -> None:
+        """Devolver a NEW las órdenes reclamadas por un proceso que no llegó a enviarlas"""
+        if OrderProcessor(db).release_stale_claims():
+            self._activity_since_stats = True
+            self._process_delay = self.min_process_interval
+            self._next_run["process_orders"] = 0.0
+
+    def _update_fills(self, db: Session) -> None:
+        """Actualizar fills de órdenes activas"""
+        result = OrderProcessor(db).update_order_fills()
+        self.last_fill_update_time = datetime.utcnow()
+
+        if result["updated"] > 0:
+            self._activity_since_stats = True
+            logger.info(
+                "Fill update completed: %s checked, %s updated, %s filled",
+                result["checked"],
+                result["updated"],
+                result["filled"],
+            )
+
+    def _cleanup(self, db: Session) -> None:
+        """Tareas de limpieza y estadísticas periódicas"""
+        # Limpiar órdenes con errores muy antiguas (opcional)
+        cutoff_date = datetime.utcnow() - timedelta(days=30)
+        if db.scalar(_OLD_ERRORS_EXIST_STMT, {"cutoff": cutoff_date}):
+            logger.info("Found old error orders (cleanup could be implemented)")
+
+        # Estadísticas periódicas: en reposo solo cada idle_stats_interval
+        now = datetime.utcnow()
+        if not self._activity_since_stats and self._last_stats_time and (
+            now - self._last_stats_time < timedelta(seconds=self.idle_stats_interval)
+        ):
+            return
 
-                if old_error_orders > 0:
-                    logger.info(
-                        "Found %s old error orders (cleanup could be implemented)",
-                        old_error_orders,
-                    )
-
-                # Estadísticas periódicas (cada 30 minutos)
-                processor = OrderProcessor(db)
-                stats = processor.get_order_statistics()
-
-                logger.info("Execution stats: %s", stats["status_breakdown"])
-
-                db.close()
+        stats = OrderProcessor(db).get_order_statistics()
+        self._last_stats_time = now
+        self._activity_since_stats = False
 
-            except Exception as e:  # pragma: no cover - just in case
-                logger.error(f"Error in cleanup loop: {e}")
-                if "db" in locals():
-                    db.close()
+        logger.info("Execution stats: %s", stats["status_breakdown"])
 
-            # Cleanup cada 30 minutos
-            await asyncio.sleep(30 * 60)
+    def _check_trailing_stops(self, db: Session) -> None:
+        """Revisar trailing stops"""
+        from app.execution.trailing_stop_monitor import TrailingStopMonitor
 
-    async def _trailing_stops_loop(self):
-        """Loop para revisar trailing stops periódicamente"""
-        while self.is_running:
-            try:
-                await self.run_trailing_stops_check()
-            except Exception as e:  # pragma: no cover - safeguard
-                logger.error(f"Error in trailing stops loop: {e}")
-            await asyncio.sleep(60)
+        result = TrailingStopMonitor(db).check_and_update_trailing_stops()
+        logger.info(f"Trailing stops check completed: {result}")
 
     async def run_trailing_stops_check(self):
-        """Ejecutar check de trailing stops"""
+        """Ejecutar check de trailing stops (fuera del ciclo del scheduler)"""
         if not self.is_running:
             return
 
         try:
-            from contextlib import closing
-            from app.execution.trailing_stop_monitor import TrailingStopMonitor
-
-            with closing(next(get_db())) as db:
-                monitor = TrailingStopMonitor(db)
-                result = monitor.check_and_update_trailing_stops()
-
-            logger.info(f"Trailing stops check completed: {result}")
+            await asyncio.to_thread(self._run_trailing_stops_check)
 
         except Exception as e:
             logger.error(f"Error in trailing stops check: {e}")
 
+    def _run_trailing_stops_check(self) -> None:
+        with session_scope() as db:
+            self._check_trailing_stops(db)
+
     def get_status(self) -> Dict[str, Any]:
         """Obtener estado del scheduler"""
         return {
             "is_running": self.is_running,
             "process_interval": self.process_interval,
             "fill_update_interval": self.fill_update_interval,
+            "retry_interval": self.retry_interval,
             "last_process_time": self.last_process_time.isoformat()
             if self.last_process_time
             else None,
@@ -1,5 +1,6 @@
 # backend/app/execution/testing.py
 
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from app.models.signal import Signal
 from app.models.user import User
@@ -11,7 +12,9 @@ from app.schemas.webhook import TradingViewWebhook
 from app.signals.processor import WebhookProcessor
 from typing import Dict, Any, List
 import logging
+import random
 from datetime import datetime
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
@@ -133,6 +136,7 @@ class ExecutionTester:
                 return results
 
             test_order = orders[0]
+            test_order_id = test_order.id
 
             # Paso 3: Procesar la orden (sin enviar al broker real)
             logger.info("Step 3: Processing order (test mode)...")
@@ -149,7 +153,9 @@ class ExecutionTester:
 
             # Paso 4: Verificar estado final
             logger.info("Step 4: Verifying final state...")
-            self.db.refresh(test_order)
+            # El commit de la simulación expira todo: recargar solo lo que se lee
+            self.db.refresh(test_order, attribute_names=["status", "client_order_id"])
+            self.db.refresh(signal_db, attribute_names=["status"])
 
             step4 = {
                 "step": "verify_final_state",
@@ -157,7 +163,7 @@ class ExecutionTester:
                 "data": {
                     "order_status": test_order.status,
                     "signal_status": signal_db.status,
-                    "order_id": test_order.id,
+                    "order_id": test_order_id,
                     "client_order_id": test_order.client_order_id,
                 },
             }
@@ -183,9 +189,7 @@ class ExecutionTester:
             order.sent_at = datetime.utcnow()
 
             # Simular fill parcial o completo
-            import random
-
-            if random.choice([True, False]):
+            if random.getrandbits(1):
                 # Simular fill completo
                 order.status = OrderStatus.FILLED
                 order.filled_quantity = order.quantity
@@ -214,31 +218,89 @@ class ExecutionTester:
                 "error": str(e),
             }
 
+    def simulate_bulk(self, orders: List[Order]) -> Dict[str, Any]:
+        """Simular el procesamiento de muchas órdenes a la vez.
+
+        Precios y tipo de fill se generan como arrays de NumPy y se guardan
+        con un solo bulk update; para una orden usar _simulate_order_processing.
+        """
+        if not orders:
+            return {"success": True, "simulated": True, "filled": 0, "partially_filled": 0}
+
+        try:
+            rng = np.random.default_rng()
+            count = len(orders)
+            prices = (150.0 + rng.uniform(-5, 5, count)).tolist()  # Precios simulados
+            full_fills = rng.integers(0, 2, count).astype(bool).tolist()
+            now = datetime.utcnow()
+
+            # Fills completos y parciales por separado: cada grupo comparte
+            # columnas y sale en un solo executemany
+            full, partial = [], []
+            for order, price, full_fill in zip(orders, prices, full_fills):
+                mapping = {
+                    "id": order.id,
+                    "broker_order_id": f"SIMULATED_{order.client_order_id}",
+                    "sent_at": now,
+                    "avg_fill_price": price,
+                }
+                if full_fill:
+                    mapping["status"] = OrderStatus.FILLED
+                    mapping["filled_quantity"] = order.quantity
+                    mapping["filled_at"] = now
+                    full.append(mapping)
+                else:
+                    mapping["status"] = OrderStatus.PARTIALLY_FILLED
+                    mapping["filled_quantity"] = order.quantity / 2
+                    partial.append(mapping)
+
+            self.db.bulk_update_mappings(Order, full + partial)
+            self.db.commit()
+
+            return {
+                "success": True,
+                "simulated": True,
+                "filled": len(full),
+                "partially_filled": len(partial),
+            }
+
+        except Exception as e:
+            self.db.rollback()
+            return {
+                "success": False,
+                "simulated": True,
+                "error": str(e),
+            }
+
     def get_test_statistics(self) -> Dict[str, Any]:
         """Obtener estadísticas de órdenes de test"""
 
         try:
-            from sqlalchemy import func
-
-            # Contar órdenes por estrategia de test
+            # Conteo por estado en SQL: una fila por estado, sin cargar órdenes
             test_orders = (
                 self.db.query(Order)
                 .join(Signal)
                 .filter(Signal.strategy_id.like("test_%"))
+            )
+            status_counts = dict(
+                test_orders.with_entities(Order.status, func.count(Order.id))
+                .group_by(Order.status)
                 .all()
             )
 
-            # Agrupar por estado
-            status_counts = {}
-            for order in test_orders:
-                status = order.status
-                status_counts[status] = status_counts.get(status, 0) + 1
+            # Últimas 5 órdenes de test, en orden ascendente
+            last_ids = [
+                order_id
+                for (order_id,) in test_orders.with_entities(Order.id)
+                .order_by(Order.id.desc())
+                .limit(5)
+            ]
 
             return {
                 "test_statistics": {
-                    "total_test_orders": len(test_orders),
+                    "total_test_orders": sum(status_counts.values()),
                     "status_breakdown": status_counts,
-                    "test_order_ids": [order.id for order in test_orders[-5:]],
+                    "test_order_ids": last_ids[::-1],
                 },
                 "timestamp": datetime.utcnow().isoformat(),
             }
@@ -254,33 +316,20 @@ class ExecutionTester:
         """Limpiar datos de test creados"""
 
         try:
-            # Buscar señales de test
-            test_signals = (
-                self.db.query(Signal)
-                .filter(
-                    Signal.user_id == user.id,
-                    Signal.strategy_id.like("test_%"),
-                )
-                .all()
+            # Señales de test del usuario (subconsulta, sin cargarlas)
+            test_signals = self.db.query(Signal).filter(
+                Signal.user_id == user.id,
+                Signal.strategy_id.like("test_%"),
             )
+            test_signal_ids = test_signals.with_entities(Signal.id).scalar_subquery()
 
-            # Buscar órdenes asociadas
-            test_signal_ids = [s.id for s in test_signals]
-            test_orders = (
+            # Un DELETE masivo por tabla; órdenes primero (foreign key)
+            orders_deleted = (
                 self.db.query(Order)
                 .filter(Order.signal_id.in_(test_signal_ids))
-                .all()
-            ) if test_signal_ids else []
-
-            # Eliminar órdenes primero (foreign key)
-            orders_deleted = len(test_orders)
-            for order in test_orders:
-                self.db.delete(order)
-
-            # Eliminar señales
-            signals_deleted = len(test_signals)
-            for signal in test_signals:
-                self.db.delete(signal)
+                .delete(synchronize_session=False)
+            )
+            signals_deleted = test_signals.delete(synchronize_session=False)
 
             self.db.commit()
 
@@ -1,13 +1,22 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, contains_eager
 from app.models.order import Order
 from app.models.strategy_exit_rules import StrategyExitRules
 from app.services.exit_rules_service import ExitRulesService
+from app.integrations import broker_client
 from app.core.types import OrderStatus, OrderType
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+import concurrent.futures
 import logging
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
+# Hilo para la petición de precios mientras se cargan padres y reglas: solo
+# recibe la lista de símbolos, nunca la sesión
+_PRICE_FETCH_POOL = concurrent.futures.ThreadPoolExecutor(
+    max_workers=2, thread_name_prefix="trailing-prices"
+)
+
 
 class TrailingStopMonitor:
     def __init__(self, db: Session):
@@ -19,32 +28,78 @@ class TrailingStopMonitor:
         try:
             # 1. Obtener órdenes de stop loss activas con trailing habilitado
             active_stops = self._get_active_trailing_stops()
+
+            # 2. Precios de todos los símbolos en una sola petición
+            #    multi-símbolo al broker, en curso mientras se consulta la BD
+            prices_future = _PRICE_FETCH_POOL.submit(
+                self._get_current_prices, [stop.symbol for stop in active_stops]
+            )
+
+            # 3. Órdenes padre y reglas de salida de todos los stops, un
+            #    SELECT ... IN para cada una
+            parents = self._get_parent_orders(active_stops)
+            rules_by_strategy = self.exit_rules_service.get_many(
+                stop.signal.strategy_id for stop in active_stops
+            )
+            prices = prices_future.result()
             
             results = {
                 "checked": len(active_stops),
                 "updated": 0,
                 "errors": 0,
-                "details": []
+                "details": [None] * len(active_stops)
             }
-            
-            for stop_order in active_stops:
+
+            # 4. Filtrar por stop (precio, reglas, trailing activo)
+            eligible = []  # (índice, stop, padre, precio, porcentaje, stop actual)
+            for i, stop_order in enumerate(active_stops):
                 try:
-                    update_result = self._update_single_trailing_stop(stop_order)
-                    results["details"].append(update_result)
-                    
-                    if update_result["updated"]:
-                        results["updated"] += 1
-                        
+                    # stop_price es nullable: ese stop cuenta como error y
+                    # el resto del ciclo sigue adelante
+                    if stop_order.stop_price is None:
+                        raise ValueError("Stop order has no stop_price")
+                    current_price = prices[stop_order.symbol]
+                    pct, skipped = self._get_trailing_pct(
+                        stop_order,
+                        rules_by_strategy.get(stop_order.signal.strategy_id),
+                        current_price,
+                    )
+                    if skipped is not None:
+                        results["details"][i] = skipped
+                    else:
+                        eligible.append((
+                            i,
+                            stop_order,
+                            parents.get(stop_order.parent_order_id),
+                            current_price,
+                            pct,
+                            float(stop_order.stop_price),
+                        ))
+
                 except Exception as e:
                     logger.error(f"Error updating trailing stop {stop_order.id}: {str(e)}")
                     results["errors"] += 1
-                    results["details"].append({
+                    results["details"][i] = {
                         "order_id": stop_order.id,
                         "symbol": stop_order.symbol,
                         "error": str(e),
                         "updated": False
-                    })
-            
+                    }
+
+            # 5. Nuevos stops de todos los elegibles en una pasada vectorizada
+            for (i, *_), detail in zip(eligible, self._apply_trailing_updates(eligible)):
+                results["details"][i] = detail
+                if detail["updated"]:
+                    results["updated"] += 1
+
+            # Un solo commit para todos los stops movidos en este ciclo
+            if results["updated"]:
+                try:
+                    self.db.commit()
+                except Exception:
+                    self.db.rollback()
+                    raise
+
             logger.info(f"Trailing stops check: {results['checked']} checked, {results['updated']} updated")
             return results
             
@@ -54,9 +109,12 @@ class TrailingStopMonitor:
     
     def _get_active_trailing_stops(self) -> List[Order]:
         """Obtener órdenes de stop loss activas que tienen trailing habilitado"""
+        # La señal llega en el mismo SELECT (contains_eager sobre el join):
+        # leer stop.signal no dispara un lazy load por orden
         return (
             self.db.query(Order)
             .join(Order.signal)
+            .options(contains_eager(Order.signal))
             .filter(
                 Order.order_type == OrderType.STOP.value,
                 Order.status.in_(["new", "sent", "accepted"]),
@@ -65,110 +123,143 @@ class TrailingStopMonitor:
             .all()
         )
     
-    def _update_single_trailing_stop(self, stop_order: Order) -> Dict[str, Any]:
-        """Actualizar un trailing stop individual"""
-        try:
-            # 1. Obtener precio actual del símbolo
-            current_price = self._get_current_price(stop_order.symbol)
-            if current_price <= 0:
-                return {
-                    "order_id": stop_order.id,
-                    "symbol": stop_order.symbol,
-                    "error": "Could not get current price",
-                    "updated": False
-                }
-            
-            # 2. Obtener reglas de trailing para la estrategia
-            signal = stop_order.signal
+    def _get_parent_orders(self, stops: List[Order]) -> Dict[int, Order]:
+        """{id: orden padre} de los stops dados"""
+        parent_ids = {stop.parent_order_id for stop in stops}
+        if not parent_ids:
+            return {}
+        return {
+            order.id: order
+            for order in self.db.query(Order).filter(Order.id.in_(parent_ids))
+        }
+
+    def _get_trailing_pct(
+        self,
+        stop_order: Order,
+        strategy_rules: Optional[StrategyExitRules],
+        current_price: float,
+    ) -> Tuple[Optional[float], Optional[Dict[str, Any]]]:
+        """(porcentaje de trailing, None) si el stop es elegible; (None, detalle) si no.
+
+        ``strategy_rules``: reglas ya cargadas; si faltan se buscan (o se crean
+        las de por defecto) con get_rules. ``current_price``: precio del
+        símbolo consultado una vez por ciclo.
+        """
+        # 1. Precio actual del símbolo (0 si la consulta falló)
+        if current_price <= 0:
+            return None, {
+                "order_id": stop_order.id,
+                "symbol": stop_order.symbol,
+                "error": "Could not get current price",
+                "updated": False
+            }
+
+        # 2. Obtener reglas de trailing para la estrategia
+        if strategy_rules is None:
             strategy_rules = self.exit_rules_service.get_rules(
-                signal.strategy_id, stop_order.user_id
-            )
-            
-            if not strategy_rules.use_trailing:
-                return {
-                    "order_id": stop_order.id,
-                    "symbol": stop_order.symbol,
-                    "message": "Trailing disabled for strategy",
-                    "updated": False
-                }
-            
-            # 3. Calcular nuevo stop loss basado en precio actual
-            new_stop_price = self._calculate_new_trailing_stop(
-                stop_order, current_price, strategy_rules
+                stop_order.signal.strategy_id, stop_order.user_id
             )
-            
-            # 4. Actualizar si el nuevo stop es mejor que el actual
-            if self._should_update_stop(stop_order, new_stop_price):
-                old_stop_price = stop_order.stop_price
+        elif strategy_rules.user_id != stop_order.user_id:
+            raise PermissionError("Not authorized to access these exit rules")
+
+        if not strategy_rules.use_trailing:
+            return None, {
+                "order_id": stop_order.id,
+                "symbol": stop_order.symbol,
+                "message": "Trailing disabled for strategy",
+                "updated": False
+            }
+
+        return float(strategy_rules.trailing_stop_pct), None
+
+    def _apply_trailing_updates(self, eligible: List[tuple]) -> List[Dict[str, Any]]:
+        """Mover los stops elegibles que mejoran; un detalle por stop, en orden"""
+        if not eligible:
+            return []
+
+        _, stops, parents, current_prices, pcts, current_stops = zip(*eligible)
+        # La orden padre da la dirección: compra = posición larga
+        is_long = np.array([p is not None and p.side == "buy" for p in parents])
+        current_stops = np.array(current_stops, dtype=float)
+        new_stops, should_update = self._trailing_kernel(
+            np.array(current_prices, dtype=float),
+            np.array(pcts, dtype=float),
+            current_stops,
+            is_long,
+        )
+
+        details = []
+        for stop_order, current_price, old_stop_price, new_stop_price, update in zip(
+            stops, current_prices, current_stops.tolist(), new_stops.tolist(), should_update.tolist()
+        ):
+            if update:
+                # Sin commit aquí: el ciclo confirma todos los cambios juntos
                 stop_order.stop_price = new_stop_price
-                self.db.commit()
-                
+
                 logger.info(
                     f"Updated trailing stop {stop_order.id} {stop_order.symbol}: "
                     f"{old_stop_price} -> {new_stop_price}"
                 )
-                
+
                 # TODO: Enviar actualización al broker en siguiente tarea
-                
-                return {
+
+                details.append({
                     "order_id": stop_order.id,
                     "symbol": stop_order.symbol,
-                    "old_stop_price": float(old_stop_price),
-                    "new_stop_price": float(new_stop_price),
+                    "old_stop_price": old_stop_price,
+                    "new_stop_price": new_stop_price,
                     "current_price": current_price,
                     "updated": True
-                }
+                })
             else:
-                return {
+                details.append({
                     "order_id": stop_order.id,
                     "symbol": stop_order.symbol,
                     "current_price": current_price,
-                    "stop_price": float(stop_order.stop_price),
+                    "stop_price": old_stop_price,
                     "message": "No update needed",
                     "updated": False
-                }
-                
-        except Exception as e:
-            logger.error(f"Error updating trailing stop {stop_order.id}: {str(e)}")
-            raise
-    
-    def _calculate_new_trailing_stop(self, stop_order: Order, current_price: float, rules: StrategyExitRules) -> float:
-        """Calcular nuevo precio de trailing stop"""
-        # Obtener la orden padre para determinar la dirección
-        parent_order = self.db.query(Order).filter(Order.id == stop_order.parent_order_id).first()
-        
-        if parent_order and parent_order.side == "buy":
-            # Posición larga: trailing stop sube con el precio
-            new_stop = current_price * (1 - rules.trailing_stop_pct)
-        else:
-            # Posición corta: trailing stop baja con el precio
-            new_stop = current_price * (1 + rules.trailing_stop_pct)
-        
-        return round(new_stop, 2)
-    
-    def _should_update_stop(self, stop_order: Order, new_stop_price: float) -> bool:
-        """Determinar si el stop loss debe actualizarse"""
-        current_stop = float(stop_order.stop_price)
-        
-        # Obtener la orden padre para determinar la dirección
-        parent_order = self.db.query(Order).filter(Order.id == stop_order.parent_order_id).first()
-        
-        if parent_order and parent_order.side == "buy":
-            # Posición larga: solo actualizar si el nuevo stop es más alto (más protección)
-            return new_stop_price > current_stop
-        else:
-            # Posición corta: solo actualizar si el nuevo stop es más bajo
-            return new_stop_price < current_stop
-    
-    def _get_current_price(self, symbol: str) -> float:
-        """Obtener precio actual del símbolo"""
+                })
+        return details
+
+    @staticmethod
+    def _trailing_kernel(
+        prices: np.ndarray, pcts: np.ndarray, current_stops: np.ndarray, is_long: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """(nuevos stops, máscara de actualización) para todos los stops a la vez.
+
+        Largos: el stop sube con el precio y solo se mueve hacia arriba.
+        Cortos: baja con el precio y solo se mueve hacia abajo.
+        """
+        new_stops = np.round(
+            np.where(is_long, prices * (1 - pcts), prices * (1 + pcts)), 2
+        )
+        should_update = np.where(
+            is_long, new_stops > current_stops, new_stops < current_stops
+        )
+        return new_stops, should_update
+
+    def _get_current_prices(self, symbols: Iterable[str]) -> Dict[str, float]:
+        """{símbolo: precio} con una sola llamada al broker (0.0 si no hay dato)"""
+        unique = list(dict.fromkeys(symbols))
+        if not unique:
+            return {}
         try:
-            from app.integrations import broker_client
-            trade = broker_client.get_latest_trade(symbol)
-            return float(getattr(trade, "price", 0.0))
+            trades = broker_client.get_latest_trades(unique)
         except Exception as e:
-            logger.error(f"Error getting current price for {symbol}: {e}")
-            return 0.0
+            # Sin lote: símbolo a símbolo, para que un fallo no deje a todos los
+            # stops sin precio
+            logger.error(f"Error getting current prices for {unique}: {e}")
+            trades = {}
+            for symbol in unique:
+                try:
+                    trades[symbol] = broker_client.get_latest_trade(symbol)
+                except Exception as e:
+                    logger.error(f"Error getting current price for {symbol}: {e}")
+        return {
+            symbol: float(getattr(trades.get(symbol), "price", 0.0))
+            for symbol in unique
+        }
     
     def get_trailing_stops_summary(self) -> Dict[str, Any]:
         """Obtener resumen de trailing stops activos"""
@@ -3,6 +3,7 @@ from __future__ import annotations
 
 from types import SimpleNamespace
 from datetime import datetime, time
+from time import monotonic
 import concurrent.futures
 import logging
 from decimal import Decimal
@@ -26,6 +27,15 @@ from app.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Pool compartido para las llamadas REST con timeout: evita crear (y esperar a
+# cerrar) un hilo por petición, y permite que varias órdenes salgan en paralelo
+_BROKER_CALL_POOL = concurrent.futures.ThreadPoolExecutor(
+    max_workers=8, thread_name_prefix="alpaca-rest"
+)
+
+# Segundos que se reutiliza un listado completo de assets (miles de filas)
+ASSET_LIST_TTL = 5 * 60
+
 
 def _in_regular_trading_hours(now: datetime | None = None) -> bool:
     current = now.astimezone(EASTERN_TZ) if now else now_eastern()
@@ -55,17 +65,32 @@ class AlpacaClient:
         self._trading: TradingClient | None = None
         self._stock_data: StockHistoricalDataClient | None = None
         self._crypto_data: CryptoHistoricalDataClient | None = None
+        # Metadatos de assets consultados al broker (los símbolos son un conjunto
+        # acotado y clase/fraccionabilidad no cambian durante la sesión)
+        self._asset_cache: dict[str, SimpleNamespace] = {}
+        # Listados de get_all_assets por (status, asset_class): (instante, assets)
+        self._asset_lists: dict[tuple[str, str], tuple[float, list]] = {}
+        # Credenciales con las que se construyeron los clientes REST
+        self._credentials: tuple | None = None
         self.refresh()
 
     def refresh(self) -> None:
-        """Refresh credentials from settings."""
+        """Refresh credentials from settings.
+
+        The REST clients are rebuilt only when the credentials changed.
+        """
+        self._asset_cache.clear()
+        self._asset_lists.clear()
         self.api_key = getattr(settings, "alpaca_api_key", None) or ""
         self.api_secret = getattr(settings, "alpaca_secret_key", None) or ""
         self.base_url = getattr(settings, "alpaca_base_url", None)
         paper_mode = getattr(settings, "alpaca_paper", None)
         if paper_mode is None:
             paper_mode = "paper" in (self.base_url or "").lower()
+        credentials = (self.api_key, self.api_secret, self.base_url, paper_mode)
         if self.api_key and self.api_secret:
+            if credentials == self._credentials and self._trading is not None:
+                return
             self._trading = TradingClient(
                 self.api_key,
                 self.api_secret,
@@ -74,11 +99,13 @@ class AlpacaClient:
             )
             self._stock_data = StockHistoricalDataClient(self.api_key, self.api_secret)
             self._crypto_data = CryptoHistoricalDataClient(self.api_key, self.api_secret)
+            self._credentials = credentials
             logger.info("🔌 Alpaca credentials detected, REST client ready")
         else:
             self._trading = None
             self._stock_data = None
             self._crypto_data = None
+            self._credentials = None
             logger.warning("⚠️ Alpaca API credentials not provided; REST client not initialized")
 
     # --- Basic account helpers -------------------------------------------------
@@ -179,9 +206,8 @@ class AlpacaClient:
 
         timeout = timeout or self.timeout
         try:
-            with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
-                fut = executor.submit(self._trading.submit_order, order_data)
-                order = fut.result(timeout=timeout)
+            fut = _BROKER_CALL_POOL.submit(self._trading.submit_order, order_data)
+            order = fut.result(timeout=timeout)
             return SimpleNamespace(
                 id=order.id, symbol=symbol, qty=Decimal(str(qty)), side=side, status=order.status
             )
@@ -205,14 +231,12 @@ class AlpacaClient:
         treated as crypto.
         """
         symbol = (symbol or "").upper()
-        if self._trading:
-            try:
-                asset = self._trading.get_asset(symbol)
-                cls = getattr(asset, "asset_class", "").lower()
-                if cls:
-                    return cls == "crypto"
-            except Exception:
-                pass
+        try:
+            asset = self._asset(symbol)
+        except Exception:
+            asset = None
+        if asset is not None and asset.asset_class:
+            return asset.asset_class == "crypto"
         if "/" in symbol:
             return True
         return symbol.endswith(("USD", "USDT", "USDC"))
@@ -245,21 +269,15 @@ class AlpacaClient:
                 if not self._crypto_data:
                     raise RuntimeError("Alpaca API credentials not configured")
                 req = CryptoLatestTradeRequest(symbol_or_symbols=symbol)
-                with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
-                    fut = executor.submit(
-                        self._crypto_data.get_crypto_latest_trade, req
-                    )
-                    t = fut.result(timeout=timeout)[symbol]
+                fut = _BROKER_CALL_POOL.submit(self._crypto_data.get_crypto_latest_trade, req)
+                t = fut.result(timeout=timeout)[symbol]
                 return SimpleNamespace(price=Decimal(str(t.price)))
             else:
                 if not self._stock_data:
                     raise RuntimeError("Alpaca API credentials not configured")
                 req = StockLatestTradeRequest(symbol_or_symbols=symbol)
-                with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
-                    fut = executor.submit(
-                        self._stock_data.get_stock_latest_trade, req
-                    )
-                    t = fut.result(timeout=timeout)[symbol]
+                fut = _BROKER_CALL_POOL.submit(self._stock_data.get_stock_latest_trade, req)
+                t = fut.result(timeout=timeout)[symbol]
                 return SimpleNamespace(price=Decimal(str(t.price)))
         except concurrent.futures.TimeoutError:
             logger.error(
@@ -270,6 +288,82 @@ class AlpacaClient:
             logger.exception("get_latest_trade failed for %s: %s", symbol, e)
             raise
 
+    def get_latest_trades(self, symbols, timeout=None):
+        """{símbolo: último trade} con una petición por clase de activo"""
+        trades = self._latest_for_symbols(
+            symbols,
+            StockLatestTradeRequest,
+            "get_stock_latest_trade",
+            CryptoLatestTradeRequest,
+            "get_crypto_latest_trade",
+            timeout,
+        )
+        return {
+            symbol: SimpleNamespace(price=Decimal(str(t.price)))
+            for symbol, t in trades.items()
+        }
+
+    def _latest_for_symbols(
+        self, symbols, stock_request, stock_method, crypto_request, crypto_method, timeout
+    ):
+        """Partir los símbolos en stocks/crypto y pedir cada grupo en una sola
+        llamada multi-símbolo (symbol_or_symbols=[...]). Los símbolos sin
+        datos no aparecen en el resultado.
+
+        Cada grupo se resuelve por separado: si su petición en lote falla
+        (símbolo inválido, timeout...) se repite símbolo a símbolo, y un
+        símbolo que falla solo se pierde a sí mismo."""
+        timeout = timeout or self.timeout
+        stocks, cryptos = [], []
+        for symbol in dict.fromkeys(symbols):
+            (cryptos if self.is_crypto_symbol(symbol) else stocks).append(symbol)
+
+        groups = []
+        for group, data, request, method in (
+            (stocks, self._stock_data, stock_request, stock_method),
+            (cryptos, self._crypto_data, crypto_request, crypto_method),
+        ):
+            if not group:
+                continue
+            if not data:
+                logger.error("Alpaca API credentials not configured, no data for %s", group)
+                continue
+            call = getattr(data, method)
+            # Ambos grupos salen en paralelo
+            fut = _BROKER_CALL_POOL.submit(call, request(symbol_or_symbols=group))
+            groups.append((group, call, request, fut))
+
+        result = {}
+        for group, call, request, fut in groups:
+            try:
+                result.update(fut.result(timeout=timeout))
+            except Exception as e:
+                logger.warning(
+                    "latest market data batch failed for %s (%s), retrying per symbol",
+                    group,
+                    e,
+                )
+                result.update(self._latest_per_symbol(group, call, request, timeout))
+        return result
+
+    @staticmethod
+    def _latest_per_symbol(symbols, call, request, timeout):
+        """Una petición por símbolo, en paralelo; omite los que fallan"""
+        futures = {
+            symbol: _BROKER_CALL_POOL.submit(call, request(symbol_or_symbols=symbol))
+            for symbol in symbols
+        }
+        result = {}
+        for symbol, fut in futures.items():
+            try:
+                data = fut.result(timeout=timeout)
+            except Exception as e:
+                logger.error("latest market data failed for %s: %s", symbol, e)
+                continue
+            if symbol in data:
+                result[symbol] = data[symbol]
+        return result
+
     # --- Misc -----------------------------------------------------------------
     def list_orders(self, status="all", limit=10):
         if not self._trading:
@@ -287,15 +381,60 @@ class AlpacaClient:
             for o in orders
         ]
 
+    def get_order(self, order_id):
+        if not self._trading:
+            return None
+        return self._trading.get_order_by_id(order_id)
+
+    def get_orders_by_id(self, order_ids, after=None):
+        """Fetch several orders, keyed by id, with as few REST calls as possible.
+
+        Alpaca's list endpoint can't filter by id, so orders created since
+        ``after`` are listed in one page (max 500) and matched locally; ids
+        not on that page are fetched individually.
+        """
+        if not self._trading or not order_ids:
+            return {}
+        wanted = {str(order_id) for order_id in order_ids}
+        req = GetOrdersRequest(status=QueryOrderStatus.ALL, limit=500, after=after)
+        found = {
+            str(o.id): o for o in self._trading.get_orders(req) if str(o.id) in wanted
+        }
+        for order_id in wanted - found.keys():
+            try:
+                found[order_id] = self._trading.get_order_by_id(order_id)
+            except APIError as e:
+                logger.warning("Order %s not found at broker: %s", order_id, e)
+        return found
+
     def is_asset_fractionable(self, symbol):
         if not self._trading:
             return True
         try:
-            asset = self._trading.get_asset(symbol)
-            return bool(getattr(asset, "fractionable", True))
+            return self._asset((symbol or "").upper()).fractionable
         except Exception:
             return True
 
+    def _asset(self, symbol: str) -> SimpleNamespace | None:
+        """Metadatos del asset, consultados al broker una sola vez por símbolo.
+
+        Devuelve None sin credenciales; los errores del broker se propagan y no
+        se guardan en caché. refresh() vacía la caché.
+        """
+        cached = self._asset_cache.get(symbol)
+        if cached is not None:
+            return cached
+        if not self._trading:
+            return None
+        a = self._trading.get_asset(symbol)
+        asset = self._asset_cache[symbol] = SimpleNamespace(
+            symbol=getattr(a, "symbol", symbol),
+            asset_class=getattr(a, "asset_class", "").lower(),
+            fractionable=bool(getattr(a, "fractionable", True)),
+            status=getattr(a, "status", None),
+        )
+        return asset
+
     def check_crypto_status(self):
         """Check if the account has crypto trading permissions.
 
@@ -307,9 +446,7 @@ class AlpacaClient:
             logger.warning("⚠️ Alpaca client not initialized; cannot check crypto status")
             return False
         try:
-            assets = self._trading.get_all_assets(
-                status="active", asset_class="crypto"
-            )
+            assets = self._get_all_assets_cached("active", "crypto")
             if not assets:
                 logger.warning(
                     "⚠️ Crypto trading not enabled for this account or no assets returned"
@@ -326,21 +463,33 @@ class AlpacaClient:
     def get_crypto_assets(self):
         if not self._trading:
             return []
-        assets = self._trading.get_all_assets(status="active", asset_class="crypto")
+        assets = self._get_all_assets_cached("active", "crypto")
         return [a.symbol for a in assets]
 
     def list_assets(self, status="active", asset_class="us_equity"):
         if not self._trading:
             return []
-        assets = self._trading.get_all_assets(status=status, asset_class=asset_class)
+        assets = self._get_all_assets_cached(status, asset_class)
         return [SimpleNamespace(symbol=a.symbol) for a in assets]
 
+    def _get_all_assets_cached(self, status: str, asset_class: str) -> list:
+        """Listado de assets de una clase, reutilizado durante ASSET_LIST_TTL.
+
+        Los errores no se guardan; refresh() vacía la caché.
+        """
+        key = (status, asset_class)
+        cached = self._asset_lists.get(key)
+        if cached is not None and monotonic() - cached[0] < ASSET_LIST_TTL:
+            return cached[1]
+        assets = list(self._trading.get_all_assets(status=status, asset_class=asset_class) or [])
+        self._asset_lists[key] = (monotonic(), assets)
+        return assets
+
     def get_asset(self, symbol):
         if not self._trading:
             return None
         try:
-            a = self._trading.get_asset(symbol)
-            return SimpleNamespace(symbol=a.symbol)
+            return self._asset((symbol or "").upper())
         except Exception:
             return None
 
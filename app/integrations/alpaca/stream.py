@@ -1,5 +1,6 @@
 import asyncio
-import json
+
+import orjson
 
 from alpaca.trading.stream import TradingStream
 
@@ -61,7 +62,7 @@ class AlpacaStream:
             "buying_power": float(getattr(account, "buying_power", 0)),
             "total_positions": summary.get("total_positions", 0),
         }
-        await ws_manager.broadcast(json.dumps({"event": "account_update", "payload": payload}))
+        await ws_manager.broadcast(orjson.dumps({"event": "account_update", "payload": payload}))
 
     async def _handle_trade_update(self, update) -> None:
         await self._broadcast_account_update()
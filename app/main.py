@@ -1,3 +1,5 @@
+import asyncio
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
@@ -14,7 +16,7 @@ from app.api.v1.portfolio_performance import (
 )
 from app.api.ws import router as ws_router
 from app.api.v1 import auth, trades, strategies, portfolio, risk, system, positions, reports, execution
-from app.database import SessionLocal
+from app.database import SessionLocal, warm_up_pool
 from app.services import portfolio_service
 from app.integrations import refresh_broker_client
 
@@ -56,7 +58,8 @@ app.include_router(ws_router)
 
 @app.on_event("startup")
 async def start_streams():
-    """Refresh the active portfolio on startup."""
+    """Warm up the DB pool and refresh the active portfolio on startup."""
+    await asyncio.to_thread(warm_up_pool)
     db = SessionLocal()
     try:
         portfolio_service.get_active(db)
@@ -10,10 +10,12 @@ from sqlalchemy import (
     Text,
     ForeignKey,
     DECIMAL,
+    Index,
 )
 from sqlalchemy.orm import relationship, backref
 from app.database import Base
 from app.core.types import OrderStatus, OrderType
+from app.utils.time import utc_now
 from datetime import datetime
 from typing import Optional
 
@@ -39,11 +41,13 @@ class Order(Base):
     stop_price = Column(DECIMAL(12, 4), nullable=True)
     
     # Estado y timestamps
-    status = Column(String(20), nullable=False, default=OrderStatus.NEW, index=True)
+    # Sin índice propio: lo cubren ix_orders_status_created_at y los parciales
+    status = Column(String(20), nullable=False, default=OrderStatus.NEW)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     sent_at = Column(DateTime, nullable=True)
     filled_at = Column(DateTime, nullable=True)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Reloj de la base de datos: los UPDATE no envían la hora como parámetro
+    updated_at = Column(DateTime, server_default=utc_now(), onupdate=utc_now())
     
     # Ejecución
     filled_quantity = Column(DECIMAL(12, 4), default=0, nullable=False)
@@ -52,6 +56,7 @@ class Order(Base):
     
     # Retry y error handling
     retry_count = Column(Integer, default=0, nullable=False)
+    next_retry_at = Column(DateTime, nullable=True)  # No reintentar antes de este instante
     last_error = Column(Text, nullable=True)
     notes = Column(Text, nullable=True)
     
@@ -65,7 +70,8 @@ class Order(Base):
     
     # Relaciones
     signal_id = Column(Integer, ForeignKey("signals.id"), nullable=False, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    # Índice: ix_orders_user_status (user_id es su primera columna)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     portfolio_id = Column(Integer, ForeignKey("portfolios.id"), nullable=True, index=True)
     
     # Relationships
@@ -79,6 +85,27 @@ class Order(Base):
         cascade="all, delete-orphan",
     )
     
+    __table_args__ = (
+        # Sondeo de reintentos: solo órdenes NEW, ordenadas por next_retry_at
+        Index(
+            "ix_orders_retry",
+            next_retry_at,
+            postgresql_where=(status == OrderStatus.NEW.value),
+        ),
+        # Lote de pendientes: órdenes NEW en orden de llegada
+        Index(
+            "ix_orders_pending",
+            created_at,
+            postgresql_where=(status == OrderStatus.NEW.value),
+        ),
+        # Filtros por estado + antigüedad (limpieza, estadísticas)
+        Index("ix_orders_status_created_at", status, created_at),
+        # Órdenes activas de un usuario
+        Index("ix_orders_user_status", user_id, status),
+        # Hijas de una bracket order (carga de child_orders, cancelación OCO)
+        Index("ix_orders_parent_order_id", parent_order_id),
+    )
+
     def __repr__(self):
         return f"<Order(id={self.id}, client_order_id='{self.client_order_id}', symbol='{self.symbol}', side='{self.side}', status='{self.status}')>"
     
@@ -1,6 +1,6 @@
 # backend/app/models/signal.py
 
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text, ForeignKey, Index
 from sqlalchemy.orm import relationship, foreign
 from app.database import Base
 from app.utils.time import now_eastern
@@ -46,5 +46,13 @@ class Signal(Base):
         primaryjoin="foreign(Signal.strategy_id)==Strategy.name",
     )
 
+    # Índice compuesto para el listado de señales por usuario/portfolio (ORDER BY timestamp DESC)
+    __table_args__ = (
+        Index("ix_signals_user_pf_ts", user_id, portfolio_id, timestamp.desc()),
+    )
+
+    # Recuperar defaults en el propio INSERT (RETURNING) en vez de un SELECT posterior
+    __mapper_args__ = {"eager_defaults": True}
+
     def __repr__(self):
         return f"<Signal({self.strategy_id}:{self.symbol}, {self.action}, {self.status}, user:{self.user_id})>"
@@ -57,4 +57,5 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     email: Optional[str] = None
+    exp: Optional[int] = None
 
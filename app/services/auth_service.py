@@ -3,13 +3,15 @@
 from datetime import timedelta
 from app.utils.time import now_eastern
 from typing import Optional
-from jose import JWTError, jwt
+from jose import JOSEError, jwk, jws, jwt
 from passlib.context import CryptContext
 from sqlalchemy.orm import Session
 from app.config import settings
 from app.models.user import User
 from app.schemas.auth import TokenData
 import secrets
+import time
+import orjson
 
 # Configuración de encriptación
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -20,6 +22,13 @@ class AuthService:
         self.secret_key = settings.jwt_secret_key
         self.algorithm = settings.jwt_algorithm
         self.access_token_expire_minutes = settings.jwt_access_token_expire_minutes
+        # Clave HMAC construida una sola vez; jose la reutiliza sin re-parsear el secreto
+        self._verify_key = (
+            jwk.construct(self.secret_key, self.algorithm)
+            if self.algorithm.startswith("HS")
+            else self.secret_key
+        )
+        self._algorithms = [self.algorithm]
 
     def verify_password(self, plain_password: str, hashed_password: str) -> bool:
         """Verificar password"""
@@ -45,16 +54,24 @@ class AuthService:
     def verify_token(self, token: str) -> Optional[TokenData]:
         """Verificar y decodificar JWT token"""
         try:
-            payload = jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
+            # Firma verificada por jose; el payload se parsea con orjson
+            payload = orjson.loads(jws.verify(token, self._verify_key, self._algorithms))
+            if not isinstance(payload, dict):
+                return None
+
+            exp = payload.get("exp")
+            if exp is not None and (not isinstance(exp, int) or exp < time.time()):
+                return None
+
             email: str = payload.get("sub")
 
             if email is None:
                 return None
 
-            token_data = TokenData(email=email)
+            token_data = TokenData(email=email, exp=exp)
             return token_data
 
-        except JWTError:
+        except (JOSEError, orjson.JSONDecodeError):
             return None
 
     def authenticate_user(self, db: Session, email: str, password: str) -> Optional[User]:
@@ -6,16 +6,20 @@ import asyncio
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
+from sqlalchemy import and_, or_, bindparam
 
 from app.database import SessionLocal
 from app.models.order import Order
-from app.core.types import OrderStatus
+from app.core.types import OrderStatus, WORKING_ORDER_STATES
 from app.execution.order_executor import OrderExecutor
 from app.execution.bracket_order_processor import BracketOrderProcessor
 
 logger = logging.getLogger(__name__)
 
+# Filtro de estado con parámetro expanding: una sola sentencia compilada en caché
+_WORKING_STATUS_CLAUSE = Order.status.in_(bindparam("working_states", expanding=True))
+_WORKING_STATES = tuple(WORKING_ORDER_STATES)
+
 
 class BracketReconciliationService:
     """Servicio de reconciliación automática para bracket orders"""
@@ -113,14 +117,14 @@ class BracketReconciliationService:
 
                         activation_result = await self.bracket_processor.activate_bracket_orders(parent_order.id)
 
-                        if activation_result["status"] == "success":
+                        if activation_result.status == "success":
                             result["fixed"] += 1
                             logger.info(f"Successfully activated bracket {parent_order.id}")
                         else:
                             result["errors"].append(
                                 {
                                     "parent_order_id": parent_order.id,
-                                    "error": activation_result.get("message", "Unknown error"),
+                                    "error": activation_result.message or "Unknown error",
                                 }
                             )
 
@@ -150,10 +154,10 @@ class BracketReconciliationService:
                 and_(
                     Order.parent_order_id.isnot(None),
                     Order.broker_order_id.isnot(None),
-                    Order.status.in_([OrderStatus.SENT, OrderStatus.ACCEPTED]),
+                    _WORKING_STATUS_CLAUSE,
                     Order.updated_at < datetime.utcnow() - timedelta(minutes=10)
                 )
-            ).all()
+            ).params(working_states=_WORKING_STATES).all()
 
             for child_order in child_orders:
                 try:
@@ -234,7 +238,7 @@ class BracketReconciliationService:
                     pending_children = [
                         child
                         for child in active_children
-                        if child.status in [OrderStatus.SENT, OrderStatus.ACCEPTED]
+                        if child.status in WORKING_ORDER_STATES
                     ]
 
                     if len(filled_children) > 0 and len(pending_children) > 0:
@@ -306,7 +310,7 @@ class BracketReconciliationService:
                 )
 
                 if (
-                    orphaned.status in [OrderStatus.SENT, OrderStatus.ACCEPTED]
+                    orphaned.status in WORKING_ORDER_STATES
                     and orphaned.broker_order_id
                 ):
 
@@ -1,6 +1,6 @@
 from sqlalchemy.orm import Session
 from app.models.strategy_exit_rules import StrategyExitRules
-from typing import Dict, Any
+from typing import Dict, Any, Iterable, Optional
 import logging
 from decimal import Decimal
 
@@ -11,11 +11,29 @@ class ExitRulesService:
     def __init__(self, db: Session):
         self.db = db
 
+    def get_exit_rules(self, strategy_id: str, user_id: int) -> Optional[StrategyExitRules]:
+        """Obtener reglas de salida existentes (sin crear defaults)"""
+        # id es la PK: Session.get reutiliza el identity map si ya están cargadas
+        rules = self.db.get(StrategyExitRules, strategy_id)
+
+        if rules and rules.user_id != user_id:
+            raise PermissionError("Not authorized to access these exit rules")
+
+        return rules
+
+    def get_many(self, strategy_ids: Iterable[str]) -> Dict[str, StrategyExitRules]:
+        """Reglas de varias estrategias en una sola consulta, indexadas por strategy_id"""
+        ids = set(strategy_ids)
+        if not ids:
+            return {}
+        return {
+            rules.id: rules
+            for rules in self.db.query(StrategyExitRules).filter(StrategyExitRules.id.in_(ids))
+        }
+
     def get_rules(self, strategy_id: str, user_id: int) -> StrategyExitRules:
         """Obtener reglas de salida para una estrategia, crear defaults si no existen"""
-        rules = self.db.query(StrategyExitRules).filter(
-            StrategyExitRules.id == strategy_id
-        ).first()
+        rules = self.db.get(StrategyExitRules, strategy_id)
 
         if rules and rules.user_id != user_id:
             raise PermissionError("Not authorized to access these exit rules")
@@ -67,10 +85,22 @@ class ExitRulesService:
         return rules
     
     def calculate_exit_prices(
-        self, strategy_id: str, user_id: int, entry_price: Decimal, side: str = "buy"
+        self,
+        strategy_id: str,
+        user_id: int,
+        entry_price: Decimal,
+        side: str = "buy",
+        rules: Optional[StrategyExitRules] = None,
     ) -> Dict[str, Any]:
-        """Calcular precios de salida para una estrategia específica"""
-        rules = self.get_rules(strategy_id, user_id)
+        """Calcular precios de salida para una estrategia específica.
+
+        ``rules`` permite pasar reglas ya cargadas (p. ej. con get_many) y
+        evitar otra consulta.
+        """
+        if rules is None:
+            rules = self.get_rules(strategy_id, user_id)
+        elif rules.user_id != user_id:
+            raise PermissionError("Not authorized to access these exit rules")
         entry_price = Decimal(str(entry_price))
         exit_prices = rules.calculate_exit_prices(entry_price, side)
         
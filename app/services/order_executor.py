@@ -10,8 +10,7 @@ import logging
 from app.models.trades import Trade
 from app.utils.time import now_eastern
 from app.websockets import ws_manager
-import asyncio
-import json
+import orjson
 from alpaca.common.exceptions import APIError
 from sqlalchemy.exc import SQLAlchemyError
 from app.services.symbol_mapper import get_mapped_symbol
@@ -29,6 +28,11 @@ class OrderExecutor:
         """Verificar si es un símbolo de crypto"""
         return '/' in symbol or symbol.endswith('USD')
 
+    def is_fractionable(self, symbol):
+        """Crypto siempre es fraccionable; para el resto se consulta el broker,
+        que memoiza el asset por símbolo hasta el próximo refresh()"""
+        return self.is_crypto(symbol) or self.broker.is_asset_fractionable(symbol)
+
     def map_symbol(self, symbol: str) -> str:
         """Convert external symbols to broker format using DB mapping."""
         mapped = get_mapped_symbol(symbol)
@@ -87,7 +91,7 @@ class OrderExecutor:
             logger.exception("Unexpected error fetching quote for %s", mapped_symbol)
             raise
 
-        is_fractionable = self.broker.is_asset_fractionable(final_symbol)
+        is_fractionable = self.is_fractionable(final_symbol)
         print(f"🔍 Asset {final_symbol} is fractionable: {is_fractionable}")
 
         from app.services.risk_manager import risk_manager
@@ -105,7 +109,7 @@ class OrderExecutor:
 
         print(f"📐 Smart allocation quantity: {base_qty}")
 
-        if self.is_crypto(symbol) or is_fractionable:
+        if is_fractionable:
             final_quantity = max(0.000001, round(base_qty, 6))
             print(f"🔢 Fractionable quantity calculated: {final_quantity} {final_symbol}")
         else:
@@ -175,10 +179,8 @@ class OrderExecutor:
                     "side": signal.action,
                     "status": str(getattr(order, "status", "")),
                 }
-                asyncio.create_task(
-                    ws_manager.broadcast(
-                        json.dumps({"event": "order_update", "payload": order_data})
-                    )
+                ws_manager.broadcast_nowait(
+                    orjson.dumps({"event": "order_update", "payload": order_data})
                 )
 
                 return order
@@ -211,7 +213,7 @@ class OrderExecutor:
         buying_power = float(account.buying_power)
         print(f"💵 Available buying power: ${buying_power:,.2f}")
 
-        is_fractionable = self.broker.is_asset_fractionable(correct_symbol)
+        is_fractionable = self.is_fractionable(correct_symbol)
         print(f"🔍 Asset {correct_symbol} is fractionable: {is_fractionable}")
 
         if isinstance(signal.quantity, float) and signal.quantity != int(signal.quantity) and not is_fractionable:
@@ -271,13 +273,11 @@ class OrderExecutor:
         db.add(new_trade)
         db.commit()
         logger.info(f"💾 Trade created: {new_trade}")
-        asyncio.create_task(
-            ws_manager.broadcast(
-                json.dumps({
-                    "event": "trade_update",
-                    "payload": {"symbol": signal.symbol, "action": "buy"}
-                })
-            )
+        ws_manager.broadcast_nowait(
+            orjson.dumps({
+                "event": "trade_update",
+                "payload": {"symbol": signal.symbol, "action": "buy"}
+            })
         )
         print("📊 Updating strategy position...")
         strategy_manager.add_position(
@@ -361,13 +361,11 @@ class OrderExecutor:
             quantity=quantity_to_sell
         )
 
-        asyncio.create_task(
-            ws_manager.broadcast(
-                json.dumps({
-                    "event": "trade_update",
-                    "payload": {"symbol": signal.symbol, "action": "sell"}
-                })
-            )
+        ws_manager.broadcast_nowait(
+            orjson.dumps({
+                "event": "trade_update",
+                "payload": {"symbol": signal.symbol, "action": "sell"}
+            })
         )
 
         print(f"✅ Sell order completed: {signal.strategy_id} sold {actual_sold} {signal.symbol}")
@@ -2,19 +2,9 @@ from sqlalchemy.orm import Session
 from fastapi import HTTPException
 from app.models.portfolio import Portfolio
 from app.models.user import User
-from app.config import settings
+from app.config import settings, encrypt_credential
 from app.integrations.alpaca.client import alpaca_client
 from app.integrations import refresh_broker_client
-import base64
-import hashlib
-from cryptography.fernet import Fernet
-
-
-def _get_fernet():
-    key = base64.urlsafe_b64encode(
-        hashlib.sha256(settings.secret_key.encode()).digest()
-    )
-    return Fernet(key)
 
 
 def create_portfolio(
@@ -26,13 +16,12 @@ def create_portfolio(
     base_url: str,
     is_paper: bool | None = None,
 ) -> Portfolio:
-    f = _get_fernet()
     if is_paper is None:
         is_paper = "paper" in base_url.lower()
     portfolio = Portfolio(
         name=name,
-        api_key_encrypted=f.encrypt(api_key.encode()).decode(),
-        secret_key_encrypted=f.encrypt(secret_key.encode()).decode(),
+        api_key_encrypted=encrypt_credential(api_key, settings.secret_key),
+        secret_key_encrypted=encrypt_credential(secret_key, settings.secret_key),
         base_url=base_url,
         broker="alpaca",
         is_paper=is_paper,
@@ -106,14 +95,13 @@ def update_portfolio(db: Session, user: User, portfolio_id: int, **updates) -> P
     )
     if not portfolio:
         raise HTTPException(status_code=404, detail="Portfolio not found")
-    f = _get_fernet()
     for field, value in updates.items():
         if value is None:
             continue
         if field == "api_key":
-            portfolio.api_key_encrypted = f.encrypt(value.encode()).decode()
+            portfolio.api_key_encrypted = encrypt_credential(value, settings.secret_key)
         elif field == "secret_key":
-            portfolio.secret_key_encrypted = f.encrypt(value.encode()).decode()
+            portfolio.secret_key_encrypted = encrypt_credential(value, settings.secret_key)
         elif field == "broker":
             continue
         elif hasattr(portfolio, field):
@@ -4,6 +4,16 @@ from typing import Dict, Any
 from app.core.types import NormalizedSignal, SignalAction
 from app.schemas.webhook import TradingViewWebhook
 
+# Acción de TradingView -> SignalAction (se construye una vez, no por webhook)
+_ACTION_MAPPING = {
+    "buy": SignalAction.BUY,
+    "sell": SignalAction.SELL,
+    "long_entry": SignalAction.LONG_ENTRY,
+    "long_exit": SignalAction.LONG_EXIT,
+    "short_entry": SignalAction.SHORT_ENTRY,
+    "short_exit": SignalAction.SHORT_EXIT,
+}
+
 class SignalNormalizer:
     """Normaliza señales de diferentes fuentes a formato común"""
     
@@ -12,16 +22,7 @@ class SignalNormalizer:
         """Normaliza webhook de TradingView"""
         
         # Mapear acciones
-        action_mapping = {
-            "buy": SignalAction.BUY,
-            "sell": SignalAction.SELL,
-            "long_entry": SignalAction.LONG_ENTRY,
-            "long_exit": SignalAction.LONG_EXIT,
-            "short_entry": SignalAction.SHORT_ENTRY,
-            "short_exit": SignalAction.SHORT_EXIT,
-        }
-        
-        action = action_mapping.get(
+        action = _ACTION_MAPPING.get(
             webhook_data.action.lower(), 
             SignalAction.BUY
         )
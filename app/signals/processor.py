@@ -94,9 +94,10 @@ class WebhookProcessor:
                 portfolio_id=active_portfolio.id,
             )
 
+            # flush (no commit): signal.id is assigned by the INSERT itself and
+            # the single commit happens once bracket creation finishes
             self.db.add(signal)
-            self.db.commit()
-            self.db.refresh(signal)
+            self.db.flush()
 
             # 4. NUEVA FUNCIONALIDAD: Crear bracket orders automáticamente
             bracket_result = await self._create_automatic_bracket_orders(
@@ -206,7 +207,8 @@ class WebhookProcessor:
             # 3. Validar que el símbolo es tradeable en horarios de mercado
             from app.execution.order_executor import OrderExecutor
 
-            executor = OrderExecutor()
+            # Reutiliza la sesión del procesador (sin abrir otra SessionLocal)
+            executor = OrderExecutor(self.db)
 
             try:
                 market_status = await executor.get_market_hours(signal.symbol)
@@ -235,7 +237,7 @@ class WebhookProcessor:
 
             try:
                 bracket_result = order_manager.create_bracket_order_from_signal(
-                    signal, user_id, portfolio_id, commit=False
+                    signal, user_id, portfolio_id, commit=False, exit_rules=rules
                 )
 
                 if bracket_result["status"] == "success":
@@ -63,35 +63,40 @@ class SignalRouter:
         try:
             db_signal = self._save_signal_to_db(signal, user, active_portfolio)
             db_signal.status = "validated"  # Pasó validación Y risk management
+            # id asignado por el flush: leerlo tras el commit recargaría la fila
+            signal_id = db_signal.id
             self.db.commit()
 
-            logger.info(f"Signal approved by risk manager: {db_signal.id}")
+            logger.info(f"Signal approved by risk manager: {signal_id}")
 
             # 5. NUEVO: Crear orden automáticamente
             try:
                 from app.execution.order_manager import OrderManager
 
                 order_manager = OrderManager(self.db)
+                # La orden y el estado "processing" se confirman juntos
                 order = order_manager.create_order_from_signal(
                     signal=db_signal,
                     user_id=user.id,
-                    portfolio_id=active_portfolio.id
+                    portfolio_id=active_portfolio.id,
+                    commit=False,
                 )
+                order_id, client_order_id = order.id, order.client_order_id
 
                 # Actualizar señal para indicar que tiene orden asociada
                 db_signal.status = "processing"
                 self.db.commit()
 
                 logger.info(
-                    f"Order {order.client_order_id} created for signal {db_signal.id}"
+                    f"Order {client_order_id} created for signal {signal_id}"
                 )
 
                 return {
                     "status": "accepted",
                     "reason": "signal_approved_and_order_created",
-                    "signal_id": db_signal.id,
-                    "order_id": order.id,
-                    "client_order_id": order.client_order_id,
+                    "signal_id": signal_id,
+                    "order_id": order_id,
+                    "client_order_id": client_order_id,
                     "warnings": validation.get("warnings", []),
                     "risk_info": {
                         "suggested_quantity": risk_result["suggested_quantity"],
@@ -101,8 +106,9 @@ class SignalRouter:
 
             except Exception as e:
                 logger.error(
-                    f"Error creating order from signal {db_signal.id}: {e}"
+                    f"Error creating order from signal {signal_id}: {e}"
                 )
+                self.db.rollback()
                 db_signal.status = "error"
                 db_signal.error_message = f"Order creation failed: {str(e)}"
                 self.db.commit()
@@ -111,7 +117,7 @@ class SignalRouter:
                     "status": "error",
                     "reason": "order_creation_failed",
                     "error": str(e),
-                    "signal_id": db_signal.id
+                    "signal_id": signal_id
                 }
 
         except Exception as e:
@@ -124,7 +130,7 @@ class SignalRouter:
             }
 
     def _save_signal_to_db(self, signal: NormalizedSignal, user: User, portfolio: Portfolio) -> Signal:
-        """Guardar señal normalizada en la base de datos"""
+        """Guardar señal normalizada en la base de datos (flush; el commit lo hace el llamador)"""
 
         # Crear registro en la base de datos
         db_signal = Signal(
@@ -142,7 +148,6 @@ class SignalRouter:
         )
 
         self.db.add(db_signal)
-        self.db.commit()
-        self.db.refresh(db_signal)
+        self.db.flush()
 
         return db_signal
@@ -1,8 +1,11 @@
 from typing import Dict, List, Optional
 from app.core.types import NormalizedSignal
-from app.models.strategy import Strategy
+from sqlalchemy import text
 from sqlalchemy.orm import Session
 
+# Compiled once; SQLAlchemy reuses the cached compilation for every signal
+_STRATEGY_EXISTS_SQL = text("SELECT 1 FROM strategies WHERE id = :sid")
+
 class SignalValidationError(Exception):
     """Excepción para errores de validación de señales"""
     pass
@@ -59,9 +62,7 @@ class SignalValidator:
     def _strategy_exists(self, strategy_id: str) -> bool:
         """Verificar que la estrategia existe en la base de datos"""
         try:
-            strategy = self.db.query(Strategy).filter(
-                Strategy.id == strategy_id
-            ).first()
-            return strategy is not None
+            row = self.db.execute(_STRATEGY_EXISTS_SQL, {"sid": strategy_id}).first()
+            return row is not None
         except:
             return False
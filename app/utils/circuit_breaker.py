@@ -0,0 +1,112 @@
+import logging
+import threading
+import time
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreakerError(Exception):
+    """Raised when a call is rejected because the breaker is open."""
+
+
+class CircuitBreaker:
+    """Thread-safe circuit breaker based on consecutive failures.
+
+    After ``fail_max`` consecutive failures the breaker opens and rejects calls
+    with :class:`CircuitBreakerError` for ``reset_timeout`` seconds. It then lets
+    a single trial call through (half-open): success closes it, failure opens
+    it again.
+
+    ``is_failure`` decides which exceptions count as failures. The others are
+    re-raised but treated as a successful call: the remote side answered.
+    """
+
+    def __init__(
+        self,
+        fail_max: int = 5,
+        reset_timeout: float = 30.0,
+        name: str = "breaker",
+        is_failure: Callable[[Exception], bool] = lambda exc: True,
+    ):
+        self.fail_max = fail_max
+        self.reset_timeout = reset_timeout
+        self.name = name
+        self.is_failure = is_failure
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def remaining(self) -> float:
+        """Seconds until the open breaker allows a trial call (0 if not open)."""
+        with self._lock:
+            if self._current_state() != OPEN:
+                return 0.0
+            return max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+
+    def call(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Invoke ``func`` through the breaker."""
+        with self._lock:
+            state = self._current_state()
+            if state == OPEN or (state == HALF_OPEN and self._trial_in_flight):
+                raise CircuitBreakerError(f"Circuit '{self.name}' is open")
+            if state == HALF_OPEN:
+                self._trial_in_flight = True
+
+        try:
+            result = func(*args, **kwargs)
+        except Exception as exc:
+            if self.is_failure(exc):
+                self._on_failure()
+            else:
+                self._on_success()
+            raise
+        except BaseException:
+            # KeyboardInterrupt, SystemExit, CancelledError: not a verdict on
+            # the remote side, but the half-open trial slot must be freed
+            with self._lock:
+                self._trial_in_flight = False
+            raise
+        self._on_success()
+        return result
+
+    def reset(self) -> None:
+        with self._lock:
+            self._set_state(CLOSED)
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._set_state(HALF_OPEN)
+        return self._state
+
+    def _set_state(self, state: str) -> None:
+        if state != self._state:
+            logger.warning("Circuit breaker %s: %s -> %s", self.name, self._state, state)
+            self._state = state
+
+    def _on_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._trial_in_flight = False
+            self._set_state(CLOSED)
+
+    def _on_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == HALF_OPEN or self._failures >= self.fail_max:
+                self._opened_at = time.monotonic()
+                self._set_state(OPEN)
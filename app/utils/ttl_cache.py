@@ -0,0 +1,48 @@
+import threading
+import time
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """Small in-process cache whose entries expire ``ttl`` seconds after being set."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: Dict[Hashable, Tuple[float, Any]] = {}
+        # Guards the purge in set(); single dict reads/writes are already atomic
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value, or None if missing or expired."""
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self._data.pop(key, None)
+            return None
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if len(self._data) >= self.maxsize:
+                # Purge expired entries first; if still full, start over
+                for stale in [k for k, (exp, _) in self._data.items() if exp < now]:
+                    self._data.pop(stale, None)
+                if len(self._data) >= self.maxsize:
+                    self._data.clear()
+            self._data[key] = (now + self.ttl, value)
+
+    def pop(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key) is not None
+
+    def __len__(self) -> int:
+        return len(self._data)
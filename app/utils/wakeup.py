@@ -0,0 +1,36 @@
+import asyncio
+from typing import Optional
+
+
+class Wakeup:
+    """Wake an asyncio task from any thread.
+
+    The waiting task calls :meth:`bind` once from its event loop; afterwards
+    :meth:`notify` may be called from worker threads (e.g. sync endpoints) and
+    :meth:`wait` returns early instead of sleeping the full timeout.
+    """
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._event: Optional[asyncio.Event] = None
+
+    def bind(self) -> None:
+        """Attach to the running event loop."""
+        self._loop = asyncio.get_running_loop()
+        self._event = asyncio.Event()
+
+    def notify(self) -> None:
+        """Thread-safe; a no-op until a loop is bound."""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(self._event.set)
+
+    async def wait(self, timeout: float) -> bool:
+        """Sleep up to ``timeout`` seconds; True if woken by :meth:`notify`."""
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        self._event.clear()
+        return True
@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional, Union
 from fastapi import WebSocket
 import asyncio
 
@@ -6,9 +6,11 @@ class ConnectionManager:
     def __init__(self):
         self.active_connections: List[WebSocket] = []
         self.lock = asyncio.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
+        self._loop = asyncio.get_running_loop()
         async with self.lock:
             self.active_connections.append(websocket)
 
@@ -17,7 +19,10 @@ class ConnectionManager:
             if websocket in self.active_connections:
                 self.active_connections.remove(websocket)
 
-    async def broadcast(self, message: str):
+    async def broadcast(self, message: Union[str, bytes]):
+        if isinstance(message, bytes):
+            # orjson payloads: decode once so every client gets a text frame
+            message = message.decode()
         async with self.lock:
             connections = list(self.active_connections)
         for connection in connections:
@@ -26,4 +31,19 @@ class ConnectionManager:
             except Exception:
                 await self.disconnect(connection)
 
+    def broadcast_nowait(self, message: Union[str, bytes]) -> None:
+        """Schedule a broadcast without awaiting it.
+
+        Safe to call from synchronous code running either on the event loop
+        or in a worker thread (e.g. via ``asyncio.to_thread``).
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is not None:
+            loop.create_task(self.broadcast(message))
+        elif self._loop is not None and not self._loop.is_closed():
+            asyncio.run_coroutine_threadsafe(self.broadcast(message), self._loop)
+
 ws_manager = ConnectionManager()
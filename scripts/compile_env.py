@@ -0,0 +1,30 @@
+"""Compile a .env file into app/_env_compiled.py.
+
+The generated module holds a plain ``ENV`` dict that ``app.config`` imports
+at startup, so the values are loaded from bytecode instead of re-parsing the
+dotenv file. Variables already set in the shell always take precedence.
+"""
+from pathlib import Path
+import argparse
+
+from dotenv import dotenv_values
+
+ROOT = Path(__file__).resolve().parent.parent
+OUTPUT = ROOT / "app" / "_env_compiled.py"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile a .env file into a Python module")
+    parser.add_argument("env_file", nargs="?", default=str(ROOT / ".env"))
+    args = parser.parse_args()
+
+    values = {k: v for k, v in dotenv_values(args.env_file).items() if v is not None}
+    lines = ["# Generated by scripts/compile_env.py - do not edit or commit", "ENV = {"]
+    lines += [f"    {key!r}: {value!r}," for key, value in sorted(values.items())]
+    lines.append("}")
+    OUTPUT.write_text("\n".join(lines) + "\n")
+    print(f"Wrote {len(values)} variables to {OUTPUT}")
+
+
+if __name__ == "__main__":
+    main()
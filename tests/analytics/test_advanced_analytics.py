@@ -1,27 +1,12 @@
 import pytest
 from datetime import datetime, timedelta
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
 from app.analytics.portfolio_analytics import PortfolioAnalytics
 from app.models.trades import Trade
-from app.database import Base
 from app.models.user import User
 from app.core.types import TradeStatus
 from app.models.portfolio import Portfolio
 
 
-@pytest.fixture
-def db_session():
-    engine = create_engine("sqlite:///:memory:")
-    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    Base.metadata.create_all(bind=engine)
-    db = TestingSessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 @pytest.fixture
 def test_user(db_session):
     user = User(email="test@example.com", username="testuser", password_hash="test", is_verified=True)
@@ -1,8 +1,4 @@
 import pytest
-from sqlalchemy import create_engine, event
-from sqlalchemy.orm import sessionmaker
-
-from app.database import Base
 from app.models.user import User
 from app.models.portfolio import Portfolio
 from app.models.trades import Trade
@@ -11,18 +7,6 @@ from app.analytics.portfolio_analytics import PortfolioAnalytics
 from tests.conftest import create_test_trade  # noqa: F401
 
 
-@pytest.fixture
-def db_session():
-    engine = create_engine("sqlite:///:memory:")
-    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    Base.metadata.create_all(bind=engine)
-    db = TestingSessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 @pytest.fixture
 def test_user(db_session):
     user = User(email="test@example.com", username="testuser", password_hash="test", is_verified=True)
@@ -80,7 +64,7 @@ def test_get_performance_metrics_counts(db_session, test_user, test_portfolio):
     assert metrics["win_rate"] == pytest.approx(33.33, rel=1e-2)
 
 
-def test_strategy_performance_single_query(db_session, test_user, test_portfolio):
+def test_strategy_performance_single_query(db_session, test_user, test_portfolio, count_statements):
     strat_a = Strategy(
         name="s1",
         entry_rules={},
@@ -115,14 +99,8 @@ def test_strategy_performance_single_query(db_session, test_user, test_portfolio
         Trade.portfolio_id == test_portfolio.id,
     )
 
-    executed = []
-
-    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
-        if statement.lower().startswith("select"):
-            executed.append(statement)
-
-    event.listen(db_session.bind, "before_cursor_execute", before_cursor_execute)
-    analytics._get_strategy_performance(base_query)
-    event.remove(db_session.bind, "before_cursor_execute", before_cursor_execute)
+    with count_statements(db_session) as statements:
+        analytics._get_strategy_performance(base_query)
 
+    executed = [s for s in statements if s.lower().startswith("select")]
     assert len(executed) == 1
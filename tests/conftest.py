@@ -2,8 +2,13 @@ import sys
 import os
 import types
 import importlib.util
+from contextlib import contextmanager
 from pathlib import Path
 
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
 # Ensure project root is in sys.path for tests
 ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
@@ -16,13 +21,22 @@ os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
 execution_pkg = types.ModuleType("app.execution")
 execution_pkg.__path__ = []
 sys.modules.setdefault("app.execution", execution_pkg)
+import app  # noqa: E402
+
+app.execution = sys.modules["app.execution"]
 
 
 def _load_module(fullname: str, path: str) -> None:
+    # conftest may be imported again as tests.conftest: keep the first copy
+    if fullname in sys.modules:
+        return
     spec = importlib.util.spec_from_file_location(fullname, path)
     module = importlib.util.module_from_spec(spec)
     spec.loader.exec_module(module)  # type: ignore[union-attr]
     sys.modules[fullname] = module
+    # Expose as attribute of the parent so dotted monkeypatch targets resolve
+    parent, _, name = fullname.rpartition(".")
+    setattr(sys.modules[parent], name, module)
 
 
 _load_module("app.execution.order_executor", str(ROOT / "app/execution/order_executor.py"))
@@ -30,7 +44,15 @@ _load_module(
     "app.execution.bracket_order_processor", str(ROOT / "app/execution/bracket_order_processor.py")
 )
 _load_module("app.execution.order_manager", str(ROOT / "app/execution/order_manager.py"))
+_load_module("app.execution.broker_executor", str(ROOT / "app/execution/broker_executor.py"))
+_load_module("app.execution.order_processor", str(ROOT / "app/execution/order_processor.py"))
+_load_module(
+    "app.execution.trailing_stop_monitor", str(ROOT / "app/execution/trailing_stop_monitor.py")
+)
+_load_module("app.execution.scheduler", str(ROOT / "app/execution/scheduler.py"))
+_load_module("app.execution.testing", str(ROOT / "app/execution/testing.py"))
 from datetime import datetime
+from app.database import Base
 from app.models.trades import Trade
 
 
@@ -52,3 +74,38 @@ def create_test_trade(db_session, user_id, portfolio_id, **kwargs):
     db_session.commit()
     db_session.refresh(trade)
     return trade
+
+
+@pytest.fixture
+def db_session():
+    """Session on a fresh in-memory SQLite database with all tables created."""
+    engine = create_engine("sqlite:///:memory:")
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@contextmanager
+def _count_statements(db):
+    """Collect the SQL strings sent through ``db``'s engine inside the block."""
+    statements = []
+    engine = db.get_bind()
+
+    def listener(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+
+
+@pytest.fixture
+def count_statements():
+    """``with count_statements(db) as statements:`` records the SQL emitted in the block."""
+    return _count_statements
@@ -5,6 +5,7 @@ from decimal import Decimal
 
 os.environ.setdefault('SECRET_KEY', 'secret')
 
+import app.integrations.alpaca.client as client_module
 from app.integrations.alpaca.client import AlpacaClient
 
 
@@ -158,3 +159,128 @@ def test_submit_order_decimal_precision(monkeypatch):
     assert client._trading.order.qty == str(qty)
     assert client._trading.order.limit_price == str(price)
 
+
+
+def test_asset_lookups_are_cached_until_refresh(monkeypatch):
+    client = AlpacaClient()
+    calls = []
+
+    class DummyTrading:
+        def get_asset(self, symbol):
+            calls.append(symbol)
+            return type("A", (), {"asset_class": "us_equity", "fractionable": False})()
+
+    monkeypatch.setattr(client, "_trading", DummyTrading())
+    for _ in range(3):
+        assert client.is_crypto_symbol("aapl") is False
+        assert client.is_asset_fractionable("AAPL") is False
+        assert client.get_asset("AAPL").fractionable is False
+    # Una sola consulta de asset alimenta las tres lecturas
+    assert calls == ["AAPL"]
+
+    client.refresh()
+    assert client._asset_cache == {}
+
+
+def test_get_latest_trades_batches_by_asset_class(monkeypatch):
+    client = AlpacaClient()
+    requests = []
+
+    class DummyStockData:
+        def get_stock_latest_trade(self, req):
+            requests.append(("stock", req.symbol_or_symbols))
+            return {s: type("T", (), {"price": 10.0})() for s in req.symbol_or_symbols}
+
+    class DummyCryptoData:
+        def get_crypto_latest_trade(self, req):
+            requests.append(("crypto", req.symbol_or_symbols))
+            return {s: type("T", (), {"price": 20.0})() for s in req.symbol_or_symbols}
+
+    monkeypatch.setattr(client, "_stock_data", DummyStockData())
+    monkeypatch.setattr(client, "_crypto_data", DummyCryptoData())
+    monkeypatch.setattr(client, "is_crypto_symbol", lambda s: "/" in s)
+
+    trades = client.get_latest_trades(["AAPL", "BTC/USD", "MSFT", "AAPL"])
+
+    assert sorted(requests) == [("crypto", ["BTC/USD"]), ("stock", ["AAPL", "MSFT"])]
+    assert {s: t.price for s, t in trades.items()} == {
+        "AAPL": Decimal("10.0"),
+        "MSFT": Decimal("10.0"),
+        "BTC/USD": Decimal("20.0"),
+    }
+
+
+def test_asset_lists_are_cached_per_class_with_ttl(monkeypatch):
+    client = AlpacaClient()
+    calls = []
+
+    class DummyTrading:
+        def get_all_assets(self, status, asset_class):
+            calls.append(asset_class)
+            return [type("A", (), {"symbol": f"{asset_class}-1"})()]
+
+    monkeypatch.setattr(client, "_trading", DummyTrading())
+    now = [1000.0]
+    monkeypatch.setattr(client_module, "monotonic", lambda: now[0])
+
+    assert client.check_crypto_status() is True
+    assert client.get_crypto_assets() == ["crypto-1"]
+    assert [a.symbol for a in client.list_assets()] == ["us_equity-1"]
+    assert client.get_crypto_assets() == ["crypto-1"]
+    assert calls == ["crypto", "us_equity"]
+
+    now[0] += client_module.ASSET_LIST_TTL
+    client.get_crypto_assets()
+    assert calls == ["crypto", "us_equity", "crypto"]
+
+    client.refresh()
+    assert client._asset_lists == {}
+
+
+def test_refresh_rebuilds_clients_only_when_credentials_change(monkeypatch):
+    built = []
+    monkeypatch.setattr(client_module, "TradingClient", lambda *a, **kw: built.append(a) or object())
+    monkeypatch.setattr(client_module, "StockHistoricalDataClient", lambda *a: object())
+    monkeypatch.setattr(client_module, "CryptoHistoricalDataClient", lambda *a: object())
+    monkeypatch.setattr(client_module.settings, "alpaca_api_key", "key1", raising=False)
+    monkeypatch.setattr(client_module.settings, "alpaca_secret_key", "secret", raising=False)
+
+    client = AlpacaClient()
+    trading = client._trading
+    client.refresh()
+    assert client._trading is trading
+    assert len(built) == 1
+
+    monkeypatch.setattr(client_module.settings, "alpaca_api_key", "key2", raising=False)
+    client.refresh()
+    assert client._trading is not trading
+    assert [a[0] for a in built] == ["key1", "key2"]
+
+
+def test_get_latest_trades_isolates_a_failing_group(monkeypatch):
+    client = AlpacaClient()
+    requests = []
+
+    class DummyStockData:
+        def get_stock_latest_trade(self, req):
+            requests.append(req.symbol_or_symbols)
+            if req.symbol_or_symbols in (["AAPL", "HALTED"], "HALTED"):
+                raise Exception("invalid symbol")
+            return {s: type("T", (), {"price": 10.0})() for s in [req.symbol_or_symbols]}
+
+    class DummyCryptoData:
+        def get_crypto_latest_trade(self, req):
+            return {s: type("T", (), {"price": 20.0})() for s in req.symbol_or_symbols}
+
+    monkeypatch.setattr(client, "_stock_data", DummyStockData())
+    monkeypatch.setattr(client, "_crypto_data", DummyCryptoData())
+    monkeypatch.setattr(client, "is_crypto_symbol", lambda s: "/" in s)
+
+    trades = client.get_latest_trades(["AAPL", "HALTED", "BTC/USD"])
+
+    # El lote de stocks falla: se repite por símbolo y solo se pierde HALTED
+    assert sorted(map(str, requests)) == ["AAPL", "HALTED", "['AAPL', 'HALTED']"]
+    assert {s: t.price for s, t in trades.items()} == {
+        "AAPL": Decimal("10.0"),
+        "BTC/USD": Decimal("20.0"),
+    }
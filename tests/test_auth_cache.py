@@ -0,0 +1,94 @@
+import asyncio
+import os
+from datetime import timedelta
+
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+from app.core import auth
+from app.database import Base
+from app.models.user import User
+from app.services.auth_service import auth_service
+
+
+def _session():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)()
+
+
+def test_get_current_user_caches_token_and_user(monkeypatch):
+    db = _session()
+    user = User(email="a@example.com", username="a", password_hash="x", is_active=True)
+    db.add(user)
+    db.commit()
+
+    auth._TOKEN_CACHE.clear()
+    auth._USER_ID_CACHE.clear()
+    calls = {"verify": 0, "lookup": 0}
+    verify = auth_service.verify_token
+    lookup = auth_service.get_user_by_email
+
+    def counting_verify(token):
+        calls["verify"] += 1
+        return verify(token)
+
+    def counting_lookup(db, email):
+        calls["lookup"] += 1
+        return lookup(db, email)
+
+    monkeypatch.setattr(auth_service, "verify_token", counting_verify)
+    monkeypatch.setattr(auth_service, "get_user_by_email", counting_lookup)
+
+    token = auth_service.create_access_token({"sub": user.email})
+    creds = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+    for _ in range(3):
+        current = asyncio.run(auth.get_current_user(creds, db))
+        assert current.id == user.id
+
+    assert calls == {"verify": 1, "lookup": 1}
+    assert token.encode() not in auth._TOKEN_CACHE
+
+
+def test_verify_token_rejects_expired_and_tampered_tokens():
+    token = auth_service.create_access_token({"sub": "b@example.com"})
+    assert auth_service.verify_token(token).email == "b@example.com"
+
+    expired = auth_service.create_access_token(
+        {"sub": "b@example.com"}, expires_delta=timedelta(minutes=-5)
+    )
+    assert auth_service.verify_token(expired) is None
+    assert auth_service.verify_token(token[:-4] + "AAAA") is None
+    assert auth_service.verify_token("not-a-jwt") is None
+
+
+def test_get_current_user_without_credentials_is_unauthorized():
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(auth.get_current_user(None, _session()))
+    assert exc.value.status_code == 401
+    assert asyncio.run(auth.get_current_user_optional(None, _session())) is None
+
+    # Cada rechazo lanza su propia instancia (sin traceback compartido)
+    with pytest.raises(HTTPException) as again:
+        asyncio.run(auth.get_current_user(None, _session()))
+    assert again.value is not exc.value
+    assert again.value.headers == {"WWW-Authenticate": "Bearer"}
+
+
+def test_cached_token_stops_authenticating_once_expired(monkeypatch):
+    auth._TOKEN_CACHE.clear()
+    token = auth_service.create_access_token(
+        {"sub": "c@example.com"}, expires_delta=timedelta(seconds=30)
+    )
+    token_data = auth._verify_token_cached(token)
+    assert token_data.email == "c@example.com"
+
+    # El TTL de la caché (60s) es mayor que lo que le queda al token
+    monkeypatch.setattr(auth.time, "time", lambda: token_data.exp + 1)
+    assert auth._verify_token_cached(token) is None
@@ -0,0 +1,95 @@
+import pytest
+from decimal import Decimal
+
+from app.models.user import User
+from app.models.signal import Signal
+from app.models.order import Order
+from app.core.types import OrderStatus
+from app.execution.bracket_order_processor import BracketOrderProcessor
+from app.execution.order_executor import OrderExecutor
+
+
+def _bracket(db):
+    user = User(id=1, email="test@example.com", username="user", password_hash="pwd")
+    signal = Signal(id=1, symbol="AAPL", action="buy", strategy_id="strat", user_id=1)
+    db.add_all([user, signal])
+    db.commit()
+
+    parent = Order(
+        client_order_id="PARENT",
+        symbol="AAPL",
+        side="buy",
+        quantity=Decimal("10"),
+        status=OrderStatus.FILLED,
+        is_bracket_parent=True,
+        signal_id=1,
+        user_id=1,
+    )
+    db.add(parent)
+    db.commit()
+
+    children = [
+        Order(
+            client_order_id=f"CHILD-{i}",
+            broker_order_id=f"BRK-{i}",
+            symbol="AAPL",
+            side="sell",
+            quantity=Decimal("10"),
+            order_type=order_type,
+            status=OrderStatus.SENT,
+            parent_order_id=parent.id,
+            signal_id=1,
+            user_id=1,
+        )
+        for i, order_type in enumerate(("limit", "stop"))
+    ]
+    db.add_all(children)
+    db.commit()
+    return parent, children
+
+
+@pytest.mark.asyncio
+async def test_child_fill_cancels_live_siblings(db_session):
+    parent, (take_profit, stop_loss) = _bracket(db_session)
+    take_profit.status = OrderStatus.FILLED
+    db_session.commit()
+
+    processor = BracketOrderProcessor(db_session)
+    result = await processor.handle_child_order_fill(take_profit.id)
+
+    assert result.status == "success"
+    assert result.cancelled_orders == [stop_loss.id]
+
+    db_session.expire_all()
+    assert db_session.get(Order, stop_loss.id).status == OrderStatus.CANCELED
+    assert db_session.get(Order, take_profit.id).status == OrderStatus.FILLED
+    assert db_session.get(Order, parent.id).notes == "Bracket completed - limit executed"
+
+
+def test_active_brackets_load_children_without_per_parent_queries(db_session, count_statements):
+
+    parent, children = _bracket(db_session)
+    db_session.expire_all()
+
+    with count_statements(db_session) as statements:
+        brackets = OrderExecutor(db_session).get_active_bracket_orders()
+
+    assert [b["parent_order"]["id"] for b in brackets] == [parent.id]
+    assert {c["id"] for c in brackets[0]["child_orders"]} == {c.id for c in children}
+    assert len(statements) == 2
+
+
+def test_active_bracket_columns_single_statement(db_session, count_statements):
+
+    parent, children = _bracket(db_session)
+    rows = OrderExecutor(db_session).get_active_bracket_orders()
+
+    with count_statements(db_session) as statements:
+        columns = OrderExecutor(db_session).get_active_bracket_columns()
+
+    assert len(statements) == 1
+    assert columns["parent_ids"] == [parent.id]
+    assert columns["symbols"] == ["AAPL"]
+    assert columns["child_ids"] == [[c.id for c in children]]
+    assert columns["child_statuses"] == [[OrderStatus.SENT, OrderStatus.SENT]]
+    assert columns["bracket_active"] == [rows[0]["bracket_active"]] == [True]
@@ -1,9 +1,5 @@
-import pytest
 from decimal import Decimal
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
 
-from app.database import Base
 from app.models.user import User
 from app.models.signal import Signal
 from app.models.order import Order
@@ -11,18 +7,6 @@ from app.execution.order_manager import OrderManager
 from app.services.exit_rules_service import ExitRulesService
 
 
-@pytest.fixture
-def db_session():
-    engine = create_engine("sqlite:///:memory:")
-    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    Base.metadata.create_all(bind=engine)
-    db = TestingSessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 def test_exit_order_failure_rolls_back_main_order(db_session, monkeypatch):
     # Create required user and signal
     user = User(id=1, email="test@example.com", username="user", password_hash="pwd")
@@ -36,7 +20,7 @@ def test_exit_order_failure_rolls_back_main_order(db_session, monkeypatch):
     # Mock current price and exit rule calculation
     monkeypatch.setattr(om, "_get_current_price", lambda symbol: 100.0)
 
-    def fake_calc(self, strategy_id, user_id, price, action):
+    def fake_calc(self, strategy_id, user_id, price, action, rules=None):
         return {
             "entry_price": Decimal("100"),
             "stop_loss_price": Decimal("95"),
@@ -46,17 +30,45 @@ def test_exit_order_failure_rolls_back_main_order(db_session, monkeypatch):
     monkeypatch.setattr(ExitRulesService, "calculate_exit_prices", fake_calc)
 
     # Force failure when creating the take profit order
-    original_add = db_session.add
+    original_add_all = db_session.add_all
 
-    def failing_add(obj):
-        if isinstance(obj, Order) and getattr(obj, "client_order_id", "").startswith("TP_"):
+    def failing_add_all(objs):
+        objs = list(objs)
+        if any(getattr(obj, "client_order_id", "").startswith("TP_") for obj in objs):
             raise Exception("failure creating exits")
-        return original_add(obj)
+        return original_add_all(objs)
 
-    monkeypatch.setattr(db_session, "add", failing_add)
+    monkeypatch.setattr(db_session, "add_all", failing_add_all)
 
     result = om.create_bracket_order_from_signal(signal, user_id=user.id, portfolio_id=None)
 
     assert result["status"] == "error"
+    assert "failure creating exits" in result["message"]
     # No orders should be persisted due to rollback
     assert db_session.query(Order).count() == 0
+
+
+def test_bracket_commit_does_not_reload_orders(db_session, monkeypatch, count_statements):
+    user = User(id=1, email="test@example.com", username="user", password_hash="pwd")
+    db_session.add(user)
+    signal = Signal(id=1, symbol="AAPL", action="buy", strategy_id="strat", user_id=user.id)
+    db_session.add(signal)
+    db_session.commit()
+
+    om = OrderManager(db_session)
+    monkeypatch.setattr(om, "_get_current_price", lambda symbol: 100.0)
+    monkeypatch.setattr(
+        ExitRulesService,
+        "calculate_exit_prices",
+        lambda self, *args, **kwargs: {
+            "stop_loss_price": Decimal("95"),
+            "take_profit_price": Decimal("105"),
+        },
+    )
+
+    with count_statements(db_session) as statements:
+        result = om.create_bracket_order_from_signal(signal, user_id=user.id, portfolio_id=None)
+
+    assert result["status"] == "success"
+    assert not any(s.startswith("SELECT orders") for s in statements)
+    assert db_session.query(Order).count() == 3
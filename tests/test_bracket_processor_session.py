@@ -1,9 +1,6 @@
 import pytest
 from decimal import Decimal
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
 
-from app.database import Base
 from app.models.user import User
 from app.models.signal import Signal
 from app.models.order import Order
@@ -11,18 +8,6 @@ from app.core.types import OrderStatus
 from app.execution.bracket_order_processor import BracketOrderProcessor
 
 
-@pytest.fixture
-def db_session():
-    engine = create_engine("sqlite:///:memory:")
-    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    Base.metadata.create_all(bind=engine)
-    db = TestingSessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 @pytest.mark.asyncio
 async def test_bracket_processor_uses_same_session(db_session):
     user = User(id=1, email="test@example.com", username="user", password_hash="pwd")
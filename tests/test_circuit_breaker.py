@@ -0,0 +1,106 @@
+from types import SimpleNamespace
+
+import pytest
+from alpaca.common.exceptions import APIError
+
+from app.execution.broker_executor import _is_broker_outage
+from app.utils import circuit_breaker as cb
+from app.utils.circuit_breaker import CircuitBreaker, CircuitBreakerError
+
+
+def _fail():
+    raise RuntimeError("broker down")
+
+
+def test_opens_after_consecutive_failures_and_fails_fast():
+    breaker = CircuitBreaker(fail_max=2, reset_timeout=30)
+    calls = []
+
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            breaker.call(_fail)
+    assert breaker.state == cb.OPEN
+
+    with pytest.raises(CircuitBreakerError):
+        breaker.call(calls.append, 1)
+    assert calls == []
+    assert 0 < breaker.remaining() <= 30
+
+
+def test_success_resets_failure_count():
+    breaker = CircuitBreaker(fail_max=2, reset_timeout=30)
+    with pytest.raises(RuntimeError):
+        breaker.call(_fail)
+    assert breaker.call(lambda: "ok") == "ok"
+    with pytest.raises(RuntimeError):
+        breaker.call(_fail)
+    assert breaker.state == cb.CLOSED
+
+
+def test_half_open_trial_closes_or_reopens(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cb.time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker(fail_max=1, reset_timeout=30)
+
+    with pytest.raises(RuntimeError):
+        breaker.call(_fail)
+    now[0] += 30
+    assert breaker.state == cb.HALF_OPEN
+
+    # Trial fails -> open again for a full reset_timeout
+    with pytest.raises(RuntimeError):
+        breaker.call(_fail)
+    assert breaker.state == cb.OPEN
+    assert breaker.remaining() == 30
+
+    now[0] += 30
+    assert breaker.call(lambda: "ok") == "ok"
+    assert breaker.state == cb.CLOSED
+
+
+def test_excluded_errors_do_not_open_the_breaker():
+    breaker = CircuitBreaker(
+        fail_max=1, reset_timeout=30, is_failure=lambda exc: not isinstance(exc, ValueError)
+    )
+
+    for _ in range(3):
+        with pytest.raises(ValueError):
+            breaker.call(int, "not a number")
+    assert breaker.state == cb.CLOSED
+
+    with pytest.raises(RuntimeError):
+        breaker.call(_fail)
+    assert breaker.state == cb.OPEN
+
+
+def test_broker_breaker_only_counts_outages():
+    def api_error(status_code):
+        http_error = SimpleNamespace(response=SimpleNamespace(status_code=status_code))
+        return APIError('{"code": 1, "message": "x"}', http_error)
+
+    assert _is_broker_outage(TimeoutError("submit_order timed out"))
+    assert _is_broker_outage(ConnectionError("reset"))
+    assert _is_broker_outage(api_error(503))
+    assert _is_broker_outage(api_error(429))
+    assert not _is_broker_outage(api_error(403))  # insufficient buying power
+    assert not _is_broker_outage(api_error(422))
+    assert not _is_broker_outage(ValueError("invalid symbol"))
+
+
+def test_interrupted_trial_frees_the_half_open_slot(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cb.time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker(fail_max=1, reset_timeout=30)
+
+    with pytest.raises(RuntimeError):
+        breaker.call(_fail)
+    now[0] += 30
+
+    def interrupted():
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        breaker.call(interrupted)
+    assert breaker.state == cb.HALF_OPEN
+    assert breaker.call(lambda: "ok") == "ok"
+    assert breaker.state == cb.CLOSED
@@ -0,0 +1,16 @@
+import os
+
+os.environ.setdefault("SECRET_KEY", "secret")
+
+from app.config import decrypt_credential, encrypt_credential, fernet_for
+
+
+def test_credential_round_trip_uses_aes_gcm():
+    token = encrypt_credential("PKTESTKEY", "secret")
+    assert token.startswith("gcm1:")
+    assert decrypt_credential(token, "secret") == "PKTESTKEY"
+
+
+def test_legacy_fernet_tokens_still_decrypt():
+    token = fernet_for("secret").encrypt(b"legacy").decode()
+    assert decrypt_credential(token, "secret") == "legacy"
@@ -0,0 +1,95 @@
+from app.core.types import OrderStatus
+from app.execution.testing import ExecutionTester
+from app.models.order import Order
+from app.models.signal import Signal
+from app.models.user import User
+
+
+def _user(db, user_id=1):
+    user = User(id=user_id, email=f"u{user_id}@example.com", username=f"u{user_id}", password_hash="pwd")
+    db.add(user)
+    return user
+
+
+def _signal(db, signal_id, strategy_id, user_id=1):
+    db.add(Signal(id=signal_id, symbol="AAPL", action="buy", strategy_id=strategy_id, user_id=user_id))
+
+
+def _order(db, order_id, signal_id, status=OrderStatus.NEW, user_id=1):
+    order = Order(
+        id=order_id,
+        client_order_id=f"CID-{order_id}",
+        symbol="AAPL",
+        side="buy",
+        quantity=2,
+        status=status,
+        signal_id=signal_id,
+        user_id=user_id,
+    )
+    db.add(order)
+    return order
+
+
+def test_simulate_bulk_persists_fills(db_session, count_statements):
+    _signal(db_session, 1, "test_strategy")
+    orders = [_order(db_session, i, 1) for i in range(1, 21)]
+    db_session.commit()
+
+    with count_statements(db_session) as statements:
+        result = ExecutionTester(db_session).simulate_bulk(orders)
+
+    assert result["success"] and result["simulated"]
+    assert result["filled"] + result["partially_filled"] == 20
+    # Un UPDATE por grupo de columnas (fills completos / parciales)
+    assert len({s for s in statements if s.startswith("UPDATE")}) <= 2
+
+    db_session.expire_all()
+    stored = db_session.query(Order).all()
+    filled = [o for o in stored if o.status == OrderStatus.FILLED]
+    partial = [o for o in stored if o.status == OrderStatus.PARTIALLY_FILLED]
+    assert (len(filled), len(partial)) == (result["filled"], result["partially_filled"])
+    assert all(o.filled_quantity == 2 and o.filled_at is not None for o in filled)
+    assert all(o.filled_quantity == 1 and o.filled_at is None for o in partial)
+    assert all(o.broker_order_id == f"SIMULATED_{o.client_order_id}" for o in stored)
+    assert all(145 <= o.avg_fill_price <= 155 and o.sent_at is not None for o in stored)
+
+
+def test_simulate_bulk_without_orders(db_session):
+    result = ExecutionTester(db_session).simulate_bulk([])
+    assert result == {"success": True, "simulated": True, "filled": 0, "partially_filled": 0}
+
+
+def test_test_statistics_count_by_status_and_list_last_five(db_session):
+    _signal(db_session, 1, "test_strategy")
+    _signal(db_session, 2, "live_strategy")
+    for i in range(1, 8):
+        _order(db_session, i, 1, OrderStatus.FILLED if i % 2 else OrderStatus.NEW)
+    _order(db_session, 8, 2, OrderStatus.FILLED)
+    db_session.commit()
+
+    stats = ExecutionTester(db_session).get_test_statistics()["test_statistics"]
+
+    assert stats["total_test_orders"] == 7
+    assert stats["status_breakdown"] == {OrderStatus.FILLED.value: 4, OrderStatus.NEW.value: 3}
+    assert stats["test_order_ids"] == [3, 4, 5, 6, 7]
+
+
+def test_cleanup_deletes_only_the_users_test_data(db_session):
+    user = _user(db_session, 1)
+    _user(db_session, 2)
+    _signal(db_session, 1, "test_strategy", user_id=1)
+    _signal(db_session, 2, "test_other", user_id=1)
+    _signal(db_session, 3, "live_strategy", user_id=1)
+    _signal(db_session, 4, "test_strategy", user_id=2)
+    _order(db_session, 1, 1)
+    _order(db_session, 2, 1)
+    _order(db_session, 3, 2)
+    _order(db_session, 4, 3)
+    _order(db_session, 5, 4, user_id=2)
+    db_session.commit()
+
+    result = ExecutionTester(db_session).cleanup_test_data(user)
+
+    assert result == {"success": True, "cleanup_summary": {"signals_deleted": 2, "orders_deleted": 3}}
+    assert sorted(s.id for s in db_session.query(Signal)) == [3, 4]
+    assert sorted(o.id for o in db_session.query(Order)) == [4, 5]
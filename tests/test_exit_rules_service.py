@@ -1,26 +1,9 @@
 import pytest
-import pytest
-import pytest
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from app.database import Base
 from app.services.exit_rules_service import ExitRulesService
 from app.models.strategy_exit_rules import StrategyExitRules
 from decimal import Decimal
 
 
-@pytest.fixture
-def db_session():
-    engine = create_engine("sqlite:///:memory:")
-    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    Base.metadata.create_all(bind=engine)
-    db = TestingSessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 def test_create_default_rules(db_session):
     service = ExitRulesService(db_session)
 
@@ -45,3 +28,28 @@ def test_calculate_exit_prices(db_session):
     assert result["stop_loss_price"] == Decimal("98.00")   # 100 * (1 - 0.02)
     assert result["take_profit_price"] == Decimal("104.00") # 100 * (1 + 0.04)
     assert result["strategy_id"] == "test_strategy"
+
+
+def test_get_many_loads_rules_in_one_query(db_session, count_statements):
+    service = ExitRulesService(db_session)
+    service.create_default_rules("s1", user_id=1)
+    service.create_default_rules("s2", user_id=1)
+    db_session.expire_all()
+
+    with count_statements(db_session) as statements:
+        rules = service.get_many(["s1", "s2", "missing"])
+        prices = service.calculate_exit_prices(
+            "s1", 1, Decimal("100"), "buy", rules=rules["s1"]
+        )
+
+    assert set(rules) == {"s1", "s2"}
+    assert len(statements) == 1
+    assert prices["stop_loss_price"] == Decimal("98.00")
+
+
+def test_preloaded_rules_still_check_owner(db_session):
+    service = ExitRulesService(db_session)
+    rules = service.create_default_rules("s1", user_id=1)
+
+    with pytest.raises(PermissionError):
+        service.calculate_exit_prices("s1", 2, Decimal("100"), rules=rules)
@@ -0,0 +1,62 @@
+from decimal import Decimal
+from types import SimpleNamespace
+
+from alpaca.trading.enums import OrderStatus as AlpacaOrderStatus
+from sqlalchemy import event
+
+from app.models.order import Order
+from app.core.types import OrderStatus
+from app.execution.order_processor import OrderProcessor
+
+
+class FakeBroker:
+    def __init__(self, orders):
+        self.orders = orders
+        self.bulk_calls = []
+
+    def get_orders_by_id(self, order_ids, after=None):
+        self.bulk_calls.append(list(order_ids))
+        return {i: self.orders[i] for i in order_ids if i in self.orders}
+
+    def get_order(self, order_id):  # pragma: no cover - must not be used
+        raise AssertionError("per-order status call")
+
+
+def test_fill_update_uses_one_bulk_broker_call(db_session):
+    for i in range(3):
+        db_session.add(
+            Order(
+                client_order_id=f"C{i}",
+                broker_order_id=f"B{i}",
+                symbol="AAPL",
+                side="buy",
+                quantity=Decimal("2"),
+                status=OrderStatus.ACCEPTED,
+                signal_id=1,
+                user_id=1,
+            )
+        )
+    db_session.commit()
+
+    broker = FakeBroker({
+        "B0": SimpleNamespace(status=AlpacaOrderStatus.FILLED, filled_qty="2", filled_avg_price="10"),
+        "B1": SimpleNamespace(status=AlpacaOrderStatus.PARTIALLY_FILLED, filled_qty="1", filled_avg_price="10"),
+    })
+    processor = OrderProcessor(db_session)
+    processor.broker_executor.broker = broker
+
+    commits = []
+    event.listen(db_session, "after_commit", commits.append)
+    result = processor.update_order_fills()
+
+    assert broker.bulk_calls == [["B0", "B1", "B2"]]
+    assert len(commits) == 1
+    assert result["checked"] == 3
+    assert result["updated"] == 2
+    assert result["filled"] == 1
+    statuses = {o.broker_order_id: o.status for o in db_session.query(Order)}
+    assert statuses == {
+        "B0": OrderStatus.FILLED,
+        "B1": OrderStatus.PARTIALLY_FILLED,
+        "B2": OrderStatus.ACCEPTED,
+    }
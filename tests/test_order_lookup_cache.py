@@ -0,0 +1,137 @@
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from app.models.order import Order
+from app.core.types import OrderStatus
+from app.execution import order_manager
+
+
+@pytest.fixture(autouse=True)
+def clear_order_id_caches():
+    order_manager._ORDER_PK_BY_BROKER_ID.clear()
+    order_manager._ORDER_PK_BY_CLIENT_ID.clear()
+
+
+def _order(db):
+    order = Order(
+        client_order_id="CID-1",
+        broker_order_id="BRK-1",
+        symbol="AAPL",
+        side="buy",
+        quantity=Decimal("1"),
+        status=OrderStatus.ACCEPTED,
+        signal_id=1,
+        user_id=1,
+    )
+    db.add(order)
+    db.commit()
+    return order
+
+
+def test_broker_id_lookup_hits_identity_map_after_first_query(db_session, count_statements):
+    order = _order(db_session)
+    om = order_manager.OrderManager(db_session)
+    assert om.get_order_by_broker_id("BRK-1").id == order.id
+
+    with count_statements(db_session) as statements:
+        assert om.get_order_by_broker_id("BRK-1") is order
+    assert statements == []
+
+
+def test_terminal_status_evicts_cached_ids(db_session):
+    order = _order(db_session)
+    om = order_manager.OrderManager(db_session)
+    om.get_order_by_broker_id("BRK-1")
+    om.get_order_by_client_id("CID-1")
+
+    om.update_order_status(order, OrderStatus.FILLED)
+
+    assert "BRK-1" not in order_manager._ORDER_PK_BY_BROKER_ID
+    assert "CID-1" not in order_manager._ORDER_PK_BY_CLIENT_ID
+    assert om.get_order_by_broker_id("BRK-1").id == order.id
+    assert "BRK-1" not in order_manager._ORDER_PK_BY_BROKER_ID
+
+
+def test_active_orders_filters_by_user_and_status(db_session):
+    order = _order(db_session)
+    om = order_manager.OrderManager(db_session)
+    assert om.get_active_orders(1) == [order]
+    assert om.get_active_orders(2) == []
+
+    order.status = OrderStatus.FILLED
+    db_session.commit()
+    assert om.get_active_orders(1) == []
+
+
+def test_bulk_broker_id_lookup_uses_one_query(db_session, count_statements):
+    order = _order(db_session)
+    other = Order(
+        client_order_id="CID-2",
+        broker_order_id="BRK-2",
+        symbol="MSFT",
+        side="buy",
+        quantity=Decimal("1"),
+        status=OrderStatus.ACCEPTED,
+        signal_id=1,
+        user_id=1,
+    )
+    db_session.add(other)
+    db_session.commit()
+    expected = {"BRK-1": order.id, "BRK-2": other.id}
+    db_session.expunge_all()
+    om = order_manager.OrderManager(db_session)
+
+    with count_statements(db_session) as statements:
+        found = om.get_orders_by_broker_ids(["BRK-1", "BRK-2", "missing"])
+
+    assert len(statements) == 1
+    assert {k: v.id for k, v in found.items()} == expected
+    assert om.get_orders_by_client_ids(["CID-2"])["CID-2"] is found["BRK-2"]
+
+
+def test_exit_orders_share_one_insert_statement(db_session, count_statements):
+    order = _order(db_session)
+    om = order_manager.OrderManager(db_session)
+
+    with count_statements(db_session) as statements:
+        sl, tp = om._create_exit_orders(
+            order,
+            {"stop_loss_price": Decimal("90"), "take_profit_price": Decimal("110")},
+            "strat",
+            commit=False,
+        )
+
+    # Mismo INSERT para ambos hijos: en Postgres el flush los envía juntos
+    # (SQLite no tiene sentinel de insertmanyvalues y los ejecuta por fila)
+    inserts = [s for s in statements if s.startswith("INSERT")]
+    assert len(inserts) == 2 and len(set(inserts)) == 1
+    assert sl.id and tp.id and sl.parent_order_id == tp.parent_order_id == order.id
+
+
+def test_status_timestamps_come_from_the_database_clock(db_session, count_statements):
+    order = _order(db_session)
+    om = order_manager.OrderManager(db_session)
+
+    with count_statements(db_session) as statements:
+        om.update_order_status(order, OrderStatus.FILLED)
+
+    update = next(s for s in statements if s.startswith("UPDATE"))
+    assert update.count("CURRENT_TIMESTAMP") == 2
+    assert isinstance(order.filled_at, datetime)
+    assert isinstance(order.updated_at, datetime)
+
+
+def test_bulk_lookup_with_warm_cache_on_fresh_session_uses_one_query(db_session, count_statements):
+    order = _order(db_session)
+    om = order_manager.OrderManager(db_session)
+    om.get_order_by_broker_id("BRK-1")
+    assert "BRK-1" in order_manager._ORDER_PK_BY_BROKER_ID
+    db_session.expunge_all()
+
+    with count_statements(db_session) as statements:
+        found = om.get_orders_by_broker_ids(["BRK-1", "missing"])
+
+    assert len(statements) == 1
+    assert found["BRK-1"].id == order.id
@@ -5,6 +5,12 @@ from app.execution import order_manager
 from app.models.signal import Signal
 
 
+@pytest.fixture(autouse=True)
+def _clear_price_cache():
+    order_manager._PRICE_CACHE.clear()
+    order_manager._TRADE_PRICE_CACHE.clear()
+
+
 def test_calculate_position_size_fractionable(monkeypatch):
     class DummyOE:
         def __init__(self):
@@ -15,8 +21,7 @@ def test_calculate_position_size_fractionable(monkeypatch):
             return 50
         def is_crypto(self, symbol):
             return False
-    monkeypatch.setattr(order_manager, "OrderExecutor", DummyOE)
-    om = order_manager.OrderManager(db=None)
+    om = order_manager.OrderManager(db=None, order_executor=DummyOE())
     signal = Signal(symbol="AAPL", action="buy", strategy_id="s")
     qty = om.calculate_position_size(signal, available_capital=1000, max_position_pct=0.1)
     assert qty == 2.0
@@ -32,8 +37,7 @@ def test_calculate_position_size_non_fractionable_insufficient_capital(monkeypat
             return 100
         def is_crypto(self, symbol):
             return False
-    monkeypatch.setattr(order_manager, "OrderExecutor", DummyOE)
-    om = order_manager.OrderManager(db=None)
+    om = order_manager.OrderManager(db=None, order_executor=DummyOE())
     signal = Signal(symbol="AAPL", action="buy", strategy_id="s")
     with pytest.raises(ValueError):
         om.calculate_position_size(signal, available_capital=50, max_position_pct=0.1)
@@ -44,3 +48,39 @@ def test_calculate_position_size_uses_signal_quantity():
     signal = Signal(symbol="AAPL", action="buy", strategy_id="s", quantity=5)
     qty = om.calculate_position_size(signal, available_capital=1000, max_position_pct=0.1)
     assert qty == 5.0
+
+
+def test_calculate_position_size_reuses_injected_executor_and_price():
+    calls = []
+
+    class DummyOE:
+        broker = types.SimpleNamespace(is_asset_fractionable=lambda s: True)
+        def map_symbol(self, symbol):
+            return symbol
+        def _get_market_price(self, symbol):
+            calls.append(symbol)
+            return 50
+        def is_crypto(self, symbol):
+            return False
+
+    om = order_manager.OrderManager(db=None, order_executor=DummyOE())
+    signal = Signal(symbol="AAPL", action="buy", strategy_id="s")
+    for _ in range(3):
+        assert om.calculate_position_size(signal, available_capital=1000, max_position_pct=0.1) == 2.0
+    assert calls == ["AAPL"]
+
+
+def test_current_price_is_memoized_per_symbol(monkeypatch):
+    calls = []
+
+    def fake_fetch(self, symbol):
+        calls.append(symbol)
+        return 101.5
+
+    monkeypatch.setattr(order_manager.OrderManager, "_fetch_current_price", fake_fetch)
+    om = order_manager.OrderManager(db=None)
+
+    assert om._get_current_price("AAPL") == 101.5
+    assert om._get_current_price("AAPL") == 101.5
+    assert om._get_current_price("MSFT") == 101.5
+    assert calls == ["AAPL", "MSFT"]
@@ -0,0 +1,125 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from app.models.order import Order
+from app.core.types import OrderStatus
+from app.execution.order_processor import CLAIM_LEASE, OrderProcessor
+
+
+def _order(db, client_order_id, status, next_retry_at):
+    order = Order(
+        client_order_id=client_order_id,
+        symbol="AAPL",
+        side="buy",
+        quantity=1,
+        status=status,
+        signal_id=1,
+        user_id=1,
+        next_retry_at=next_retry_at,
+    )
+    db.add(order)
+    return order
+
+
+def test_due_retries_only_returns_expired_new_orders(db_session):
+    now = datetime.utcnow()
+    late = _order(db_session, "late", OrderStatus.NEW, now - timedelta(seconds=1))
+    later = _order(db_session, "later", OrderStatus.NEW, now - timedelta(seconds=5))
+    _order(db_session, "future", OrderStatus.NEW, now + timedelta(seconds=30))
+    _order(db_session, "fresh", OrderStatus.NEW, None)
+    _order(db_session, "sent", OrderStatus.SENT, now - timedelta(seconds=5))
+    db_session.commit()
+
+    due = OrderProcessor(db_session)._get_due_retries(limit=100)
+
+    assert due == [later, late]
+
+
+def test_pending_batch_is_fetched_once_and_failures_rescheduled(db_session, count_statements):
+    _order(db_session, "first", OrderStatus.NEW, None)
+    _order(db_session, "second", OrderStatus.NEW, None)
+    db_session.commit()
+
+    class Broker:
+        def is_crypto_symbol(self, symbol):
+            return False
+
+        def submit_order(self, **kwargs):
+            if not hasattr(self, "failed"):
+                self.failed = True
+                raise RuntimeError("boom")
+            return SimpleNamespace(id="BRK")
+
+    processor = OrderProcessor(db_session)
+    processor.broker_executor.broker = Broker()
+
+    with count_statements(db_session) as statements:
+        result = processor.process_pending_orders()
+
+    assert len([s for s in statements if s.startswith("SELECT")]) == 1
+    assert result["successful"] == 1
+    assert result["retries_scheduled"] == 1
+
+    db_session.expire_all()
+    statuses = {o.client_order_id: (o.status, o.next_retry_at is not None) for o in db_session.query(Order)}
+    assert statuses == {
+        "first": (OrderStatus.NEW, True),
+        "second": (OrderStatus.ACCEPTED, False),
+    }
+
+
+def test_order_statistics_use_a_single_query(db_session, count_statements):
+    _order(db_session, "new", OrderStatus.NEW, None)
+    _order(db_session, "err", OrderStatus.ERROR, None)
+    old = _order(db_session, "old-err", OrderStatus.ERROR, None)
+    old.created_at = datetime.utcnow() - timedelta(days=3)
+    db_session.commit()
+
+    with count_statements(db_session) as statements:
+        stats = OrderProcessor(db_session).get_order_statistics()
+
+    assert len(statements) == 1
+    assert stats["status_breakdown"] == {"new": 1, "error": 2}
+    assert stats["recent_orders_24h"] == 2
+    assert stats["error_orders"] == 2
+
+
+def test_per_order_detail_only_in_verbose_mode(db_session):
+    _order(db_session, "a", OrderStatus.NEW, None)
+    _order(db_session, "b", OrderStatus.NEW, None)
+    db_session.commit()
+
+    processor = OrderProcessor(db_session)
+    processor.broker_executor.execute_order = lambda order: {"success": True, "broker_order_id": order.client_order_id}
+
+    result = processor.process_pending_orders()
+    assert "orders_processed" not in result
+    assert (result["claimed"], result["processed"], result["successful"]) == (2, 2, 2)
+
+    _order(db_session, "c", OrderStatus.NEW, None)
+    db_session.commit()
+    result = processor.process_pending_orders(verbose=True)
+    assert [o["broker_order_id"] for o in result["orders_processed"]] == ["c"]
+
+
+def test_stale_claims_are_released_back_to_new(db_session):
+    stale = _order(db_session, "stale", OrderStatus.SENT, None)
+    fresh = _order(db_session, "fresh", OrderStatus.SENT, None)
+    accepted = _order(db_session, "accepted", OrderStatus.SENT, None)
+    accepted.broker_order_id = "BRK"
+    db_session.commit()
+    old = datetime.utcnow() - CLAIM_LEASE - timedelta(minutes=1)
+    db_session.query(Order).filter(Order.client_order_id.in_(["stale", "accepted"])).update(
+        {Order.updated_at: old}, synchronize_session=False
+    )
+    db_session.commit()
+
+    released = OrderProcessor(db_session).release_stale_claims()
+
+    assert released == 1
+    db_session.expire_all()
+    assert stale.status == OrderStatus.NEW
+    assert stale.last_error == "Claim expired before broker submission"
+    assert fresh.status == OrderStatus.SENT
+    assert accepted.status == OrderStatus.SENT
+    assert OrderProcessor(db_session)._get_pending_orders() == [stale]
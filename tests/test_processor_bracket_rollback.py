@@ -46,7 +46,6 @@ async def test_bracket_creation_failure_does_not_persist_orders(monkeypatch):
         ExitRulesService,
         "get_exit_rules",
         lambda self, strategy_id, user_id: {"dummy": True},
-        raising=False,
     )
 
     async def open_market(self, symbol):
@@ -54,7 +53,7 @@ async def test_bracket_creation_failure_does_not_persist_orders(monkeypatch):
 
     monkeypatch.setattr(OrderExecutor, "get_market_hours", open_market)
 
-    def failing_bracket(self, signal, user_id, portfolio_id, commit=True):
+    def failing_bracket(self, signal, user_id, portfolio_id, commit=True, exit_rules=None):
         order = Order(
             client_order_id="test",
             symbol=signal.symbol,
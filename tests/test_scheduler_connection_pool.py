@@ -1,5 +1,8 @@
 import os
 import asyncio
+import time
+import types
+from contextlib import contextmanager
 
 import pytest
 from sqlalchemy import create_engine
@@ -10,13 +13,19 @@ from sqlalchemy.pool import QueuePool
 os.environ.setdefault("DATABASE_URL", "sqlite://")
 os.environ.setdefault("SECRET_KEY", "test")
 
-from app.execution.scheduler import ExecutionScheduler
+import app.database as database
+import app.execution.scheduler as scheduler_module
 import app.execution.trailing_stop_monitor as tsm
+from app.execution.scheduler import ExecutionScheduler
+from app.utils.wakeup import Wakeup
 
 
 class DummyMonitor:
+    sessions = []
+
     def __init__(self, db):
         self.db = db
+        self.sessions.append(db)
 
     def check_and_update_trailing_stops(self):
         return {"checked": 0, "updated": 0}
@@ -28,15 +37,9 @@ async def test_run_trailing_stops_check_closes_db(monkeypatch):
     engine = create_engine("sqlite://", poolclass=QueuePool)
     TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-    def override_get_db():
-        db = TestingSessionLocal()
-        try:
-            yield db
-        finally:
-            db.close()
-
-    monkeypatch.setattr("app.execution.scheduler.get_db", override_get_db)
+    monkeypatch.setattr("app.database.SessionLocal", TestingSessionLocal)
     monkeypatch.setattr(tsm, "TrailingStopMonitor", DummyMonitor)
+    DummyMonitor.sessions.clear()
 
     scheduler = ExecutionScheduler()
     scheduler.is_running = True
@@ -45,3 +48,162 @@ async def test_run_trailing_stops_check_closes_db(monkeypatch):
     for _ in range(5):
         await scheduler.run_trailing_stops_check()
         assert engine.pool.checkedout() == initial_checkedout
+    # Una sesión nueva por check, cerrada al terminar
+    assert len(set(map(id, DummyMonitor.sessions))) == 5
+
+
+def test_tick_runs_due_subtasks_on_one_session(monkeypatch):
+    sessions = []
+
+    @contextmanager
+    def override_session_scope():
+        db = types.SimpleNamespace(closed=False, rollback=lambda: None)
+        sessions.append(db)
+        try:
+            yield db
+        finally:
+            db.closed = True
+
+    monkeypatch.setattr("app.execution.scheduler.session_scope", override_session_scope)
+
+    seen = []
+    scheduler = ExecutionScheduler()
+    due = [(name, 1.0, lambda db, name=name: seen.append((name, db))) for name in ("a", "b", "c")]
+    scheduler._run_tick(due)
+
+    assert len(sessions) == 1
+    assert sessions[0].closed
+    assert [name for name, _ in seen] == ["a", "b", "c"]
+    assert all(db is sessions[0] for _, db in seen)
+
+
+def test_cleanup_skips_statistics_while_idle(monkeypatch, db_session):
+    calls = []
+
+    class DummyProcessor:
+        def __init__(self, db):
+            pass
+
+        def get_order_statistics(self):
+            calls.append(1)
+            return {"status_breakdown": {}}
+
+    monkeypatch.setattr(scheduler_module, "OrderProcessor", DummyProcessor)
+
+    scheduler = ExecutionScheduler()
+    scheduler._cleanup(db_session)
+    scheduler._cleanup(db_session)
+    assert len(calls) == 1
+
+    scheduler._activity_since_stats = True
+    scheduler._cleanup(db_session)
+    assert len(calls) == 2
+
+
+def test_process_orders_reticks_on_full_batch_and_backs_off_when_idle(monkeypatch):
+    claims = iter([scheduler_module.PENDING_BATCH_SIZE, 3, 0, 0])
+
+    class DummyProcessor:
+        def __init__(self, db):
+            pass
+
+        def process_pending_orders(self):
+            return {"claimed": next(claims), "successful": 0, "failed": 0, "retries_scheduled": 0}
+
+    monkeypatch.setattr(scheduler_module, "OrderProcessor", DummyProcessor)
+    db = types.SimpleNamespace(scalar=lambda stmt: 1)
+
+    scheduler = ExecutionScheduler()
+    assert scheduler._process_pending_orders(db) == 0.0
+    assert scheduler._process_pending_orders(db) == scheduler.min_process_interval
+    assert scheduler._process_pending_orders(db) == 2 * scheduler.min_process_interval
+    assert scheduler._process_pending_orders(db) == 4 * scheduler.min_process_interval
+
+    scheduler._process_delay = scheduler.process_interval
+    db.scalar = lambda stmt: 0
+    assert scheduler._process_pending_orders(db) == scheduler.process_interval
+
+
+def test_tick_is_skipped_without_the_scheduler_lock(monkeypatch):
+    opened = []
+
+    @contextmanager
+    def override_session_scope():
+        opened.append(1)
+        yield types.SimpleNamespace()
+
+    monkeypatch.setattr("app.execution.scheduler.session_scope", override_session_scope)
+
+    scheduler = ExecutionScheduler()
+    monkeypatch.setattr(scheduler._leadership, "acquire", lambda: False)
+    ran = []
+    assert scheduler._run_tick([("a", 1.0, lambda db: ran.append(db))]) == {}
+    assert opened == [] and ran == []
+
+
+@pytest.mark.asyncio
+async def test_non_leader_forwards_new_order_wakeup(monkeypatch):
+    wakeup = Wakeup()
+    wakeup.bind()
+    monkeypatch.setattr(scheduler_module, "new_order_wakeup", wakeup)
+
+    scheduler = ExecutionScheduler()
+    forwarded = []
+    scheduler._leadership = types.SimpleNamespace(
+        is_leader=False,
+        watch=lambda callback: None,
+        unwatch=lambda: None,
+        release=lambda: None,
+        forward_wakeup=lambda: (forwarded.append(1), scheduler.stop()),
+    )
+    monkeypatch.setattr(scheduler, "_subtasks", lambda: [("idle", 60.0, lambda db: None)])
+    scheduler._next_run["idle"] = time.monotonic() + 60
+    scheduler._process_delay = scheduler.process_interval
+    scheduler.is_running = True
+
+    wakeup.notify()
+    await asyncio.wait_for(scheduler._tick_loop(), 5)
+
+    # El aviso pasa al líder; esta réplica no adelanta su propio procesamiento
+    assert forwarded == [1]
+    assert "process_orders" not in scheduler._next_run
+    assert scheduler._process_delay == scheduler.process_interval
+
+
+def test_warm_up_pool_opens_connections_together(monkeypatch):
+    engine = create_engine("sqlite://", poolclass=QueuePool, pool_size=5)
+    monkeypatch.setattr(database, "engine", engine)
+
+    assert database.warm_up_pool(3) == 3
+    assert engine.pool.checkedin() == 3
+    assert engine.pool.checkedout() == 0
+
+    # Sin QueuePool (SQLite por defecto, PgBouncer) no hace nada
+    monkeypatch.setattr(database, "engine", create_engine("sqlite://"))
+    assert database.warm_up_pool(3) == 0
+
+
+def test_warm_up_pool_reads_the_setting_at_call_time(monkeypatch):
+    engine = create_engine("sqlite://", poolclass=QueuePool, pool_size=5)
+    monkeypatch.setattr(database, "engine", engine)
+    monkeypatch.setattr(database.settings, "db_pool_size", 5, raising=False)
+    monkeypatch.setattr(database.settings, "db_pool_warmup", 2, raising=False)
+
+    assert database.warm_up_pool() == 2
+    assert engine.pool.checkedin() == 2
+
+
+def test_leadership_needs_a_direct_url_behind_pgbouncer(monkeypatch):
+    monkeypatch.setattr(scheduler_module.settings, "db_use_pgbouncer", True, raising=False)
+    monkeypatch.setattr(scheduler_module.settings, "db_direct_url", None, raising=False)
+    leadership = scheduler_module.SchedulerLeadership()
+    assert leadership._connect() is None
+
+    # Con DSN directo, el lock usa su propio engine y no el del pool de la app
+    monkeypatch.setattr(scheduler_module.settings, "db_direct_url", "sqlite://", raising=False)
+    conn = leadership._connect()
+    try:
+        assert conn.engine is leadership._direct_engine
+        assert conn.engine is not database.engine
+    finally:
+        conn.close()
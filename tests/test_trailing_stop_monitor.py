@@ -1,20 +1,15 @@
-import pytest
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from app.database import Base
-from app.execution.trailing_stop_monitor import TrailingStopMonitor
+import threading
+from decimal import Decimal
+from types import SimpleNamespace
 
+import numpy as np
+from sqlalchemy import event
 
-@pytest.fixture
-def db_session():
-    engine = create_engine("sqlite:///:memory:")
-    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    Base.metadata.create_all(bind=engine)
-    db = TestingSessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+import app.integrations as integrations
+from app.models.order import Order
+from app.models.signal import Signal
+from app.models.strategy_exit_rules import StrategyExitRules
+from app.execution.trailing_stop_monitor import TrailingStopMonitor
 
 
 def test_trailing_stop_monitor_creation(db_session):
@@ -29,3 +24,198 @@ def test_get_trailing_stops_summary(db_session):
     assert "total_active" in summary
     assert "by_symbol" in summary
     assert "by_strategy" in summary
+
+
+def _stops(db, count):
+    for i in range(1, count + 1):
+        db.add(Signal(id=i, symbol=f"S{i}", action="buy", strategy_id=f"strat{i}", user_id=1))
+        db.add(Order(id=100 + i, client_order_id=f"P{i}", symbol=f"S{i}", side="buy",
+                     quantity=1, status="filled", signal_id=i, user_id=1))
+        db.add(Order(id=200 + i, client_order_id=f"SL{i}", parent_order_id=100 + i,
+                     symbol=f"S{i}", side="sell", quantity=1, order_type="stop",
+                     stop_price=90, status="new", signal_id=i, user_id=1))
+    db.commit()
+    db.expunge_all()
+
+
+def test_summary_loads_signals_with_the_stops(db_session, count_statements):
+    _stops(db_session, 3)
+    monitor = TrailingStopMonitor(db_session)
+
+    with count_statements(db_session) as statements:
+        summary = monitor.get_trailing_stops_summary()
+
+    assert len(statements) == 1
+    assert summary["by_strategy"] == {"strat1": 1, "strat2": 1, "strat3": 1}
+
+
+def test_parent_orders_are_fetched_once_per_cycle(db_session, monkeypatch, count_statements):
+    _stops(db_session, 3)
+    monitor = TrailingStopMonitor(db_session)
+    monkeypatch.setattr(monitor, "_get_current_prices", lambda symbols: dict.fromkeys(symbols, 100.0))
+    rules = SimpleNamespace(use_trailing=True, trailing_stop_pct=0.05, user_id=1)
+    monkeypatch.setattr(
+        monitor.exit_rules_service, "get_many",
+        lambda ids: {strategy_id: rules for strategy_id in ids},
+    )
+
+    with count_statements(db_session) as statements:
+        result = monitor.check_and_update_trailing_stops()
+
+    parent_selects = [s for s in statements if "orders.id IN" in s]
+    assert len(parent_selects) == 1
+    assert result["updated"] == 3
+    assert all(d["new_stop_price"] == 95.0 for d in result["details"])
+
+
+def test_exit_rules_are_fetched_once_per_cycle(db_session, monkeypatch, count_statements):
+    _stops(db_session, 3)
+    for i in range(1, 4):
+        db_session.add(StrategyExitRules(id=f"strat{i}", user_id=1, trailing_stop_pct=0.05, use_trailing=True))
+    db_session.commit()
+    db_session.expunge_all()
+
+    monitor = TrailingStopMonitor(db_session)
+    monkeypatch.setattr(monitor, "_get_current_prices", lambda symbols: dict.fromkeys(symbols, 100.0))
+
+    with count_statements(db_session) as statements:
+        result = monitor.check_and_update_trailing_stops()
+
+    rules_selects = [s for s in statements if "strategy_exit_rules.id IN" in s]
+    assert len(rules_selects) == 1
+    assert result["updated"] == 3
+    # stops+señales, padres y reglas: sin recargas por orden entre commits
+    assert len([s for s in statements if s.startswith("SELECT")]) == 3
+
+
+def test_updated_stops_are_committed_together(db_session, monkeypatch):
+    _stops(db_session, 3)
+    monitor = TrailingStopMonitor(db_session)
+    monkeypatch.setattr(monitor, "_get_current_prices", lambda symbols: dict.fromkeys(symbols, 100.0))
+    rules = SimpleNamespace(use_trailing=True, trailing_stop_pct=0.05, user_id=1)
+    monkeypatch.setattr(
+        monitor.exit_rules_service, "get_many",
+        lambda ids: {strategy_id: rules for strategy_id in ids},
+    )
+    commits = []
+    event.listen(db_session, "after_commit", lambda session: commits.append(1))
+
+    monitor.check_and_update_trailing_stops()
+
+    assert commits == [1]
+    db_session.expire_all()
+    assert {float(o.stop_price) for o in db_session.query(Order).filter(Order.order_type == "stop")} == {95.0}
+
+
+def test_prices_are_fetched_in_one_broker_call(db_session, monkeypatch):
+    calls = []
+
+    def get_latest_trades(symbols):
+        calls.append(list(symbols))
+        return {"S1": SimpleNamespace(price=Decimal("101.5")), "S2": SimpleNamespace(price=Decimal("99"))}
+
+    monkeypatch.setattr(integrations.broker_client, "get_latest_trades", get_latest_trades)
+    monitor = TrailingStopMonitor(db_session)
+
+    # S3 sin dato en la respuesta: precio 0.0 (no se mueve el stop)
+    prices = monitor._get_current_prices(["S1", "S2", "S1", "S3"])
+
+    assert calls == [["S1", "S2", "S3"]]
+    assert prices == {"S1": 101.5, "S2": 99.0, "S3": 0.0}
+
+
+def test_prices_are_fetched_while_loading_rules(db_session, monkeypatch):
+    _stops(db_session, 3)
+    monitor = TrailingStopMonitor(db_session)
+    requested = threading.Event()
+
+    def prices(symbols):
+        requested.set()
+        return dict.fromkeys(symbols, 100.0)
+
+    rules = SimpleNamespace(use_trailing=True, trailing_stop_pct=0.05, user_id=1)
+
+    def get_many(ids):
+        # Solo termina si la petición de precios ya está en curso
+        assert requested.wait(5)
+        return {strategy_id: rules for strategy_id in ids}
+
+    monkeypatch.setattr(monitor, "_get_current_prices", prices)
+    monkeypatch.setattr(monitor.exit_rules_service, "get_many", get_many)
+
+    result = monitor.check_and_update_trailing_stops()
+
+    assert result["updated"] == 3
+
+
+def test_each_symbol_is_quoted_once_per_cycle(db_session, monkeypatch):
+    _stops(db_session, 3)
+    db_session.query(Order).update({Order.symbol: "AAPL"})
+    db_session.commit()
+
+    monitor = TrailingStopMonitor(db_session)
+    fetched = []
+
+    def get_latest_trades(symbols):
+        fetched.append(list(symbols))
+        return {symbol: SimpleNamespace(price=100.0) for symbol in symbols}
+
+    monkeypatch.setattr(integrations.broker_client, "get_latest_trades", get_latest_trades)
+    rules = SimpleNamespace(use_trailing=True, trailing_stop_pct=0.05, user_id=1)
+    monkeypatch.setattr(
+        monitor.exit_rules_service, "get_many",
+        lambda ids: {strategy_id: rules for strategy_id in ids},
+    )
+
+    result = monitor.check_and_update_trailing_stops()
+
+    assert fetched == [["AAPL"]]
+    assert result["updated"] == 3
+
+
+def test_trailing_kernel_moves_stops_only_towards_the_price():
+    new_stops, should_update = TrailingStopMonitor._trailing_kernel(
+        prices=np.array([100.0, 100.0, 100.0, 100.0]),
+        pcts=np.array([0.05, 0.05, 0.05, 0.05]),
+        current_stops=np.array([90.0, 96.0, 110.0, 104.0]),
+        is_long=np.array([True, True, False, False]),
+    )
+
+    assert new_stops.tolist() == [95.0, 95.0, 105.0, 105.0]
+    assert should_update.tolist() == [True, False, True, False]
+
+
+def test_stop_without_price_does_not_abort_the_cycle(db_session, monkeypatch):
+    _stops(db_session, 3)
+    db_session.query(Order).filter(Order.id == 202).update({Order.stop_price: None})
+    db_session.commit()
+
+    monitor = TrailingStopMonitor(db_session)
+    monkeypatch.setattr(monitor, "_get_current_prices", lambda symbols: dict.fromkeys(symbols, 100.0))
+    rules = SimpleNamespace(use_trailing=True, trailing_stop_pct=0.05, user_id=1)
+    monkeypatch.setattr(
+        monitor.exit_rules_service, "get_many",
+        lambda ids: {strategy_id: rules for strategy_id in ids},
+    )
+
+    result = monitor.check_and_update_trailing_stops()
+
+    assert (result["updated"], result["errors"]) == (2, 1)
+    errors = [d for d in result["details"] if "error" in d]
+    assert [d["order_id"] for d in errors] == [202]
+
+
+def test_prices_fall_back_to_per_symbol_when_the_batch_fails(db_session, monkeypatch):
+    def get_latest_trades(symbols):
+        raise TimeoutError("batch timed out")
+
+    def get_latest_trade(symbol):
+        if symbol == "S2":
+            raise Exception("delisted")
+        return SimpleNamespace(price=Decimal("100"))
+
+    monkeypatch.setattr(integrations.broker_client, "get_latest_trades", get_latest_trades)
+    monkeypatch.setattr(integrations.broker_client, "get_latest_trade", get_latest_trade)
+    monitor = TrailingStopMonitor(db_session)
+
+    assert monitor._get_current_prices(["S1", "S2"]) == {"S1": 100.0, "S2": 0.0}
@@ -0,0 +1,41 @@
+import asyncio
+import threading
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.execution import order_manager
+from app.utils.wakeup import Wakeup
+
+
+@pytest.mark.asyncio
+async def test_notify_from_thread_wakes_waiter():
+    wakeup = Wakeup()
+    wakeup.bind()
+
+    assert await wakeup.wait(0.01) is False
+
+    threading.Thread(target=wakeup.notify).start()
+    assert await wakeup.wait(5) is True
+    # El evento se consume: la siguiente espera vuelve a dormir
+    assert await wakeup.wait(0.01) is False
+
+
+def test_commit_of_new_order_notifies_scheduler(monkeypatch):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    notified = []
+    monkeypatch.setattr(order_manager.new_order_wakeup, "notify", lambda: notified.append(1))
+
+    om = order_manager.OrderManager(db)
+    signal = order_manager.Signal(id=1, symbol="AAPL", action="buy", strategy_id="s")
+    om.create_order_from_signal(signal, user_id=1, commit=False)
+    assert notified == []
+
+    db.commit()
+    db.commit()
+    assert notified == [1]
+    db.close()
@@ -0,0 +1,65 @@
+import os
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+os.environ.setdefault("SECRET_KEY", "secret")
+
+from app.api.v1 import webhooks
+from app.config import settings
+from app.database import Base, get_db
+from app.utils.rate_limiter import get_rate_limiter
+
+
+class AllowAll:
+    async def is_allowed(self, key: str) -> bool:
+        return True
+
+
+app = FastAPI()
+app.include_router(webhooks.router, prefix="/api/v1")
+client = TestClient(app)
+
+PAYLOAD = {"symbol": "AAPL", "action": "buy", "strategy_id": "s"}
+
+
+@pytest.fixture
+def setup_db():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+
+    def override_get_db():
+        yield db
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_rate_limiter] = lambda: AllowAll()
+    yield db
+    db.close()
+    app.dependency_overrides.clear()
+
+
+def test_public_webhook_rejects_wrong_api_key(setup_db):
+    response = client.post("/api/v1/webhook-public?api_key=wrong", json=PAYLOAD)
+    assert response.status_code == 401
+
+
+def test_public_webhook_accepts_configured_api_key(setup_db):
+    response = client.post(
+        "/api/v1/webhook-public",
+        json=PAYLOAD,
+        headers={"X-API-Key": settings.webhook_api_key},
+    )
+    # Key accepted; the request then fails on the missing target user
+    assert response.status_code == 500
+    assert "reybel" in response.json()["detail"]